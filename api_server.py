@@ -0,0 +1,392 @@
+import asyncio
+import bisect
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+from recurrence import canonical_rule
+from task_model import PRIORITIES, STATUSES, normalize_row, parse_time
+
+# ローカルの HTTP/JSON API
+#   GET    /tasks                 一覧（status・category・priority・q で絞り込み、limit・cursor でページ分け）
+#   GET    /tasks/{id}            1件
+#   POST   /tasks                 追加             {"title", "category", "priority", "reminder", "repeat"}
+#   POST   /tasks/{id}/complete   完了
+#   PUT    /tasks/{id}/reminder   リマインド設定   {"reminder": "YYYY-MM-DD HH:MM" または null}
+#                                                  または {"repeat": "毎日 9:00" などの規則 または null}
+#   DELETE /tasks/{id}            削除
+#   POST   /tasks/bulk            まとめて追加     {"tasks": [...]}
+#   POST   /tasks/complete        まとめて完了     {"ids": [...]}
+#   POST   /tasks/delete          まとめて削除     {"ids": [...]}
+#   POST   /tasks/reminder        まとめてリマインド設定 {"ids": [...], "reminder": ...}
+#   GET    /categories            カテゴリの一覧
+#   GET    /stats                 件数の集計（状態・カテゴリ・優先度ごと、リマインド期限切れ）
+# タスクは tasks.json と同じ形式で返す。GET の応答には ETag（ストアの変更番号）を付け、
+# If-None-Match が一致すれば絞り込みも本文の作成もせずに 304 を返す。
+# ブラウザのページから勝手に変更されないように、本文のある要求は Content-Type: application/json に限る
+# （プリフライトが必要になり、他のオリジンからは送れない）。本文のない POST /tasks/{id}/complete はそのまま受け付ける。
+
+# 1ページの件数の既定値と上限
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 要求の本文の上限（バイト）
+MAX_BODY = 8 * 1024 * 1024
+
+# 絞り込みの結果（ID順のタスクIDのリスト）を保持しておく条件の数
+QUERY_CACHE_SIZE = 32
+
+REASONS = {
+    200: 'OK',
+    201: 'Created',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    415: 'Unsupported Media Type',
+    500: 'Internal Server Error'
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    # asyncio のサーバーを専用のスレッドで動かす（Tkのメインループとは別のスレッド）
+    # タスクの参照・変更は TaskStore のロックの中で行うので、UIスレッドと同時に操作しても壊れない。
+    # 変更した場合は on_change() を呼ぶ（保存の依頼と、UIスレッドでの再表示の依頼に使う）。
+    def __init__(self, store, on_change=None, host='127.0.0.1', port=0):
+        self.store = store
+        self.on_change = on_change
+        self.host = host
+        self.port = port
+        # ETag にはアプリの起動ごとに異なる値を含める（再起動後に古い ETag が一致しないように）
+        self.epoch = int(time.time() * 1000)
+        # 条件 -> (変更番号, ID順のタスクIDのリスト)（サーバーのスレッドからだけ使う）
+        self._queries = OrderedDict()
+        # 接続中のクライアント（終了時に切断する）
+        self._writers = set()
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        # 待ち受けを始めるまで待つ（port=0 の場合は割り当てられたポートが self.port に入る）
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            # 接続中のクライアントを切断し、各接続の処理が終わるのを待ってから終了する
+            server.close()
+            for writer in list(self._writers):
+                writer.close()
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+            loop.close()
+
+    async def _handle(self, reader, writer):
+        # 1つの接続で複数の要求を順に処理する（HTTP/1.1 の keep-alive）
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split(' ')
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    writer.write(response(400, {'error': "要求の形式が不正です"}, keep_alive=False))
+                    return
+                method, target, version = parts
+                connection = headers.get('connection', '').lower()
+                if version == 'HTTP/1.1':
+                    keep_alive = connection != 'close'
+                else:
+                    keep_alive = connection == 'keep-alive'
+
+                if 'transfer-encoding' in headers:
+                    writer.write(response(411, {'error': "Content-Length を指定してください"}, keep_alive=False))
+                    return
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY:
+                    writer.write(response(413 if length > 0 else 400, {'error': "本文の長さが不正です"},
+                                          keep_alive=False))
+                    return
+                body = await reader.readexactly(length) if length else b''
+
+                writer.write(self.respond(method, target, headers, body, keep_alive))
+                if not keep_alive:
+                    return
+                # 送信が溜まっている場合だけ待つ
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def respond(self, method, target, headers, body, keep_alive=True):
+        # 1件の要求を処理して応答のバイト列を返す
+        try:
+            status, payload, etag = self.dispatch(method, target, headers, body)
+        except ApiError as e:
+            return response(e.status, {'error': str(e)}, keep_alive=keep_alive)
+        except Exception as e:
+            return response(500, {'error': f"{type(e).__name__}: {e}"}, keep_alive=keep_alive)
+        return response(status, payload, etag, keep_alive)
+
+    def dispatch(self, method, target, headers, body):
+        # (ステータス, 本文, ETag) を返す
+        if method == 'GET':
+            with self.store.lock:
+                etag = self.etag()
+            if etag_matches(headers.get('if-none-match'), etag):
+                return 304, None, etag
+
+        url = urlsplit(target)
+        path = [part for part in url.path.split('/') if part]
+        params = dict(parse_qsl(url.query))
+
+        if body:
+            if not headers.get('content-type', '').startswith('application/json'):
+                raise ApiError(415, "Content-Type: application/json を指定してください")
+        data = None
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise ApiError(400, "本文がJSONではありません")
+
+        if path == ['tasks']:
+            if method == 'GET':
+                return self.list_tasks(params)
+            if method == 'POST':
+                return 201, {'task': self.create_tasks([require_object(data)])[0]}, None
+        elif path == ['categories']:
+            if method == 'GET':
+                with self.store.lock:
+                    categories = list(self.store.categories)
+                    etag = self.etag()
+                return 200, {'categories': categories}, etag
+        elif path == ['stats']:
+            if method == 'GET':
+                with self.store.lock:
+                    stats = self.store.stats()
+                    stats['by_category'] = self.store.counts('category')
+                    stats['by_priority'] = self.store.counts('priority')
+                    # 期限切れの件数は変更がなくても時刻の経過で変わるので ETag に含める
+                    etag = self.etag()[:-1] + f'-{stats["overdue"]}"'
+                if etag_matches(headers.get('if-none-match'), etag):
+                    return 304, None, etag
+                return 200, stats, etag
+        elif len(path) == 2 and path[0] == 'tasks':
+            if path[1] == 'bulk':
+                if method == 'POST':
+                    items = require_object(data).get('tasks')
+                    if not isinstance(items, list):
+                        raise ApiError(400, "tasks を配列で指定してください")
+                    return 201, {'tasks': self.create_tasks(items)}, None
+            elif path[1] in ('complete', 'delete', 'reminder'):
+                if method == 'POST':
+                    data = require_object(data)
+                    return 200, {'changed': self.update_tasks(path[1], require_ids(data), data)}, None
+            else:
+                task_id = parse_id(path[1])
+                if method == 'GET':
+                    with self.store.lock:
+                        task = self.find(task_id).to_dict()
+                        etag = self.etag()
+                    return 200, {'task': task}, etag
+                if method == 'DELETE':
+                    self.update_tasks('delete', [self.find(task_id).id], None)
+                    return 200, {'changed': [task_id]}, None
+        elif len(path) == 3 and path[0] == 'tasks' and path[2] in ('complete', 'reminder'):
+            task_id = parse_id(path[1])
+            if (path[2], method) in (('complete', 'POST'), ('reminder', 'PUT')):
+                with self.store.lock:
+                    self.find(task_id)
+                    self.update_tasks(path[2], [task_id], require_object(data) if path[2] == 'reminder' else None)
+                    task = self.find(task_id).to_dict()
+                return 200, {'task': task}, None
+        else:
+            raise ApiError(404, f"{url.path} はありません")
+        raise ApiError(405, f"{method} {url.path} には対応していません")
+
+    def etag(self):
+        return f'"{self.epoch}-{self.store.generation}"'
+
+    def find(self, task_id):
+        task = self.store.get(task_id)
+        if task is None:
+            raise ApiError(404, f"ID {task_id} のタスクはありません")
+        return task
+
+    def list_tasks(self, params):
+        # カーソル（前のページの最後のID）より後ろを limit 件返す
+        status = params.get('status')
+        if status is not None and status not in STATUSES:
+            raise ApiError(400, f"状態が不正です: {status}")
+        priority = params.get('priority')
+        if priority is not None and priority not in PRIORITIES:
+            raise ApiError(400, f"優先度が不正です: {priority}")
+        key = (status, params.get('category'), priority, params.get('q', '').strip() or None)
+        limit = min(parse_int(params, 'limit', PAGE_SIZE), MAX_PAGE_SIZE)
+        cursor = parse_int(params, 'cursor', 0)
+        if limit <= 0:
+            raise ApiError(400, "limit は1以上を指定してください")
+
+        with self.store.lock:
+            generation = self.store.generation
+            cached = self._queries.get(key)
+            if cached is not None and cached[0] == generation:
+                self._queries.move_to_end(key)
+                ids = cached[1]
+            else:
+                # 同じ条件でページを続けて読む場合に、絞り込みと並べ替えを繰り返さない
+                ids = self.store.sorted_ids(*key)
+                self._queries[key] = (generation, ids)
+                if len(self._queries) > QUERY_CACHE_SIZE:
+                    self._queries.popitem(last=False)
+            start = bisect.bisect_right(ids, cursor)
+            page = [self.store.get(task_id).to_dict() for task_id in ids[start:start + limit]]
+            etag = self.etag()
+        next_cursor = page[-1]['id'] if start + limit < len(ids) else None
+        return 200, {'tasks': page, 'next_cursor': next_cursor, 'total': len(ids)}, etag
+
+    def create_tasks(self, items):
+        # すべて検証してから追加する（1件でも不正なら何も追加しない）
+        now = int(time.time())
+        rows = []
+        for index, item in enumerate(items):
+            try:
+                rows.append(normalize_row(require_object(item), now))
+            except (ValueError, OverflowError) as e:
+                raise ApiError(400, f"{index}件目: {e}")
+        with self.store.lock:
+            for row in rows:
+                if row['category'] not in self.store.categories:
+                    self.store.add_category(row['category'])
+            tasks = [task.to_dict() for task in self.store.add_many(rows)]
+        self.changed(tasks)
+        return tasks
+
+    def update_tasks(self, action, task_ids, data):
+        if action == 'complete':
+            changed = self.store.complete_many(task_ids)
+        elif action == 'delete':
+            changed = self.store.delete_many(task_ids)
+        elif 'repeat' in data:
+            # 繰り返しの規則を設定し、リマインドを次の予定にする（null で繰り返しを解除）
+            repeat = data['repeat']
+            if repeat is not None and not isinstance(repeat, str):
+                raise ApiError(400, "repeat は文字列か null で指定してください")
+            try:
+                repeat = canonical_rule(repeat) if repeat else None
+            except ValueError as e:
+                raise ApiError(400, str(e))
+            with self.store.lock:
+                changed = [self.store.set_repeat(task_id, repeat) for task_id in task_ids if task_id in self.store]
+        else:
+            if 'reminder' not in data:
+                raise ApiError(400, "reminder または repeat を指定してください")
+            reminder = data['reminder']
+            if reminder is not None and not isinstance(reminder, str):
+                raise ApiError(400, "reminder は文字列か null で指定してください")
+            try:
+                reminder = parse_time(reminder)
+            except (ValueError, OverflowError):
+                raise ApiError(400, f"リマインド時刻が不正です: {reminder}")
+            changed = self.store.set_reminders_many(task_ids, reminder)
+        self.changed(changed)
+        return [task.id for task in changed]
+
+    def changed(self, tasks):
+        if tasks and self.on_change is not None:
+            self.on_change()
+
+
+def response(status, payload, etag=None, keep_alive=True):
+    body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    lines = [f'HTTP/1.1 {status} {REASONS[status]}']
+    if status != 304:
+        lines.append('Content-Type: application/json; charset=utf-8')
+        lines.append(f'Content-Length: {len(body)}')
+    if etag is not None:
+        lines.append(f'ETag: {etag}')
+    lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    header = header.strip()
+    if header == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def require_object(data):
+    if not isinstance(data, dict):
+        raise ApiError(400, "本文はJSONのオブジェクトで指定してください")
+    return data
+
+
+def require_ids(data):
+    ids = data.get('ids')
+    # JSON の true / false は Python では int の一種なので、bool は別に除く
+    if not isinstance(ids, list) or not all(type(task_id) is int for task_id in ids):
+        raise ApiError(400, "ids をタスクIDの配列で指定してください")
+    return ids
+
+
+def parse_id(text):
+    try:
+        return int(text)
+    except ValueError:
+        raise ApiError(404, f"ID {text} のタスクはありません")
+
+
+def parse_int(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"{name} は整数で指定してください")
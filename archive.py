@@ -0,0 +1,227 @@
+import bisect
+import gzip
+import json
+import lzma
+import os
+from collections import OrderedDict
+
+from shared_file import FileLock
+from task_model import Task
+
+# 完了したタスクのアーカイブ
+# 作成から一定の日数が経った完了済みのタスクを tasks.json から取り除き、圧縮したセグメントに書き出す。
+#   tasks.archive/000001.jsonl.gz   タスク（tasks.json と同じ形式の辞書を1行1件、ID順）
+#   tasks.archive/000001.json       セグメントの索引（件数・IDの範囲・カテゴリと優先度ごとの件数）
+# セグメントは一度書いたら変更しない（追記のみ）。索引を最後に書くので、索引のないセグメントは
+# 書き込み途中のものとして読まない。一覧の表示は索引だけで件数を求め、表示する範囲の
+# セグメントだけを展開する。
+
+# 圧縮方式: 名前 -> (拡張子, open 関数)
+COMPRESSIONS = {
+    'gzip': ('.jsonl.gz', gzip.open),
+    'lzma': ('.jsonl.xz', lzma.open)
+}
+
+# 1つのセグメントに書き出す件数の上限（表示のために展開する単位になる）
+SEGMENT_SIZE = 10000
+
+# 展開したセグメントを保持しておく数
+SEGMENT_CACHE_SIZE = 4
+
+
+def archive_directory(path):
+    # tasks.json のアーカイブの置き場所（tasks.archive）
+    return os.path.splitext(path)[0] + '.archive'
+
+
+class Archive:
+    def __init__(self, directory, compression='gzip', segment_size=SEGMENT_SIZE):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"未対応の圧縮方式です: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self.segment_size = segment_size
+        # 索引の一覧（ディレクトリの更新日時が変わったら読み直す）
+        self._segments = []
+        self._signature = None
+        # セグメントの番号 -> 展開した Task のリスト
+        self._cache = OrderedDict()
+
+    def segments(self):
+        # 書き込みの終わったセグメントの索引（番号順）
+        try:
+            signature = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if signature != self._signature:
+            segments = []
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith('.json') and name[:-5].isdigit():
+                    with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                        segments.append(json.load(f))
+            self._segments = segments
+            self._signature = signature
+        return self._segments
+
+    def count(self, category=None, priority=None):
+        return sum(segment_count(segment, category, priority) for segment in self.segments())
+
+    def read(self, segment):
+        # セグメントのタスク（ID順）
+        number = segment['number']
+        tasks = self._cache.get(number)
+        if tasks is not None:
+            self._cache.move_to_end(number)
+            return tasks
+        opener = COMPRESSIONS['lzma' if segment['file'].endswith('.xz') else 'gzip'][1]
+        with opener(os.path.join(self.directory, segment['file']), 'rt', encoding='utf-8') as f:
+            tasks = [Task.from_dict(json.loads(line)) for line in f if line.strip()]
+        self._cache[number] = tasks
+        if len(self._cache) > SEGMENT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return tasks
+
+    def __iter__(self):
+        for segment in self.segments():
+            yield from self.read(segment)
+
+    def append(self, tasks):
+        # タスク（ID順）を segment_size 件ずつ新しいセグメントに書き出し、書き出した件数を返す
+        os.makedirs(self.directory, exist_ok=True)
+        extension = COMPRESSIONS[self.compression][0]
+        opener = COMPRESSIONS[self.compression][1]
+        # 複数のアプリが同時に書き出しても番号が重ならないようにロックする
+        with FileLock(os.path.join(self.directory, 'archive.lock')):
+            numbers = [int(name.split('.')[0]) for name in os.listdir(self.directory) if name.split('.')[0].isdigit()]
+            number = max(numbers, default=0)
+            for start in range(0, len(tasks), self.segment_size):
+                chunk = tasks[start:start + self.segment_size]
+                number += 1
+                name = f'{number:06d}'
+                counts = {}
+                # セグメント・索引とも fsync してから置き換える（この後 tasks.json からタスクを削除するので、
+                # 電源が切れてもアーカイブ側に残っているようにする）
+                with open(os.path.join(self.directory, name + extension + '.tmp'), 'wb') as raw:
+                    with opener(raw, 'wt', encoding='utf-8') as f:
+                        for task in chunk:
+                            f.write(json.dumps(task.to_dict(), ensure_ascii=False) + '\n')
+                            key = (task.category, task.priority)
+                            counts[key] = counts.get(key, 0) + 1
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(os.path.join(self.directory, name + extension + '.tmp'),
+                           os.path.join(self.directory, name + extension))
+                segment = {
+                    'number': number,
+                    'file': name + extension,
+                    'count': len(chunk),
+                    'min_id': chunk[0].id,
+                    'max_id': chunk[-1].id,
+                    'counts': [[category, priority, count] for (category, priority), count in counts.items()]
+                }
+                with open(os.path.join(self.directory, name + '.json.tmp'), 'w', encoding='utf-8') as f:
+                    json.dump(segment, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(os.path.join(self.directory, name + '.json.tmp'),
+                           os.path.join(self.directory, name + '.json'))
+        return len(tasks)
+
+
+def segment_count(segment, category=None, priority=None):
+    # 索引だけから求めた、条件に一致する件数
+    if category is None and priority is None:
+        return segment['count']
+    return sum(count for segment_category, segment_priority, count in segment['counts']
+               if (category is None or segment_category == category)
+               and (priority is None or segment_priority == priority))
+
+
+def archive_completed(store, archive, before):
+    # 作成日時が before（エポック秒）より前の完了済みのタスクをアーカイブに移し、移したタスクを返す
+    # 書き出しはストアのロックの外で行い、その間に変更されたタスクはストアに残す
+    # （アーカイブにも残るが、表示ではストアにあるものを優先する）。
+    with store.lock:
+        tasks = [task.copy() for task in store.query(status='completed') if task.created_at < before]
+    if not tasks:
+        return []
+    archive.append(tasks)
+    with store.lock:
+        unchanged = []
+        for task in tasks:
+            current = store.get(task.id)
+            if current is not None and current.version == task.version and current.status == 'completed':
+                unchanged.append(task.id)
+        return store.delete_many(unchanged)
+
+
+class ArchivedView:
+    # 「完了済のみ」の表示対象: ストアのタスクの後にアーカイブのタスクを続けた列（TreeRenderer にそのまま渡せる）
+    # 件数は索引から求め、行を取り出すときに該当するセグメントだけを展開する。
+    # ストアにあるタスク（アーカイブ後に変更されたもの）はアーカイブ側では表示しない
+    # （その分の件数は、セグメントを展開した時点で後ろの位置をずらして合わせる）。
+    def __init__(self, tasks, archive, store, category=None, priority=None):
+        self.tasks = tasks
+        self.archive = archive
+        self.store = store
+        self.category = category
+        self.priority = priority
+        self.segments = []
+        # アーカイブ側の各セグメントの先頭位置
+        self.starts = []
+        total = len(tasks)
+        for segment in archive.segments():
+            count = segment_count(segment, category, priority)
+            if count:
+                self.segments.append(segment)
+                self.starts.append(total)
+                total += count
+        self.total = total
+        # 展開したセグメントの番号 -> 条件に一致するタスク
+        self._filtered = {}
+
+    def __len__(self):
+        return self.total
+
+    def _segment_tasks(self, i):
+        tasks = self._filtered.get(i)
+        if tasks is None:
+            tasks = self._filtered[i] = [
+                task for task in self.archive.read(self.segments[i])
+                if (self.category is None or task.category == self.category)
+                and (self.priority is None or task.priority == self.priority)
+                and task.id not in self.store
+            ]
+            end = self.starts[i + 1] if i + 1 < len(self.starts) else self.total
+            difference = len(tasks) - (end - self.starts[i])
+            if difference:
+                for j in range(i + 1, len(self.starts)):
+                    self.starts[j] += difference
+                self.total += difference
+        return tasks
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self.total
+            result = self[index:index + 1]
+            if not result:
+                raise IndexError(index)
+            return result[0]
+        start, stop, _ = index.indices(self.total)
+        result = list(self.tasks[start:stop])
+        position = max(start, len(self.tasks))
+        i = bisect.bisect_right(self.starts, position) - 1
+        while position < stop and 0 <= i < len(self.segments):
+            tasks = self._segment_tasks(i)
+            offset = position - self.starts[i]
+            end = self.starts[i + 1] if i + 1 < len(self.starts) else self.total
+            result.extend(tasks[offset:offset + stop - position])
+            position = end
+            i += 1
+        return result
+
+    def __iter__(self):
+        yield from self.tasks
+        for i in range(len(self.segments)):
+            yield from self._segment_tasks(i)
@@ -0,0 +1,131 @@
+# ローカル API（api_server.py）の1秒あたりの処理件数の計測
+# サーバーはこのプロセスの1スレッドで動かし、クライアントは別のプロセスから keep-alive の接続を
+# 複数張って要求を送り続ける（サーバー側が使うのは1コアだけ）。
+# 計測する要求:
+#   get_304      ETag が一致する一覧の取得（If-None-Match）
+#   get_page     一覧の1ページ（100件）の取得
+#   get_task     1件の取得
+#   complete     1件の完了（ストアが変わるので ETag も変わる）
+#   create       1件の追加
+# 目標: いずれも 1,000 件/秒 以上
+# 使い方: python benchmarks/api_bench.py [--size 100000] [--connections 10] [--seconds 2]
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import ApiServer
+from task_store import TaskStore
+
+from generate import CATEGORIES, generate_tasks
+
+TARGET = 1000
+
+
+def build_request(method, path, body=None, headers=None):
+    lines = [f'{method} {path} HTTP/1.1', 'Host: 127.0.0.1']
+    for name, value in (headers or {}).items():
+        lines.append(f'{name}: {value}')
+    data = b''
+    if body is not None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        lines.append('Content-Type: application/json')
+    if data or method == 'POST':
+        lines.append(f'Content-Length: {len(data)}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + data
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def connection(port, make_request, deadline, counts):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        writer.write(make_request(rng))
+        status = await read_response(reader)
+        counts[status] = counts.get(status, 0) + 1
+    writer.close()
+
+
+async def run_client(port, scenario, connections, seconds, etag, max_id):
+    requests = {
+        'get_304': lambda rng: build_request('GET', '/tasks?status=active', headers={'If-None-Match': etag}),
+        'get_page': lambda rng: build_request('GET', '/tasks?status=active&limit=100'),
+        'get_task': lambda rng: build_request('GET', f'/tasks/{rng.randint(1, max_id)}'),
+        'complete': lambda rng: build_request('POST', '/tasks/complete', {'ids': [rng.randint(1, max_id)]}),
+        'create': lambda rng: build_request('POST', '/tasks', {'title': 'APIのベンチマーク', 'category': '仕事'}),
+    }
+    counts = {}
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(port, requests[scenario], deadline, counts) for _ in range(connections)))
+    return {'elapsed': time.perf_counter() - start, 'counts': counts}
+
+
+def client_main(args):
+    result = asyncio.run(run_client(args.port, args.scenario, args.connections, args.seconds, args.etag,
+                                    args.max_id))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカル API のベンチマーク")
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    # 以下はクライアントのプロセス用
+    parser.add_argument('--client', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    parser.add_argument('--etag', help=argparse.SUPPRESS)
+    parser.add_argument('--max-id', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.client:
+        client_main(args)
+        return
+
+    store = TaskStore(generate_tasks(args.size), CATEGORIES)
+    server = ApiServer(store)
+    server.start()
+    print(f"{args.size:,}件 / 接続数 {args.connections}")
+    print(f"{'要求':<10} {'件/秒':>10}  応答")
+    failed = False
+    try:
+        for scenario in ('get_304', 'get_page', 'get_task', 'complete', 'create'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--client', '--port', str(server.port),
+                 '--scenario', scenario, '--connections', str(args.connections), '--seconds', str(args.seconds),
+                 '--etag', server.etag(), '--max-id', str(args.size)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output)
+            total = sum(result['counts'].values())
+            rate = total / result['elapsed']
+            failed = failed or rate < TARGET
+            counts = ' '.join(f'{status}:{count:,}' for status, count in sorted(result['counts'].items()))
+            print(f"{scenario:<10} {rate:>10,.0f}  {counts}")
+    finally:
+        server.stop()
+    if failed:
+        print(f"目標（{TARGET:,}件/秒）に届かない要求があります")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
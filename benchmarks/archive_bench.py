@@ -0,0 +1,84 @@
+# 完了したタスクのアーカイブの効果の計測
+# 1年分のタスク（古いものほど完了している、generate.py）のうち、作成から --days 日以上経った
+# 完了済みのタスクをアーカイブに移し、移す前と後で tasks.json の大きさ・読み込み・保存の時間を比べる。
+# あわせて「完了済のみ」の表示（ArchivedView）の最初のページと、任意の位置のページを読む時間を計測する。
+# 使い方: python benchmarks/archive_bench.py [--sizes 100000 1000000] [--days 30] [--compression gzip]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import Archive, ArchivedView, archive_completed
+from storage import JsonStorage, write_snapshot
+from task_store import TaskStore
+
+from generate import CATEGORIES, generate_tasks
+
+PAGE = 300
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def load(path):
+    data = JsonStorage(path).load()
+    return TaskStore(data['tasks'], data['categories'], data['next_id'])
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def bench(size, days, compression, directory):
+    path = os.path.join(directory, 'tasks.json')
+    write_snapshot(path, {'tasks': generate_tasks(size), 'categories': CATEGORIES, 'next_id': size + 1})
+    before_size = os.path.getsize(path)
+    before_load, store = timed(lambda: load(path))
+    before_save, _ = timed(lambda: write_snapshot(path, store.snapshot()))
+
+    archive = Archive(os.path.join(directory, 'tasks.archive'), compression=compression)
+    archive_time, moved = timed(lambda: archive_completed(store, archive, time.time() - days * 86400))
+    write_snapshot(path, store.snapshot())
+    after_size = os.path.getsize(path)
+    after_load, store = timed(lambda: load(path))
+    after_save, _ = timed(lambda: write_snapshot(path, store.snapshot()))
+
+    # 「完了済のみ」: ストアの完了済みのタスクの後にアーカイブが続く
+    view = ArchivedView(store.query(status='completed'), Archive(archive.directory), store)
+    first_page, _ = timed(lambda: view[:PAGE])
+    rng = random.Random(size)
+    pages = []
+    for _ in range(20):
+        # 展開済みのセグメントを使わないように、毎回新しく開き直す
+        cold = ArchivedView(store.query(status='completed'), Archive(archive.directory), store)
+        start = rng.randrange(max(len(cold) - PAGE, 1))
+        pages.append(timed(lambda: cold[start:start + PAGE])[0])
+
+    print(f"{size:>9,}件  アーカイブ {len(moved):,}件（{archive_time:.2f}s、{directory_size(archive.directory) / 1e6:.1f}MB）")
+    print(f"  tasks.json   {before_size / 1e6:8.1f}MB -> {after_size / 1e6:8.1f}MB")
+    print(f"  読み込み     {before_load * 1000:8.0f}ms -> {after_load * 1000:8.0f}ms")
+    print(f"  保存         {before_save * 1000:8.0f}ms -> {after_save * 1000:8.0f}ms")
+    print(f"  完了済のみ   最初のページ {first_page * 1000:.1f}ms、"
+          f"任意の位置のページ 中央値 {sorted(pages)[len(pages) // 2] * 1000:.1f}ms / 最大 {max(pages) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アーカイブのベンチマーク")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--compression', choices=('gzip', 'lzma'), default='gzip')
+    args = parser.parse_args()
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            bench(size, args.days, args.compression, directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# 画面のない環境で TreeRenderer を動かすための Treeview の代わり
+# TreeRenderer が使う操作だけを受け付け、行の内容を辞書に持つ。
+
+
+class FakeTree:
+    def __init__(self):
+        self.rows = {}
+        self.operations = 0
+
+    def configure(self, **options):
+        pass
+
+    def insert(self, parent, index, iid, values, tags):
+        self.rows[iid] = values
+        self.operations += 1
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.rows[iid]
+        self.operations += len(iids)
+
+    def move(self, iid, parent, index):
+        self.operations += 1
+
+    def item(self, iid, values, tags):
+        self.rows[iid] = values
+        self.operations += 1
+
+    def yview(self, *args):
+        return (0.0, 1.0)
+
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        pass
@@ -0,0 +1,57 @@
+# ベンチマーク用のタスクを生成する
+# カテゴリ・優先度・状態・リマインドの偏りは実際の使い方に近づけてある
+# （仕事が多い・「中」が多い・古いタスクほど完了している・リマインドは一部の未完了タスクだけ）。
+# 使い方: python benchmarks/generate.py 件数 > tasks.jsonl   （cli.py import で取り込める）
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_model import Task
+
+CATEGORIES = ["仕事", "家事", "趣味", "勉強", "その他"]
+CATEGORY_WEIGHTS = [40, 25, 15, 12, 8]
+PRIORITIES = ["高", "中", "低"]
+PRIORITY_WEIGHTS = [20, 55, 25]
+WORDS = ["資料", "会議", "買い物", "掃除", "洗濯", "報告書", "メール", "予約", "支払い", "英語",
+         "読書", "練習", "準備", "確認", "連絡", "整理", "修正", "提出", "review", "deploy"]
+VERBS = ["を作成", "の準備", "を確認", "を送る", "を片付ける", "の見直し", "を進める", "を終わらせる"]
+
+# 作成日時を分布させる期間（秒）と、リマインドを設定する未完了タスクの割合
+SPAN = 365 * 24 * 3600
+REMINDER_RATE = 0.15
+
+
+def generate_tasks(count, seed=0, now=None):
+    # 1件目が最も古く、IDの順に作成日時が新しくなる
+    rng = random.Random(seed)
+    now = int(now if now is not None else time.time())
+    categories = rng.choices(CATEGORIES, CATEGORY_WEIGHTS, k=count)
+    priorities = rng.choices(PRIORITIES, PRIORITY_WEIGHTS, k=count)
+    for i in range(count):
+        age = (count - i) / count
+        created_at = now - int(SPAN * age) - rng.randrange(3600)
+        # 古いタスクほど完了している（最も古いもので9割、最新のもので1割）
+        status = 'completed' if rng.random() < 0.1 + 0.8 * age else 'active'
+        reminder = None
+        if status == 'active' and rng.random() < REMINDER_RATE:
+            # 期限切れ・直近・数日先が混ざるように前後1週間に散らす
+            reminder = now + rng.randrange(-7 * 86400, 7 * 86400) // 60 * 60
+        title = f"{rng.choice(WORDS)}{rng.choice(VERBS)} #{i + 1}"
+        yield Task(i + 1, title, categories[i], priorities[i], status, created_at, reminder)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    sys.stdout.reconfigure(encoding='utf-8')
+    for task in generate_tasks(count):
+        data = task.to_dict()
+        del data['id']
+        sys.stdout.write(json.dumps(data, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
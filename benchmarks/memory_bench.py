@@ -0,0 +1,56 @@
+# 100万件のタスクを tasks.json から読み込んだ辞書のまま持つ場合と Task で持つ場合のメモリ使用量を比べる
+# 使い方: python benchmarks/memory_bench.py [件数]
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_model import Task
+
+CATEGORIES = ["仕事", "個人", "買い物", "勉強", "その他"]
+PRIORITIES = ["高", "中", "低"]
+
+
+def sample_json(count):
+    # tasks.json と同じ形式の文字列（読み込み時と同じく、行ごとに別の文字列オブジェクトになる）
+    lines = []
+    for i in range(1, count + 1):
+        lines.append(json.dumps({
+            'id': i,
+            'title': f'タスク {i}',
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'priority': PRIORITIES[i % len(PRIORITIES)],
+            'status': 'completed' if i % 4 == 0 else 'active',
+            'created_at': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d}',
+            'reminder': f'2024-06-{i % 28 + 1:02d} 09:00' if i % 10 == 0 else '未設定'
+        }, ensure_ascii=False))
+    return lines
+
+
+def measure(label, build, lines):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = build(lines)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label}: {size / 1024 / 1024:8.1f} MB  {size / len(tasks):6.0f} B/件  {elapsed:6.2f} 秒')
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lines = sample_json(count)
+    print(f'{count:,}件')
+    dict_size = measure('辞書', lambda lines: [json.loads(line) for line in lines], lines)
+    task_size = measure('Task', lambda lines: [Task.from_dict(json.loads(line)) for line in lines], lines)
+    print(f'削減率: {1 - task_size / dict_size:.0%}')
+
+
+if __name__ == '__main__':
+    main()
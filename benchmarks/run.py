@@ -0,0 +1,302 @@
+# タスク操作の主要な処理のベンチマーク（Tkを使わずにストア・保存方式・差分描画を直接計測する）
+# 計測する処理（main.py の対応するメソッド）:
+#   load_tasks       保存方式ごとの読み込み（storage.load + TaskStore.load）
+#   save_tasks       保存方式ごとの保存（json は全体の書き直し、journal・sqlite は1件の変更の書き込み）
+#   add_task         1件の追加と再表示
+#   delete_task      複数選択（1 / 100 / 1000件）の削除と再表示
+#   complete_task    複数選択（1 / 100 / 1000件）の完了と再表示
+#   undo_delete      複数選択（1 / 1000 / 10000件）の削除を元に戻す操作と再表示（削除と同じ程度の時間で済むこと）
+#   display_tasks    状態・カテゴリ・優先度のすべての組み合わせと検索語での絞り込みと描画
+#   sort_tasks       列見出しのクリックでの並べ替えと描画（インデックスの作成を含む初回と2回目以降、
+#                    絞り込みとの組み合わせ、並べ替えた表示での完了）
+#   check_reminders  リマインダーの登録（全未完了タスク）と時刻になったものの取り出し
+#   advance_recurring 繰り返すタスク（未完了の最大5万件に規則を設定）のうち1000件を次の予定に進める
+# 結果はJSONで出力する。--baseline に以前の結果を渡すと、中央値が --threshold 倍を超えて
+# 遅くなった項目を表示して終了コード1で終了する（リリース間の性能の後退の検出用）。
+# 使い方: python benchmarks/run.py [--sizes 1000 10000 ...] [--output results.json] [--baseline old.json]
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import History, Restore
+from reminder_scheduler import ReminderScheduler
+from storage import open_storage, write_snapshot
+from task_model import PRIORITIES, format_time
+from task_store import TaskStore
+from tree_renderer import TreeRenderer
+
+from fake_tree import FakeTree, FakeScrollbar
+from generate import CATEGORIES, generate_tasks
+
+SIZES = [1000, 10000, 100000, 1000000]
+STORAGE_MODES = ['json', 'journal', 'sqlite']
+SELECTION_SIZES = [1, 100, 1000]
+UNDO_SIZES = [1, 1000, 10000]
+RECURRING_COUNT = 50000
+RECURRING_RULES = ['0 9 * * *', '30 18 * * 1-5', '0 8 * * 1,4', '0 0 1 * *', '*/15 9-17 * * 1-5']
+SEARCH_TEXTS = ['会議', '確認 #1', 'deploy']
+SORT_ORDERS = [
+    (('priority', False), ('reminder', False), ('created_at', False)),
+    (('title', True),),
+    (('created_at', True),)
+]
+
+
+def row_values(task):
+    # main.TodoApp.task_row_values と同じ内容
+    return (
+        task.id,
+        task.title,
+        task.category,
+        task.priority,
+        '完了' if task.status == 'completed' else '未完了',
+        format_time(task.created_at),
+        format_time(task.reminder)
+    )
+
+
+class Display:
+    # TodoApp.display_tasks と同じ流れ（絞り込み → 差分描画）
+    def __init__(self, store):
+        self.store = store
+        self.tree = FakeTree()
+        self.renderer = TreeRenderer(self.tree, FakeScrollbar(), row_values, lambda task: ())
+
+    def show(self, status=None, category=None, priority=None, text=None, order=None):
+        self.renderer.render(self.store.query(status, category, priority, text, order))
+
+
+class Runner:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, size, name, func, setup=None, teardown=None, **params):
+        # setup・teardown は計測に含めない（破壊的な操作の後で元の状態に戻すため）
+        # timeit と同じく、計測中はガベージコレクションを止める
+        times = []
+        for _ in range(self.repeat):
+            arg = setup() if setup is not None else None
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                func(arg) if setup is not None else func()
+                times.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+            if teardown is not None:
+                teardown(arg)
+        result = {
+            'size': size,
+            'name': name,
+            'params': params,
+            'min': min(times),
+            'median': statistics.median(times),
+            'times': times
+        }
+        self.results.append(result)
+        label = ' '.join(f'{key}={value}' for key, value in params.items())
+        print(f'{size:>9,} {name:<16} {label:<40} {result["median"] * 1000:10.2f}ms', file=sys.stderr)
+        return result
+
+
+def load_store(storage):
+    data = storage.load()
+    store = TaskStore()
+    store.load(data['tasks'], data.get('categories'), data.get('next_id'))
+    return store
+
+
+def bench_storage(runner, size, directory, modes):
+    for mode in modes:
+        path = os.path.join(directory, f'{mode}.json')
+        write_snapshot(path, {'tasks': generate_tasks(size), 'categories': CATEGORIES, 'next_id': size + 1})
+        storage = open_storage(mode, path)
+        if mode == 'sqlite':
+            # 初回の移行は計測しない
+            storage.open()
+        runner.measure(size, 'load_tasks', lambda: load_store(storage), storage=mode)
+
+        store = load_store(storage)
+        storage.attach(store)
+        task_ids = list(store.ids(status='active'))
+        rng = random.Random(size)
+
+        def change_one():
+            store.toggle_status(rng.choice(task_ids))
+
+        runner.measure(size, 'save_tasks', lambda arg: storage.save(store), setup=change_one, storage=mode)
+        storage.close(store)
+
+
+def bench_operations(runner, size):
+    store = TaskStore(generate_tasks(size), CATEGORIES)
+    display = Display(store)
+    display.show()
+    rng = random.Random(size)
+    now = int(time.time())
+
+    def add():
+        store.add('ベンチマークのタスク', '仕事', '中', now)
+        display.show()
+
+    runner.measure(size, 'add_task', add)
+
+    for count in SELECTION_SIZES:
+        # 選択する件数は未完了のタスクの件数まで
+        if count > store.count(status='active'):
+            continue
+
+        def select(count=count):
+            return rng.sample(sorted(store.ids()), count)
+
+        removed = []
+
+        def delete(task_ids):
+            removed.append(store.delete_many(task_ids))
+            display.show()
+
+        def restore(task_ids):
+            store.extend(removed.pop())
+
+        runner.measure(size, 'delete_task', delete, setup=select, teardown=restore, selection=count)
+
+        def complete(task_ids):
+            store.complete_many(task_ids)
+            display.show()
+
+        def reopen(task_ids):
+            for task_id in task_ids:
+                store.update(task_id, status='active')
+
+        runner.measure(size, 'complete_task', complete,
+                       setup=lambda count=count: rng.sample(sorted(store.ids(status='active')), count),
+                       teardown=reopen, selection=count)
+
+    history = History()
+    for count in UNDO_SIZES:
+        if count > len(store):
+            continue
+
+        def delete_selection(count=count):
+            history.record("削除", Restore(store.delete_many(rng.sample(sorted(store.ids()), count))))
+            display.show()
+
+        def undo(arg):
+            history.undo(store)
+            display.show()
+
+        runner.measure(size, 'undo_delete', undo, setup=delete_selection, selection=count)
+
+    for status, category, priority in itertools.product([None, 'active', 'completed'],
+                                                        [None] + CATEGORIES, [None] + PRIORITIES):
+        runner.measure(size, 'display_tasks', lambda: Display(store).show(status, category, priority),
+                       status=status or '*', category=category or '*', priority=priority or '*')
+    for text in SEARCH_TEXTS:
+        runner.measure(size, 'display_tasks', lambda: Display(store).show(text=text), text=text)
+
+    for order in SORT_ORDERS:
+        label = ','.join(('-' if descending else '') + column for column, descending in order)
+        # 初回はインデックスを作る（計測の前に捨てておく）
+        runner.measure(size, 'sort_tasks', lambda arg: Display(store).show(order=order),
+                       setup=lambda: store._sorts.pop(order, None), order=label, index='new')
+        runner.measure(size, 'sort_tasks', lambda: Display(store).show(order=order), order=label, index='kept')
+        runner.measure(size, 'sort_tasks', lambda: Display(store).show(status='active', order=order),
+                       order=label, index='kept', status='active')
+        runner.measure(size, 'sort_tasks', lambda: Display(store).show(category=CATEGORIES[-1], priority='高',
+                                                                        order=order),
+                       order=label, index='kept', category=CATEGORIES[-1], priority='高')
+        display = Display(store)
+        display.show(order=order)
+
+        def complete_sorted():
+            store.toggle_status(rng.choice(sorted(store.ids(status='active'))))
+            display.show(order=order)
+
+        runner.measure(size, 'sort_tasks', complete_sorted, order=label, index='kept', change='complete')
+
+    def check_reminders():
+        scheduler = ReminderScheduler(lambda task_ids: None)
+        scheduler.load(store.query(status='active'))
+        with scheduler._cond:
+            scheduler._pop_due(time.time())
+
+    runner.measure(size, 'check_reminders', check_reminders)
+
+    active = sorted(store.ids(status='active'))
+    recurring = rng.sample(active, min(RECURRING_COUNT, len(active)))
+    for task_id in recurring:
+        store.set_repeat(task_id, rng.choice(RECURRING_RULES), now)
+    runner.measure(size, 'advance_recurring', lambda task_ids: store.complete_many(task_ids),
+                   setup=lambda: rng.sample(recurring, min(1000, len(recurring))), recurring=len(recurring))
+
+
+def key(result):
+    return (result['size'], result['name'], json.dumps(result['params'], sort_keys=True, ensure_ascii=False))
+
+
+def compare(results, baseline_path, threshold):
+    # 以前の結果と中央値を比べ、threshold 倍を超えて遅くなった項目を返す
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {key(result): result for result in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get(key(result))
+        if old is not None and result['median'] > old['median'] * threshold:
+            regressions.append((result, old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タスク操作のベンチマーク")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--storage', nargs='+', choices=STORAGE_MODES, default=STORAGE_MODES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="結果のJSONの出力先（省略時は標準出力）")
+    parser.add_argument('--baseline', help="比較する以前の結果のJSON")
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    runner = Runner(args.repeat)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            bench_storage(runner, size, directory, args.storage)
+        bench_operations(runner, size)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'results': runner.results
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.reconfigure(encoding='utf-8')
+        print(text)
+
+    if args.baseline:
+        regressions = compare(runner.results, args.baseline, args.threshold)
+        for result, old in regressions:
+            print(f"遅くなりました: {key(result)} {old['median'] * 1000:.2f}ms -> {result['median'] * 1000:.2f}ms",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
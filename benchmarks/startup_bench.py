@@ -0,0 +1,95 @@
+# 起動時間の計測（10k / 100k / 1M 件）
+# 従来の「全件を読み込んでから表示する」方法と、最初のページを表示してから残りを読み込む方法を比べる。
+# それぞれ tasks.json を解析する場合と、バイナリのキャッシュ（tasks.json.snapshot）から読む場合を計測する。
+# 画面がない環境でも動くように、Treeview の代わりに fake_tree.FakeTree を使う。
+# 目標: 最初のページの表示まで 200ms 以内（件数によらない）
+# 使い方: python benchmarks/startup_bench.py [件数 ...]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import open_storage, write_snapshot
+from task_store import TaskStore
+from tree_renderer import TreeRenderer
+
+from fake_tree import FakeTree, FakeScrollbar
+from generate import CATEGORIES, generate_tasks
+
+FIRST_PAINT_TARGET = 0.2
+CHUNK_SIZE = 1000
+
+
+def row_values(task):
+    return (task.id, task.title, task.category, task.priority, task.status, task.created_at, task.reminder)
+
+
+def make_renderer():
+    tree = FakeTree()
+    return TreeRenderer(tree, FakeScrollbar(), row_values, lambda task: ())
+
+
+def write_tasks(path, count):
+    write_snapshot(path, {'tasks': generate_tasks(count), 'categories': CATEGORIES, 'next_id': count + 1})
+
+
+def import_time():
+    # main.py（とその依存モジュール）の読み込み時間
+    code = 'import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def eager_startup(path):
+    # 従来の方法: 全件を読み込んでから表示する
+    start = time.perf_counter()
+    storage = open_storage('journal', path)
+    data = storage.load()
+    store = TaskStore()
+    store.load(data['tasks'], data.get('categories'), data.get('next_id'))
+    make_renderer().render(store.query())
+    return time.perf_counter() - start
+
+
+def streaming_startup(path):
+    # TodoApp.load_next_chunk と同じ流れ: 最初のページを表示してから残りを読み込む
+    start = time.perf_counter()
+    storage = open_storage('journal', path)
+    store = TaskStore()
+    renderer = make_renderer()
+    first_paint = None
+    for data in storage.iter_load(CHUNK_SIZE):
+        if data.get('next_id'):
+            store.next_id = max(store.next_id, data['next_id'])
+        store.extend(data['tasks'])
+        if first_paint is None and len(store):
+            renderer.render(store.query())
+            first_paint = time.perf_counter() - start
+    renderer.render(store.query())
+    return first_paint, time.perf_counter() - start
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print(f'main.py の読み込み: {import_time() * 1000:.0f}ms')
+    print(f'{"件数":>10} {"":>8} {"従来(全件)":>12} {"最初の表示":>12} {"全件読み込み":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            path = os.path.join(directory, 'tasks.json')
+            write_tasks(path, count)
+            for source in ('JSON', 'キャッシュ'):
+                if source != 'JSON':
+                    open_storage('journal', path).rebuild_cache()
+                eager = eager_startup(path)
+                first_paint, total = streaming_startup(path)
+                mark = '' if first_paint <= FIRST_PAINT_TARGET else '  目標超過'
+                print(f'{count:>10,} {source:>8} {eager * 1000:>10.0f}ms {first_paint * 1000:>10.0f}ms '
+                      f'{total * 1000:>10.0f}ms{mark}')
+
+
+if __name__ == '__main__':
+    main()
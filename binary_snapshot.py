@@ -0,0 +1,282 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from task_model import Task, CATEGORY_CODES, PRIORITY_CODES, STATUS_CODES
+
+# tasks.json のバイナリのキャッシュ（tasks.json.snapshot）
+# tasks.json と同じ内容を列ごとの固定長の配列で持ち、起動時は JSON を解析せずにメモリマップして読む。
+#   ヘッダー（24バイト）  形式の識別子・版・メタ情報の長さ・チェックサム（メタ情報・位置の表・ブロックの
+#                         チェックサムの CRC32。開くときはこれだけを確かめ、ファイル全体は読まない）
+#   メタ情報（JSON）      件数・next_id・カテゴリ・元の tasks.json の識別値
+#                         （カテゴリ・優先度・状態の名前と繰り返しの規則の表もここに持つ）
+#   位置の表              各列・文字列表の先頭の位置（8バイト整数）
+#   列                    id / created_at / reminder（8バイト）、version / repeat（4バイト）、
+#                         category（2バイト）、priority / status（1バイト）。各列の先頭は8バイト境界に揃える
+#   文字列表              タイトルを行の順に並べたもの（バイト位置・文字位置の配列 + UTF-8 の本体）
+#                         まとめて読む範囲を1回で str に戻し、文字位置で切り分ける
+#   ブロックのチェックサム BLOCK_ROWS 行ごとの、その範囲の全ての列・タイトルの CRC32（4バイト）
+#                         行を初めて読むときに、その行を含むブロックだけを確かめる
+# タスクは読み出す範囲の行だけを Task に戻す（tasks() / __getitem__）。
+# 元の tasks.json の識別値（file_signature）が一致しない・ヘッダーのチェックサムが合わない場合は開かない。
+# 読み出す途中でブロックのチェックサムが合わなければ ValueError になる
+# （どちらの場合も呼び出し側が tasks.json を読み、キャッシュを作り直す）。
+
+MAGIC = b'TODOSNAP'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sIII4x')
+
+# チェックサムを持つ単位（行数）
+BLOCK_ROWS = 4096
+
+# 列の名前と型（array・memoryview の型コード）
+COLUMNS = (
+    ('id', 'q'),
+    ('created_at', 'q'),
+    ('reminder', 'q'),
+    ('version', 'I'),
+    ('repeat', 'I'),
+    ('category', 'H'),
+    ('priority', 'B'),
+    ('status', 'B')
+)
+
+# 時刻・繰り返しの規則が未設定であることを表す値
+NO_TIME = -(1 << 63)
+NO_STRING = 0xFFFFFFFF
+
+
+def cache_path(path):
+    # tasks.json のキャッシュの置き場所
+    return path + '.snapshot'
+
+
+def write_binary_snapshot(path, data, signature):
+    # data は TaskStore.snapshot() と同じ形、signature は内容の元になった tasks.json の file_signature
+    # 一時ファイルに書き出してから置き換え、書き出したバイト数を返す
+    # 名前・繰り返しの規則の表（行にはこの表の番号を持たせる）
+    names = {'category': [], 'priority': [], 'status': [], 'repeat': []}
+    codes = {key: {} for key in names}
+
+    def name_index(key, name):
+        index = codes[key].get(name)
+        if index is None:
+            index = codes[key][name] = len(names[key])
+            names[key].append(name)
+        return index
+
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    byte_offsets = array('Q', [0])
+    char_offsets = array('Q', [0])
+    titles = []
+    for task in data['tasks']:
+        columns['id'].append(task.id)
+        columns['created_at'].append(NO_TIME if task.created_at is None else task.created_at)
+        columns['reminder'].append(NO_TIME if task.reminder is None else task.reminder)
+        columns['version'].append(task.version)
+        columns['repeat'].append(NO_STRING if task.repeat is None else name_index('repeat', task.repeat))
+        columns['category'].append(name_index('category', task.category))
+        columns['priority'].append(name_index('priority', task.priority))
+        columns['status'].append(name_index('status', task.status))
+        encoded = task.title.encode('utf-8')
+        byte_offsets.append(byte_offsets[-1] + len(encoded))
+        char_offsets.append(char_offsets[-1] + len(task.title))
+        titles.append(encoded)
+
+    titles = b''.join(titles)
+    ordered = [columns[name] for name, _ in COLUMNS]
+    count = len(data['tasks'])
+    checksums = array('I', (
+        _block_checksum(ordered, byte_offsets, char_offsets, titles, start, min(start + BLOCK_ROWS, count))
+        for start in range(0, count, BLOCK_ROWS)))
+
+    # 本体の各部分（メタ情報の長さが決まるまで位置はメタ情報の後からの相対位置）
+    parts = [column.tobytes() for column in ordered]
+    parts += [byte_offsets.tobytes(), char_offsets.tobytes(), titles, checksums.tobytes()]
+    relative = []
+    position = 0
+    for part in parts:
+        relative.append(position)
+        position += len(part) + (-len(part) % 8)
+    meta = {
+        'count': count,
+        'next_id': data['next_id'],
+        'categories': list(data['categories']),
+        'names': names,
+        'source': list(signature)
+    }
+    # メタ情報の後の本体の先頭を8バイト境界に揃える
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    body_start = HEADER.size + len(meta_bytes) + 8 * (len(parts) + 1)
+    body_start += -body_start % 8
+    bounds = [body_start + offset for offset in relative] + [body_start + position]
+    table = struct.pack(f'<{len(bounds)}Q', *bounds)
+    head = meta_bytes + table + b'\0' * (body_start - HEADER.size - len(meta_bytes) - len(table))
+
+    # 位置の表の最後の区切りはブロックのチェックサムの末尾（8バイト境界まで）
+    checksum = zlib.crc32(parts[-1] + b'\0' * (-len(parts[-1]) % 8), zlib.crc32(head))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes), checksum))
+        f.write(head)
+        for part in parts:
+            f.write(part)
+            f.write(b'\0' * (-len(part) % 8))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def _block_checksum(columns, byte_offsets, char_offsets, titles, start, stop):
+    # start 行目から stop 行目の手前までの、全ての列・タイトルの CRC32（書き出し・読み込みで共通）
+    checksum = 0
+    for column in columns:
+        checksum = zlib.crc32(column[start:stop], checksum)
+    checksum = zlib.crc32(byte_offsets[start:stop + 1], checksum)
+    checksum = zlib.crc32(char_offsets[start:stop + 1], checksum)
+    return zlib.crc32(titles[byte_offsets[start]:byte_offsets[stop]], checksum)
+
+
+def open_binary_snapshot(path, signature):
+    # 使えるキャッシュなら BinarySnapshot を返す（ない・古い・壊れている場合はNone）
+    if signature is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        snapshot = BinarySnapshot(mapped)
+    except (ValueError, KeyError, TypeError, struct.error):
+        try:
+            mapped.close()
+        except BufferError:
+            # 途中まで作ったメモリビューが残っている場合は、それが解放されたときに閉じられる
+            pass
+        return None
+    if snapshot.source != list(signature):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+class BinarySnapshot:
+    # メモリマップしたキャッシュ（行は読み出すときに Task に戻す）
+    def __init__(self, mapped):
+        self._mapped = mapped
+        if len(mapped) < HEADER.size:
+            raise ValueError("キャッシュが短すぎます")
+        magic, version, meta_length, checksum = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("キャッシュの形式が違います")
+        bounds = struct.unpack_from(f'<{len(COLUMNS) + 5}Q', mapped, HEADER.size + meta_length)
+        if list(bounds) != sorted(bounds) or bounds[0] < HEADER.size + meta_length or bounds[-1] > len(mapped):
+            raise ValueError("キャッシュが途中で切れています")
+        if zlib.crc32(mapped[bounds[-2]:bounds[-1]], zlib.crc32(mapped[HEADER.size:bounds[0]])) != checksum:
+            raise ValueError("キャッシュのチェックサムが一致しません")
+        meta = json.loads(mapped[HEADER.size:HEADER.size + meta_length])
+        self.count = meta['count']
+        self.next_id = meta['next_id']
+        self.categories = meta['categories']
+        self.source = meta['source']
+        self._view = memoryview(mapped)
+        self._columns = {}
+        for i, (name, typecode) in enumerate(COLUMNS):
+            size = array(typecode).itemsize * self.count
+            self._columns[name] = self._view[bounds[i]:bounds[i] + size].cast(typecode)
+        self._byte_offsets = self._view[bounds[-5]:bounds[-5] + 8 * (self.count + 1)].cast('Q')
+        self._char_offsets = self._view[bounds[-4]:bounds[-4] + 8 * (self.count + 1)].cast('Q')
+        self._titles = self._view[bounds[-3]:bounds[-2]]
+        blocks = -(-self.count // BLOCK_ROWS)
+        self._checksums = self._view[bounds[-2]:bounds[-2] + 4 * blocks].cast('I')
+        # 確かめ終えたブロック
+        self._verified = bytearray(blocks)
+        self._rules = [sys.intern(rule) for rule in meta['names']['repeat']]
+        # 名前の表の番号 -> 対応表（task_model）のコード
+        self._codes = {
+            'category': [CATEGORY_CODES.code(name) for name in meta['names']['category']],
+            'priority': [PRIORITY_CODES.code(name) for name in meta['names']['priority']],
+            'status': [STATUS_CODES.code(name) for name in meta['names']['status']]
+        }
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.tasks(index, index + 1)[0]
+
+    def _verify(self, start, stop):
+        # start 行目から stop 行目の手前までを含むブロックのうち、まだ確かめていないものを確かめる
+        ordered = [self._columns[name] for name, _ in COLUMNS]
+        for block in range(start // BLOCK_ROWS, -(-stop // BLOCK_ROWS)):
+            if self._verified[block]:
+                continue
+            first = block * BLOCK_ROWS
+            last = min(first + BLOCK_ROWS, self.count)
+            if _block_checksum(ordered, self._byte_offsets, self._char_offsets, self._titles,
+                               first, last) != self._checksums[block]:
+                raise ValueError("キャッシュのチェックサムが一致しません")
+            self._verified[block] = 1
+
+    def ids(self, start, stop):
+        self._verify(start, stop)
+        return self._columns['id'][start:stop].tolist()
+
+    def titles(self, start, stop):
+        # start 行目から stop 行目の手前までのタイトル（UTF-8 の本体はまとめて1回で戻す）
+        self._verify(start, stop)
+        text = str(self._titles[self._byte_offsets[start]:self._byte_offsets[stop]], 'utf-8')
+        offsets = self._char_offsets[start:stop + 1].tolist()
+        base = offsets[0]
+        return [text[begin - base:end - base] for begin, end in zip(offsets, offsets[1:])]
+
+    def tasks(self, start, stop):
+        # start 行目から stop 行目の手前までを Task に戻す（列ごとにまとめて取り出してから組み立てる）
+        self._verify(start, stop)
+        columns = {name: column[start:stop].tolist() for name, column in self._columns.items()}
+        category_codes = self._codes['category']
+        priority_codes = self._codes['priority']
+        status_codes = self._codes['status']
+        rules = self._rules
+        tasks = []
+        for task_id, created_at, reminder, version, repeat, category, priority, status, title in zip(
+                *(columns[name] for name, _ in COLUMNS), self.titles(start, stop)):
+            task = Task.__new__(Task)
+            task.id = task_id
+            task.title = title
+            task._category = category_codes[category]
+            task._priority = priority_codes[priority]
+            task._status = status_codes[status]
+            task.created_at = None if created_at == NO_TIME else created_at
+            task.reminder = None if reminder == NO_TIME else reminder
+            task.version = version
+            task.repeat = None if repeat == NO_STRING else rules[repeat]
+            tasks.append(task)
+        return tasks
+
+    def chunks(self, chunk_size):
+        for start in range(0, self.count, chunk_size):
+            yield self.tasks(start, min(start + chunk_size, self.count))
+
+    def close(self):
+        # メモリビューを解放してからマップを閉じる（Windows では閉じるまでファイルを置き換えられない）
+        for column in self._columns.values():
+            column.release()
+        self._byte_offsets.release()
+        self._char_offsets.release()
+        self._titles.release()
+        self._checksums.release()
+        self._view.release()
+        self._mapped.close()
@@ -0,0 +1,233 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from archive import Archive, archive_completed, archive_directory
+from storage import open_storage
+from task_model import Task, PRIORITIES, TIME_FORMAT, normalize_row
+from task_store import TaskStore
+
+# 入出力する列（tasks.json のタスクと同じ）
+COLUMNS = ('id', 'title', 'category', 'priority', 'status', 'created_at', 'reminder', 'repeat')
+
+
+def load_store(storage):
+    store = TaskStore()
+    data = storage.load()
+    if data is not None:
+        store.load(data.get('tasks', []), data.get('categories'), data.get('next_id'))
+    return store
+
+
+def read_rows(stream, fmt):
+    # 標準入力から1行ずつ読み出す（入力全体をメモリに読み込まない）
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def valid_rows(rows, now):
+    for line_number, row in enumerate(rows, 1):
+        try:
+            yield normalize_row(row, now)
+        except (ValueError, OverflowError) as e:
+            print(f"{line_number}行目をスキップしました: {e}", file=sys.stderr)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_header(storage):
+    # カテゴリと next_id だけを読む（iter_load の最初の要素。タスクは読み込まない）
+    chunks = storage.iter_load()
+    try:
+        return next(chunks, None) or {}
+    finally:
+        chunks.close()
+
+
+def cmd_import(storage, args):
+    if hasattr(storage, 'append_tasks'):
+        # 既存のタスクは読み込まずに採番とカテゴリだけを使い、取り込んだタスクもメモリに残さない
+        header = load_header(storage)
+        store = TaskStore(categories=header.get('categories'), next_id=header.get('next_id'))
+    else:
+        store = load_store(storage)
+    now = int(time.time())
+    rows = valid_rows(read_rows(sys.stdin, args.format), now)
+    categories = store.categories
+    known = set(categories)
+    count = 0
+
+    if hasattr(storage, 'append_tasks'):
+        next_id = store.next_id
+        for chunk in chunked(rows, args.chunk_size):
+            # 同じ tasks.json を使っているアプリとIDが重ならないように予約する
+            if hasattr(storage, 'reserve_ids'):
+                next_id = storage.reserve_ids(next_id, len(chunk))
+            tasks = []
+            for item in chunk:
+                tasks.append(Task(next_id, item['title'], item['category'], item['priority'],
+                                  item['status'], item['created_at'], item['reminder'], repeat=item['repeat']))
+                next_id += 1
+            new_categories = {task.category for task in tasks} - known
+            if new_categories:
+                categories.extend(sorted(new_categories))
+                known.update(new_categories)
+            storage.append_tasks(tasks, categories if new_categories else None)
+            count += len(tasks)
+        # close() で next_id を書き込む方式（SQLite）が取り込む前の値に戻さないように進めておく
+        store.load([], next_id=next_id)
+        # 圧縮の閾値を超えたジャーナルは、次にアプリを起動したときに保存スレッドが tasks.json にまとめる
+        # （ここで圧縮すると、取り込んだタスクも含めて全件をメモリに読み込むことになる）
+    else:
+        # 毎回全体を書き直す方式では、すべて追加してから1回だけ保存する
+        storage.attach(store)
+        for chunk in chunked(rows, args.chunk_size):
+            for item in chunk:
+                if item['category'] not in known:
+                    store.add_category(item['category'])
+                    known.add(item['category'])
+            count += len(store.add_many(chunk))
+        storage.save(store)
+
+    storage.close(store)
+    print(f"{count:,}件のタスクを取り込みました。", file=sys.stderr)
+
+
+def cmd_export(storage, args):
+    filters = {'status': args.status, 'category': args.category, 'priority': args.priority}
+    if hasattr(storage, 'filter'):
+        # インデックスを使ったクエリで少しずつ読み出す
+        storage.open()
+        tasks = storage.filter(**filters)
+        hot_ids = lambda: {task.id for task in storage.filter()}
+    else:
+        store = load_store(storage)
+        tasks = store.query(**filters)
+        hot_ids = lambda: store
+
+    if args.archived and args.status != 'active':
+        tasks = with_archived(tasks, Archive(archive_directory(args.file)), hot_ids, args.category, args.priority)
+
+    out = sys.stdout
+    if args.format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for task in tasks:
+            writer.writerow(task.to_dict())
+    else:
+        for task in tasks:
+            out.write(json.dumps(task.to_dict(), ensure_ascii=False) + '\n')
+    out.flush()
+
+
+def with_archived(tasks, archive, hot_ids, category, priority):
+    # tasks の後にアーカイブしたタスクを続ける
+    # アーカイブ後に変更されて tasks.json に残っているもの（hot_ids() に含まれるID）は除く
+    yield from tasks
+    hot = hot_ids()
+    for task in archive:
+        if (task.id not in hot and (category is None or task.category == category)
+                and (priority is None or task.priority == priority)):
+            yield task
+
+
+def cmd_archive(storage, args):
+    # 作成から --days 日以上経った完了済みのタスクをアーカイブに移す
+    store = load_store(storage)
+    storage.attach(store)
+    archive = Archive(archive_directory(args.file), compression=args.compression)
+    moved = archive_completed(store, archive, time.time() - args.days * 86400)
+    storage.save(store)
+    storage.close(store)
+    print(f"{len(moved):,}件のタスクをアーカイブしました。", file=sys.stderr)
+
+
+def cmd_update(storage, args):
+    # complete / delete / remind: 指定したIDのタスクをまとめて変更して1回だけ保存する
+    store = load_store(storage)
+    storage.attach(store)
+    if args.command == 'complete':
+        changed = store.complete_many(args.ids)
+    elif args.command == 'delete':
+        changed = store.delete_many(args.ids)
+    else:
+        changed = store.set_reminders_many(args.ids, args.at)
+    storage.save(store)
+    storage.close(store)
+    print(f"{len(changed):,}件のタスクを変更しました。", file=sys.stderr)
+
+
+def reminder_time(value):
+    # リマインド時刻の文字列をエポック秒に変換する
+    return int(time.mktime(time.strptime(value, TIME_FORMAT)))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ToDo アプリのタスクをコマンドラインで操作します")
+    parser.add_argument('--file', default='tasks.json', help="タスクデータのファイル（既定: tasks.json）")
+    parser.add_argument('--storage', default=os.environ.get('TODO_STORAGE', 'journal'),
+                        choices=('journal', 'json', 'sqlite'), help="保存方式")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="標準入力のタスクを取り込む")
+    import_parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    import_parser.add_argument('--chunk-size', type=int, default=10000, help="1回に書き込む件数")
+
+    export_parser = commands.add_parser('export', help="タスクを標準出力に書き出す")
+    export_parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    export_parser.add_argument('--status', choices=('active', 'completed'))
+    export_parser.add_argument('--category')
+    export_parser.add_argument('--priority', choices=PRIORITIES)
+    export_parser.add_argument('--archived', action='store_true', help="アーカイブした完了済みのタスクも書き出す")
+
+    archive_parser = commands.add_parser('archive', help="古い完了済みのタスクをアーカイブに移す")
+    archive_parser.add_argument('--days', type=float, default=30, help="作成から何日以上経ったものを移すか（既定: 30）")
+    archive_parser.add_argument('--compression', choices=('gzip', 'lzma'), default='gzip')
+
+    for name, help_text in (('complete', "タスクを完了にする"), ('delete', "タスクを削除する"),
+                            ('remind', "リマインドを設定する")):
+        update_parser = commands.add_parser(name, help=help_text)
+        update_parser.add_argument('ids', type=int, nargs='+', metavar='ID')
+        if name == 'remind':
+            update_parser.add_argument('--at', required=True, type=reminder_time, help="リマインド時刻（YYYY-MM-DD HH:MM）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # タイトルは日本語が中心なので、入出力はUTF-8に揃える
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    storage = open_storage(args.storage, args.file)
+    if args.command == 'import':
+        cmd_import(storage, args)
+    elif args.command == 'archive':
+        cmd_archive(storage, args)
+    elif args.command == 'export':
+        try:
+            cmd_export(storage, args)
+        except BrokenPipeError:
+            # head などで出力を途中で閉じられた場合は静かに終了する
+            sys.stdout = open(os.devnull, 'w')
+    else:
+        cmd_update(storage, args)
+
+
+if __name__ == "__main__":
+    main()
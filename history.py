@@ -0,0 +1,190 @@
+from collections import deque
+
+# 元に戻す・やり直すための操作の履歴
+# 操作ごとに「その操作を打ち消す操作」（逆操作）だけを記録する。逆操作は変更したタスクの分の
+# 最小限の差分（削除したタスク・変更前の値）だけを持ち、適用すると、さらにそれを打ち消す操作を返す。
+# 元に戻すと逆操作の逆操作がやり直しの履歴に積まれるので、やり直しも同じ仕組みで行う。
+# 適用はストアの通常の変更として行うので、保存・再表示は他の変更と同じ経路（変更のあったタスクだけ）になる。
+#   Delete        タスクを削除する（追加の逆操作）
+#   Restore       削除したタスクを同じIDで戻す（削除の逆操作）
+#   SetValues     タスクの1つの属性を変更する（完了の切り替え・リマインド・カテゴリの付け替えの逆操作）
+#   AddCategory / RemoveCategory  カテゴリの追加・削除
+#   Batch         複数の逆操作をまとめたもの（カテゴリの削除 = 付け替え + 削除 など）
+
+# 保持する操作の数と、保持する差分の合計（タスクの件数）の上限（超えたら古い操作から捨てる）
+HISTORY_LIMIT = 100
+HISTORY_SIZE = 200000
+
+
+class Delete:
+    # ids: 削除するタスクID
+    __slots__ = ('ids',)
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def apply(self, store):
+        return Restore(store.delete_many(self.ids))
+
+
+class Restore:
+    # tasks: 削除したタスク（TaskStore.delete の戻り値をそのまま持つ）
+    __slots__ = ('tasks',)
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+    @property
+    def size(self):
+        return len(self.tasks)
+
+    def apply(self, store):
+        return Delete([task.id for task in store.restore_many(self.tasks)])
+
+
+class SetValues:
+    # field の値を変更する。items: [(タスクID, 現在の値, 変更後の値)]
+    # （現在の値が記録したときと違うタスクは、他で変更されたものとして変更しない）
+    __slots__ = ('field', 'items')
+
+    def __init__(self, field, items):
+        self.field = field
+        self.items = items
+
+    @property
+    def size(self):
+        return len(self.items)
+
+    def apply(self, store):
+        field = self.field
+        inverse = []
+        with store.lock:
+            for task_id, expected, value in self.items:
+                task = store.get(task_id)
+                if task is None or getattr(task, field) != expected:
+                    continue
+                store.update(task_id, **{field: value})
+                inverse.append((task_id, value, expected))
+        return SetValues(field, inverse)
+
+
+class AddCategory:
+    __slots__ = ('category', 'position')
+
+    def __init__(self, category, position=None):
+        self.category = category
+        self.position = position
+
+    size = 1
+
+    def apply(self, store):
+        with store.lock:
+            if self.category in store.categories:
+                return Batch([])
+            store.add_category(self.category, self.position)
+            return RemoveCategory(self.category)
+
+
+class RemoveCategory:
+    __slots__ = ('category',)
+
+    def __init__(self, category):
+        self.category = category
+
+    size = 1
+
+    def apply(self, store):
+        with store.lock:
+            if self.category not in store.categories:
+                return Batch([])
+            position = store.categories.index(self.category)
+            store.remove_category(self.category)
+            return AddCategory(self.category, position)
+
+
+class Batch:
+    # commands を順に適用し、逆操作は逆の順に並べる
+    __slots__ = ('commands',)
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    @property
+    def size(self):
+        return sum(command.size for command in self.commands)
+
+    def apply(self, store):
+        with store.lock:
+            inverse = [command.apply(store) for command in self.commands]
+        inverse.reverse()
+        return Batch(inverse)
+
+
+def toggle_inverse(changes):
+    # complete_task の逆操作。changes: [(切り替え後のタスク, 切り替え前の状態, 切り替え前のリマインド)]
+    # 繰り返すタスクは完了にならずに次の予定に進むので、リマインドを戻す
+    statuses = []
+    reminders = []
+    for task, status, reminder in changes:
+        if task.status != status:
+            statuses.append((task.id, task.status, status))
+        elif task.reminder != reminder:
+            reminders.append((task.id, task.reminder, reminder))
+    if not reminders:
+        return SetValues('status', statuses)
+    return Batch([SetValues('status', statuses), SetValues('reminder', reminders)])
+
+
+class History:
+    def __init__(self, limit=HISTORY_LIMIT, max_size=HISTORY_SIZE):
+        self.limit = limit
+        self.max_size = max_size
+        # (操作の名前, 逆操作) のスタック（最後が最新）
+        self._undo = deque()
+        self._redo = []
+        self._size = 0
+
+    def record(self, label, inverse):
+        # 操作を行った後に、その逆操作を記録する（やり直しの履歴は捨てる）
+        if not inverse.size:
+            return
+        self._redo.clear()
+        self._undo.append((label, inverse))
+        self._size += inverse.size
+        self._trim()
+
+    def _trim(self):
+        # 上限を超えたら古い操作から捨てる（最新の操作は差分が大きくても残す）
+        while len(self._undo) > 1 and (len(self._undo) > self.limit or self._size > self.max_size):
+            _, command = self._undo.popleft()
+            self._size -= command.size
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self, store):
+        # 最新の操作を元に戻し、その操作の名前を返す（なければNone）
+        if not self._undo:
+            return None
+        label, command = self._undo.pop()
+        self._size -= command.size
+        self._redo.append((label, command.apply(store)))
+        return label
+
+    def redo(self, store):
+        # 最後に元に戻した操作をやり直し、その操作の名前を返す（なければNone）
+        if not self._redo:
+            return None
+        label, command = self._redo.pop()
+        inverse = command.apply(store)
+        self._undo.append((label, inverse))
+        self._size += inverse.size
+        self._trim()
+        return label
@@ -1,11 +1,94 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import json
+from tkinter import ttk, messagebox
 import os
-from datetime import datetime, timedelta
 import threading
 import time
-from win10toast import ToastNotifier
+from itertools import islice
+from task_model import format_time
+from recurrence import REPEAT_CHOICES, canonical_rule, describe_rule, occurrences
+from task_store import TaskStore
+from tree_renderer import TreeRenderer
+from storage import open_storage, SaveWriter
+from reminder_scheduler import ReminderScheduler, reminder_due
+from notifier import NotificationDispatcher, create_notifier
+from shared_file import create_watcher
+from api_server import ApiServer
+from archive import Archive, ArchivedView, archive_completed, archive_directory
+from history import History, Delete, Restore, SetValues, AddCategory, RemoveCategory, Batch, toggle_inverse
+from metrics import MetricsExporter, create_metrics, ROW_BUCKETS, LATENESS_BUCKETS
+
+# タスクデータの保存先と保存方式（'journal' / 'json' / 'sqlite'、詳細は storage.open_storage）
+TASKS_FILE = 'tasks.json'
+STORAGE_MODE = os.environ.get('TODO_STORAGE', 'journal')
+
+# 通知の表示方法（'auto' / 'toast' / 'notify-send' / 'log' / 'none'）
+NOTIFIER = os.environ.get('TODO_NOTIFIER', 'auto')
+
+# 完了してから残しておく日数（作成日時がこれより古い完了済みのタスクは起動時に tasks.archive へ移す。空ならアーカイブしない）
+# アーカイブしたタスクは「完了済のみ」の表示で見られる（タイトルの検索の対象にはならない）
+ARCHIVE_DAYS = os.environ.get('TODO_ARCHIVE_DAYS', '')
+
+# ローカルの HTTP/JSON API の待ち受けポート（空なら起動しない。127.0.0.1 でだけ待ち受ける。詳細は api_server.py）
+API_PORT = os.environ.get('TODO_API_PORT', '')
+
+# 計測値の書き出し先（空なら計測しない。拡張子が .json ならJSON、それ以外は Prometheus のテキスト形式）
+# 計測中は F12 で計測値の画面を開ける
+METRICS_FILE = os.environ.get('TODO_METRICS', '')
+METRICS_INTERVAL = 10.0
+
+# 計測するボタン・入力の操作
+HANDLERS = ['add_task', 'delete_task', 'complete_task', 'set_reminder', 'show_all_tasks', 'show_active_tasks',
+            'show_completed_tasks', 'manage_categories', 'apply_filters', 'add_category', 'delete_category',
+            'undo', 'redo']
+
+# 連続した変更をまとめて保存するまでの待ち時間（秒）
+SAVE_DEBOUNCE = 0.5
+
+# 他のアプリ・APIによる変更を再表示するまでの待ち時間（秒、この間の変更は1回の再表示にまとめる）
+REFRESH_DELAY = 0.1
+
+# 列見出しのクリックで並べ替える場合のキーの数（最後にクリックした列から順に比べる）
+SORT_KEYS = 3
+
+# 列の見出し
+COLUMN_TITLES = {
+    'id': 'ID',
+    'title': 'タスク',
+    'category': 'カテゴリ',
+    'priority': '優先度',
+    'status': '状態',
+    'created_at': '作成日時',
+    'reminder': 'リマインド'
+}
+
+# 画面下の集計（リマインド期限切れの件数）を更新する間隔（秒、変更がなくても時刻の経過で増えるため）
+STATS_INTERVAL = 60.0
+
+# 起動時の読み込み: 1回に読み込む件数と、UIに制御を返すまでの1回あたりの時間（秒）
+# 最初の1回分を読み込んだ時点で表示するので、件数によらず画面はすぐに使えるようになる
+# （目標: 起動から最初の表示まで 200ms 以内、benchmarks/startup_bench.py で計測）
+LOAD_CHUNK_SIZE = 1000
+LOAD_SLICE = 0.05
+
+# 優先度ごとの行のタグ
+PRIORITY_TAGS = {
+    '高': ('high_priority',),
+    '中': ('medium_priority',),
+    '低': ('low_priority',)
+}
+
+def count_label(name, count):
+    # コンボボックス・リストの項目の表示「仕事 (1,234)」
+    return f"{name} ({count:,})"
+
+
+def label_name(label):
+    # count_label の表示から名前を取り出す（件数の付いていない表示はそのまま）
+    name, sep, rest = label.rpartition(' (')
+    if sep and rest.endswith(')') and rest[:-1].replace(',', '').isdigit():
+        return name
+    return label
+
 
 class TodoApp:
     def __init__(self, root):
@@ -13,29 +96,52 @@ class TodoApp:
         self.root.title("ToDo アプリ")
         self.root.geometry("600x500")
         
-        # Windows通知の初期化
-        self.toaster = ToastNotifier()
+        # 計測（無効の場合は何もしない）
+        self.metrics = create_metrics(METRICS_FILE)
+        self.metrics_exporter = None
+        
+        # 通知の初期化（表示は通知スレッドで行い、続けて届いた通知はまとめる）
+        self.notifications = NotificationDispatcher(create_notifier(NOTIFIER))
+        
+        # タスクの保持とインデックス（カテゴリ・優先度のリストもここで管理）
+        self.store = TaskStore()
+        self.storage = open_storage(STORAGE_MODE, TASKS_FILE)
+        
+        # 完了したタスクのアーカイブ（起動時に古いものを別のスレッドで移す）
+        self.archive = Archive(archive_directory(TASKS_FILE))
+        self.archive_thread = None
+        
+        # 元に戻す・やり直すための操作の履歴（画面からの操作だけを記録する）
+        self.history = History()
+        
+        # 保存スレッド（読み込みが終わってから作る。保存はすべてこのスレッドで行う）
+        self.writer = None
+        
+        # 他のアプリによる tasks.json の変更の監視（読み込みが終わってから開始する）
+        self.watcher = None
+        
+        # ローカルの API（読み込みが終わってから開始する）
+        self.api = None
+        self.refresh_pending = False
         
-        # タスクリスト
-        self.tasks = []
+        # リマインダー（次のリマインド時刻まで待機し、時刻になったらUIスレッドで通知する）
+        self.reminders = ReminderScheduler(lambda task_ids: self.root.after(0, self.fire_reminders, task_ids))
         
-        # カテゴリのリスト（初期値）
-        self.categories = ["仕事", "家事", "趣味", "勉強", "その他"]
+        # 計測の組み込み（ボタンに渡すメソッドを置き換えるので、UIの設定より前に行う）
+        self.setup_metrics()
         
-        # 優先度のリスト
-        self.priorities = ["高", "中", "低"]
+        # 並び順: [(列名, 降順か), ...]（空ならID順）と、表示中の状態の絞り込み
+        self.sort_order = []
+        self.current_status = None
         
-        # タスクデータのロード
-        self.load_tasks()
+        # タスクデータの読み込み中の状態（読み込み中は iter_load のジェネレーター）
+        self.loader = None
         
-        # UIの設定
+        # UIの設定（タスクを読み込む前に画面を表示する）
         self.setup_ui()
         
-        # リマインダースレッド
-        self.reminder_active = True
-        self.reminder_thread = threading.Thread(target=self.check_reminders)
-        self.reminder_thread.daemon = True
-        self.reminder_thread.start()
+        # タスクデータのロード（画面の描画が終わってから少しずつ読み込む）
+        self.start_loading()
         
         # クローズ時の処理
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -59,26 +165,42 @@ class TodoApp:
         # カテゴリ選択
         ttk.Label(input_frame, text="カテゴリ:").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
         self.category_var = tk.StringVar()
-        self.category_var.set(self.categories[0])
-        self.category_combobox = ttk.Combobox(input_frame, textvariable=self.category_var, values=self.categories, width=10)
+        self.category_var.set(self.store.categories[0])
+        self.category_combobox = ttk.Combobox(input_frame, textvariable=self.category_var, values=self.store.categories, width=10)
         self.category_combobox.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
         
         # 優先度選択
         ttk.Label(input_frame, text="優先度:").grid(row=0, column=4, padx=5, pady=5, sticky=tk.W)
         self.priority_var = tk.StringVar()
-        self.priority_var.set(self.priorities[1])  # デフォルトは「中」
-        self.priority_combobox = ttk.Combobox(input_frame, textvariable=self.priority_var, values=self.priorities, width=5)
+        self.priority_var.set(self.store.priorities[1])  # デフォルトは「中」
+        self.priority_combobox = ttk.Combobox(input_frame, textvariable=self.priority_var, values=self.store.priorities, width=5)
         self.priority_combobox.grid(row=0, column=5, padx=5, pady=5, sticky=tk.W)
         
         # ボタン
-        ttk.Button(button_frame, text="追加", command=self.add_task).grid(row=0, column=0, padx=5, pady=5)
-        ttk.Button(button_frame, text="削除", command=self.delete_task).grid(row=0, column=1, padx=5, pady=5)
-        ttk.Button(button_frame, text="完了", command=self.complete_task).grid(row=0, column=2, padx=5, pady=5)
-        ttk.Button(button_frame, text="リマインド設定", command=self.set_reminder).grid(row=0, column=3, padx=5, pady=5)
+        add_button = ttk.Button(button_frame, text="追加", command=self.add_task)
+        add_button.grid(row=0, column=0, padx=5, pady=5)
+        delete_button = ttk.Button(button_frame, text="削除", command=self.delete_task)
+        delete_button.grid(row=0, column=1, padx=5, pady=5)
+        complete_button = ttk.Button(button_frame, text="完了", command=self.complete_task)
+        complete_button.grid(row=0, column=2, padx=5, pady=5)
+        reminder_button = ttk.Button(button_frame, text="リマインド設定", command=self.set_reminder)
+        reminder_button.grid(row=0, column=3, padx=5, pady=5)
         ttk.Button(button_frame, text="すべて表示", command=self.show_all_tasks).grid(row=0, column=4, padx=5, pady=5)
         ttk.Button(button_frame, text="未完了のみ", command=self.show_active_tasks).grid(row=0, column=5, padx=5, pady=5)
         ttk.Button(button_frame, text="完了済のみ", command=self.show_completed_tasks).grid(row=0, column=6, padx=5, pady=5)
-        ttk.Button(button_frame, text="カテゴリ管理", command=self.manage_categories).grid(row=0, column=7, padx=5, pady=5)
+        category_button = ttk.Button(button_frame, text="カテゴリ管理", command=self.manage_categories)
+        category_button.grid(row=0, column=7, padx=5, pady=5)
+        undo_button = ttk.Button(button_frame, text="元に戻す", command=self.undo)
+        undo_button.grid(row=1, column=0, padx=5, pady=5)
+        redo_button = ttk.Button(button_frame, text="やり直す", command=self.redo)
+        redo_button.grid(row=1, column=1, padx=5, pady=5)
+        self.root.bind('<Control-z>', lambda event: self.undo())
+        self.root.bind('<Control-y>', lambda event: self.redo())
+        self.root.bind('<Control-Z>', lambda event: self.redo())
+        
+        # タスクを変更する操作（読み込みが終わるまで無効にする）
+        self.edit_widgets = [self.task_entry, add_button, delete_button, complete_button,
+                             reminder_button, category_button, undo_button, redo_button]
         
         # フィルター用のフレーム
         filter_frame = ttk.Frame(self.root, padding=10)
@@ -88,9 +210,9 @@ class TodoApp:
         ttk.Label(filter_frame, text="カテゴリでフィルター:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
         self.filter_category_var = tk.StringVar()
         self.filter_category_var.set("すべて")
-        filter_categories = ["すべて"] + self.categories
+        filter_categories = ["すべて"] + self.store.categories
         self.filter_category_combobox = ttk.Combobox(filter_frame, textvariable=self.filter_category_var, 
-                                                    values=filter_categories, width=10)
+                                                    values=filter_categories, width=16)
         self.filter_category_combobox.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
         self.filter_category_combobox.bind("<<ComboboxSelected>>", lambda e: self.apply_filters())
         
@@ -98,24 +220,26 @@ class TodoApp:
         ttk.Label(filter_frame, text="優先度でフィルター:").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
         self.filter_priority_var = tk.StringVar()
         self.filter_priority_var.set("すべて")
-        filter_priorities = ["すべて"] + self.priorities
+        filter_priorities = ["すべて"] + self.store.priorities
         self.filter_priority_combobox = ttk.Combobox(filter_frame, textvariable=self.filter_priority_var, 
-                                                   values=filter_priorities, width=5)
+                                                   values=filter_priorities, width=12)
         self.filter_priority_combobox.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
         self.filter_priority_combobox.bind("<<ComboboxSelected>>", lambda e: self.apply_filters())
         
+        # タイトルで検索（入力のたびに絞り込む）
+        ttk.Label(filter_frame, text="検索:").grid(row=0, column=4, padx=5, pady=5, sticky=tk.W)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=15)
+        self.search_entry.grid(row=0, column=5, padx=5, pady=5, sticky=tk.W)
+        self.search_var.trace_add('write', lambda *args: self.apply_filters())
+        
         # タスク一覧
         columns = ('id', 'title', 'category', 'priority', 'status', 'created_at', 'reminder')
         self.tree = ttk.Treeview(list_frame, columns=columns, show='headings')
         
-        # 列の設定
-        self.tree.heading('id', text='ID')
-        self.tree.heading('title', text='タスク')
-        self.tree.heading('category', text='カテゴリ')
-        self.tree.heading('priority', text='優先度')
-        self.tree.heading('status', text='状態')
-        self.tree.heading('created_at', text='作成日時')
-        self.tree.heading('reminder', text='リマインド')
+        # 列の設定（見出しのクリックで並べ替え）
+        for column, title in COLUMN_TITLES.items():
+            self.tree.heading(column, text=title, command=lambda column=column: self.sort_by(column))
         
         self.tree.column('id', width=40, anchor=tk.CENTER)
         self.tree.column('title', width=180)
@@ -125,99 +249,339 @@ class TodoApp:
         self.tree.column('created_at', width=100, anchor=tk.CENTER)
         self.tree.column('reminder', width=100, anchor=tk.CENTER)
         
-        # スクロールバー
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        # タグの設定
+        self.tree.tag_configure('high_priority', background='#ffcccc')
+        self.tree.tag_configure('medium_priority', background='#ffffcc')
+        self.tree.tag_configure('low_priority', background='#ccffcc')
+        
+        # スクロールバー（スクロール位置との連動は TreeRenderer が行う）
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL)
         
         # 配置
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # 読み込みの状況と集計（状態・リマインド期限切れの件数）
+        self.status_var = tk.StringVar()
+        ttk.Label(self.root, textvariable=self.status_var, padding=(10, 0, 10, 5)).pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # 差分描画（件数が多い場合は表示位置の周辺だけを描画）
+        self.renderer = TreeRenderer(self.tree, scrollbar, self.task_row_values,
+                                     lambda task: PRIORITY_TAGS.get(task.priority, ()))
+        if self.metrics.enabled:
+            self.renderer.on_render = self.record_render
+            self.root.bind('<F12>', lambda event: self.show_debug_window())
+        
         # タスクの表示
         self.display_tasks()
         
         # Enterキーでタスク追加
         self.task_entry.bind('<Return>', lambda event: self.add_task())
 
-    def load_tasks(self):
-        # タスクデータのロード
+    def setup_metrics(self):
+        # 処理時間・描画した行数・書き込んだバイト数・リマインドの遅れ・通知キューの長さを記録する
+        if not self.metrics.enabled:
+            return
+        metrics = self.metrics
+        metrics.describe('todo_handler_seconds', "ボタン・入力の操作の処理時間")
+        metrics.describe('todo_operation_seconds', "読み込み・表示・保存の依頼・リマインドの処理時間")
+        metrics.describe('todo_storage_seconds', "保存スレッドでの書き込みの時間")
+        metrics.describe('todo_rows_changed', "1回の表示で変更したTreeviewの行数")
+        metrics.describe('todo_reminder_lateness_seconds', "リマインド時刻から通知するまでの遅れ")
+        metrics.instrument(self, HANDLERS, 'todo_handler_seconds')
+        metrics.instrument(self, ['load_next_chunk', 'display_tasks', 'save_tasks', 'fire_reminders'],
+                           'todo_operation_seconds', label='operation')
+        metrics.instrument(self.storage, ['save', 'compact'] if hasattr(self.storage, 'compact') else ['save'],
+                           'todo_storage_seconds', label='method')
+        metrics.gauge('todo_tasks', lambda: len(self.store))
+        metrics.gauge('todo_reminders_scheduled', lambda: len(self.reminders))
+        metrics.gauge('todo_notification_queue_depth', self.notifications.depth)
+        metrics.gauge('todo_notifications_shown_total', lambda: self.notifications.shown, kind='counter')
+        metrics.gauge('todo_notifications_dropped_total', lambda: self.notifications.dropped, kind='counter')
+        metrics.gauge('todo_storage_bytes_written_total', lambda: getattr(self.storage, 'bytes_written', None),
+                      kind='counter')
+        self.metrics_exporter = MetricsExporter(metrics, METRICS_FILE, METRICS_INTERVAL)
+
+    def record_render(self, changed, total):
+        self.metrics.observe('todo_rows_changed', changed, buckets=ROW_BUCKETS)
+
+    def show_debug_window(self):
+        # 計測値の画面（F12、1秒ごとに更新する）
+        window = tk.Toplevel(self.root)
+        window.title("計測値")
+        window.geometry("600x500")
+        text = tk.Text(window, wrap=tk.NONE, font=('TkFixedFont', 9))
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(fill=tk.BOTH, expand=True)
+        
+        def refresh():
+            if not window.winfo_exists():
+                return
+            position = text.yview()[0]
+            text.configure(state=tk.NORMAL)
+            text.delete('1.0', tk.END)
+            text.insert('1.0', self.metrics.to_prometheus())
+            text.configure(state=tk.DISABLED)
+            text.yview_moveto(position)
+            window.after(1000, refresh)
+        
+        refresh()
+
+    def start_loading(self):
+        # 変更の操作を無効にして、描画の後で読み込みを始める
+        for widget in self.edit_widgets:
+            widget.state(['disabled'])
+        self.status_var.set("読み込み中...")
+        self.loader = self.storage.iter_load(LOAD_CHUNK_SIZE)
+        self.rendered_count = 0
+        self.load_started = time.perf_counter()
+        self.root.after_idle(lambda: self.root.after(0, self.load_next_chunk))
+
+    def load_next_chunk(self):
+        # タスクデータのロード（LOAD_SLICE 秒ごとにUIへ制御を返しながら読み込む）
+        if self.loader is None:
+            return
+        deadline = time.perf_counter() + LOAD_SLICE
         try:
-            if os.path.exists('tasks.json'):
-                with open('tasks.json', 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.tasks = data.get('tasks', [])
-                    # 保存されているカテゴリをロード（もし存在すれば）
-                    if 'categories' in data:
-                        self.categories = data['categories']
+            while time.perf_counter() < deadline:
+                data = next(self.loader, None)
+                if data is None:
+                    self.finish_loading()
+                    return
+                # 保存されているカテゴリもロード（もし存在すれば）
+                if data.get('categories'):
+                    self.store.categories = list(data['categories'])
+                    self.update_category_lists()
+                if data.get('next_id'):
+                    self.store.next_id = max(self.store.next_id, data['next_id'])
+                self.store.extend(data['tasks'])
+                # 最初のページは読み込んだらすぐに表示する
+                if not self.rendered_count and len(self.store):
+                    break
         except Exception as e:
             messagebox.showerror("エラー", f"タスクのロード中にエラーが発生しました: {e}")
-            self.tasks = []
+            self.store.load([])
+            self.finish_loading()
+            return
 
-    def save_tasks(self):
-        # タスクデータの保存
+        # 表示の更新は件数が倍になるごとに行う（全件の再描画を繰り返さない）
+        if len(self.store) >= 2 * self.rendered_count:
+            if not self.rendered_count:
+                self.metrics.observe('todo_first_paint_seconds', time.perf_counter() - self.load_started)
+            self.rendered_count = max(len(self.store), 1)
+            # 読み込み中に選んだ絞り込み（完了済のみなど）はそのまま
+            self.display_tasks(self.current_status)
+        self.status_var.set(f"読み込み中... {len(self.store):,}件")
+        self.root.after(1, self.load_next_chunk)
+
+    def finish_loading(self):
+        # 読み込みが終わってから保存・リマインダーを開始し、変更の操作を有効にする
+        self.loader = None
+        self.storage.attach(self.store)
+        self.writer = SaveWriter(self.storage, self.store, debounce=SAVE_DEBOUNCE,
+                                 on_error=lambda e: self.root.after(0, self.show_save_error, e),
+                                 on_saved=lambda: self.root.after(0, self.on_saved))
+        self.reminders.load(self.store.query(status='active'))
+        self.store.add_listener(self.reminders.on_store_change)
+        self.reminders.start()
+        # 同じ tasks.json を使う他のアプリの変更を検出したら、保存スレッドで取り込む
+        if hasattr(self.storage, 'sync'):
+            self.storage.on_sync = lambda changed: self.request_refresh()
+            self.watcher = create_watcher(TASKS_FILE, self.writer.request_sync)
+            # 読み込み中に他のアプリが書き込んだ分を取り込む
+            self.writer.request_sync()
+        # 以前の起動のセグメントが溜まっていれば、保存スレッドでジャーナルを圧縮する（save で圧縮される）
+        # 圧縮すると tasks.json のキャッシュも書き出されるので、キャッシュは作り直さない
+        if hasattr(self.storage, 'compaction_due') and self.storage.compaction_due():
+            self.writer.request()
+        elif getattr(self.storage, 'cache_stale', False):
+            # tasks.json のキャッシュが使えなかった場合は、次回の起動のために作り直す
+            threading.Thread(target=self.storage.rebuild_cache, daemon=True).start()
+        if API_PORT:
+            self.start_api(int(API_PORT))
+        if ARCHIVE_DAYS:
+            self.archive_thread = threading.Thread(target=self.archive_old_tasks, args=(float(ARCHIVE_DAYS),),
+                                                   daemon=True)
+            self.archive_thread.start()
+        for widget in self.edit_widgets:
+            widget.state(['!disabled'])
+        self.display_tasks(self.current_status)
+        self.root.after(int(STATS_INTERVAL * 1000), self.refresh_stats)
+        self.metrics.observe('todo_load_seconds', time.perf_counter() - self.load_started)
+
+    def archive_old_tasks(self, days):
+        # アーカイブのスレッド: 古い完了済みのタスクをアーカイブに移し、保存と再表示を依頼する
         try:
-            with open('tasks.json', 'w', encoding='utf-8') as f:
-                data = {
-                    'tasks': self.tasks,
-                    'categories': self.categories
-                }
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            moved = archive_completed(self.store, self.archive, time.time() - days * 86400)
         except Exception as e:
-            messagebox.showerror("エラー", f"タスクの保存中にエラーが発生しました: {e}")
+            self.root.after(0, self.show_save_error, e)
+            return
+        if moved:
+            # 移したタスクの削除は待たずに書き込む（アーカイブと tasks.json の両方にある間を短くする）
+            self.save_tasks()
+            self.writer.flush()
+            self.request_refresh()
+
+    def start_api(self, port):
+        # APIのスレッドでストアを変更し、保存と再表示を依頼する
+        self.api = ApiServer(self.store, on_change=self.on_api_change, port=port)
+        try:
+            self.api.start()
+        except OSError as e:
+            self.api = None
+            messagebox.showerror("エラー", f"APIを開始できませんでした: {e}")
+
+    def on_api_change(self):
+        # APIのスレッドから呼ばれる
+        self.save_tasks()
+        self.request_refresh()
+
+    def request_refresh(self):
+        # 保存スレッド・APIのスレッドからの再表示の依頼（続けて来た依頼は1回の再表示にまとめる）
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.root.after(int(REFRESH_DELAY * 1000), self.on_external_change)
+
+    def on_external_change(self):
+        # 他のアプリ・APIの変更の再表示（変更のあった行だけが更新される）
+        self.refresh_pending = False
+        self.update_category_lists()
+        # 表示中の絞り込み（完了済のみなど）のまま表示し直す
+        self.display_tasks(self.current_status)
+
+    def on_saved(self):
+        # 保存の書き込みが終わった（SQLiteでは、保存待ちの間ストアから表示していた一覧をクエリで表示し直す）
+        if hasattr(self.storage, 'filter') and not self.writer.pending:
+            self.display_tasks(self.current_status)
+
+    def update_category_lists(self):
+        # コンボボックスの更新
+        self.category_combobox['values'] = self.store.categories
+        if self.category_var.get() not in self.store.categories:
+            self.category_var.set(self.store.categories[0])
+        self.update_filter_counts()
+
+    def update_filter_counts(self, status=None):
+        # フィルターのコンボボックスの各項目に、選んだ場合の件数を表示する（集計表から求める）
+        category = label_name(self.filter_category_var.get())
+        priority = label_name(self.filter_priority_var.get())
+        category = None if category == "すべて" else category
+        priority = None if priority == "すべて" else priority
+        by_category = self.store.counts('category', status=status, priority=priority)
+        by_priority = self.store.counts('priority', status=status, category=category)
+        self.filter_category_combobox['values'] = (
+            [count_label("すべて", sum(by_category.values()))]
+            + [count_label(name, by_category.get(name, 0)) for name in self.store.categories]
+        )
+        self.filter_priority_combobox['values'] = (
+            [count_label("すべて", sum(by_priority.values()))]
+            + [count_label(name, by_priority.get(name, 0)) for name in self.store.priorities]
+        )
+        # 選択中の項目の表示も新しい件数にする
+        self.filter_category_var.set(count_label(category or "すべて", by_category.get(category, 0) if category
+                                                 else sum(by_category.values())))
+        self.filter_priority_var.set(count_label(priority or "すべて", by_priority.get(priority, 0) if priority
+                                                 else sum(by_priority.values())))
+
+    def update_stats(self):
+        # 画面下の集計（読み込み中は読み込みの状況を表示する）
+        if self.loader is not None:
+            return
+        stats = self.store.stats()
+        text = (f"表示 {self.shown_count:,}件 ／ 合計 {stats['total']:,}件"
+                f"（未完了 {stats['active']:,}・完了 {stats['completed']:,}）／ リマインド期限切れ {stats['overdue']:,}件")
+        archived = self.archive.count()
+        if archived:
+            text += f" ／ アーカイブ {archived:,}件"
+        self.status_var.set(text)
+
+    def refresh_stats(self):
+        self.update_stats()
+        self.root.after(int(STATS_INTERVAL * 1000), self.refresh_stats)
+
+    def save_tasks(self):
+        # タスクデータの保存（保存スレッドに依頼するだけで、書き込みは待たない）
+        self.writer.request()
+
+    def show_save_error(self, e):
+        messagebox.showerror("エラー", f"タスクの保存中にエラーが発生しました: {e}")
+
+    def task_row_values(self, task):
+        # Treeviewの1行分の表示内容（日時はここで文字列にする）
+        # 繰り返すタスクはリマインドの欄に次の予定と規則を表示する
+        reminder = format_time(task.reminder)
+        if task.repeat:
+            reminder += f" ↻ {describe_rule(task.repeat)}"
+        return (
+            task.id,
+            task.title,
+            task.category,
+            task.priority,
+            '完了' if task.status == 'completed' else '未完了',
+            format_time(task.created_at),
+            reminder
+        )
+
+    def sort_by(self, column):
+        # 列見出しのクリック: その列を第1キーにし、それまでのキーは第2・第3キーとして残す
+        # 第1キーの列をもう一度クリックした場合は昇順・降順を切り替える
+        if self.sort_order and self.sort_order[0][0] == column:
+            self.sort_order[0] = (column, not self.sort_order[0][1])
+        else:
+            self.sort_order = [(column, False)] + [key for key in self.sort_order if key[0] != column]
+            del self.sort_order[SORT_KEYS:]
+        self.update_headings()
+        self.display_tasks(self.current_status)
+
+    def update_headings(self):
+        # 並べ替えに使っている列の見出しに ▲（昇順）・▼（降順）とキーの順番を付ける
+        for column, title in COLUMN_TITLES.items():
+            for rank, (key, descending) in enumerate(self.sort_order, 1):
+                if key == column:
+                    title += (' ▼' if descending else ' ▲') + (str(rank) if rank > 1 else '')
+            self.tree.heading(column, text=title)
 
     def display_tasks(self, filter_status=None):
-        # タスク一覧のクリア
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # フィルター条件の取得
-        filter_category = self.filter_category_var.get()
-        filter_priority = self.filter_priority_var.get()
-        
-        # タスクの表示
-        for task in self.tasks:
-            # ステータスフィルター
-            if filter_status is not None and task['status'] != filter_status:
-                continue
-            
-            # カテゴリフィルター
-            if filter_category != "すべて" and task['category'] != filter_category:
-                continue
-                
-            # 優先度フィルター
-            if filter_priority != "すべて" and task['priority'] != filter_priority:
-                continue
-                
-            # タスクの追加
-            self.tree.insert('', tk.END, values=(
-                task['id'],
-                task['title'],
-                task['category'],
-                task['priority'],
-                '完了' if task['status'] == 'completed' else '未完了',
-                task['created_at'],
-                task.get('reminder', '未設定')
-            ))
-            
-        # 優先度に応じて行の色を変更
-        for item in self.tree.get_children():
-            task_id = self.tree.item(item, 'values')[0]
-            task = next((t for t in self.tasks if t['id'] == int(task_id)), None)
-            if task:
-                if task['priority'] == '高':
-                    self.tree.item(item, tags=('high_priority',))
-                elif task['priority'] == '中':
-                    self.tree.item(item, tags=('medium_priority',))
-                elif task['priority'] == '低':
-                    self.tree.item(item, tags=('low_priority',))
-                    
-        # タグの設定
-        self.tree.tag_configure('high_priority', background='#ffcccc')
-        self.tree.tag_configure('medium_priority', background='#ffffcc')
-        self.tree.tag_configure('low_priority', background='#ccffcc')
+        # フィルター条件の取得（コンボボックスの表示は「仕事 (1,234)」の形）
+        filter_category = label_name(self.filter_category_var.get())
+        filter_priority = label_name(self.filter_priority_var.get())
+        search_text = self.search_var.get().strip()
+        
+        # インデックスを使ってフィルター（「すべて」は条件なし）
+        # 並べ替えは並び順ごとのインデックスの順に取り出すので、表示のたびに並べ替えない
+        self.current_status = filter_status
+        filters = {
+            'status': filter_status,
+            'category': None if filter_category == "すべて" else filter_category,
+            'priority': None if filter_priority == "すべて" else filter_priority
+        }
+        if hasattr(self.storage, 'filter') and not search_text and not (self.writer and self.writer.pending):
+            # SQLiteでは条件と並べ替えをクエリで行い、表示する範囲のページだけを読み出す
+            # 保存待ちの変更がある間はデータベースが古いので、書き込みを待たずにストアから表示する
+            # （書き込みが終わったら on_saved で表示し直す。文字列の検索はストアの検索索引を使う）
+            tasks = self.storage.filter(order=tuple(self.sort_order), **filters)
+        else:
+            tasks = self.store.query(text=search_text or None, order=tuple(self.sort_order), **filters)
+        
+        # 「完了済のみ」ではアーカイブしたタスクを後ろに続ける（表示する範囲のセグメントだけを読む）
+        if filter_status == 'completed' and not search_text and self.archive.segments():
+            tasks = ArchivedView(tasks, self.archive, self.store,
+                                 category=filters['category'], priority=filters['priority'])
+        
+        # タスクの表示（変更のあった行だけを更新）
+        self.renderer.render(tasks)
+        
+        # 件数の表示
+        self.shown_count = len(tasks)
+        self.update_filter_counts(filter_status)
+        self.update_stats()
 
     def add_task(self):
         # タスクの追加
+        if self.loader is not None:
+            return
         title = self.task_entry.get().strip()
         if not title:
             messagebox.showwarning("警告", "タスクを入力してください")
@@ -226,60 +590,55 @@ class TodoApp:
         category = self.category_var.get()
         priority = self.priority_var.get()
         
-        # IDの生成（最大ID + 1）
-        task_id = 1
-        if self.tasks:
-            task_id = max([task['id'] for task in self.tasks]) + 1
-            
         # 現在の日時を取得
-        now = datetime.now().strftime('%Y-%m-%d %H:%M')
+        now = int(time.time())
         
-        # タスクの追加
-        task = {
-            'id': task_id,
-            'title': title,
-            'category': category,
-            'priority': priority,
-            'status': 'active',
-            'created_at': now,
-            'reminder': '未設定'
-        }
-        
-        self.tasks.append(task)
+        # タスクの追加（IDはストアが採番）
+        task = self.store.add(title, category, priority, now)
+        self.history.record("追加", Delete([task.id]))
         self.save_tasks()
         self.display_tasks()
         
         # 通知
         notification_title = "新しいタスクが追加されました"
         notification_message = f"タスク: {title}\nカテゴリ: {category}\n優先度: {priority}"
-        self.toaster.show_toast(notification_title, notification_message, duration=5, threaded=True)
+        self.notifications.notify('added', notification_title, notification_message,
+                                  summary=(notification_title, "{count}件のタスクを追加しました。"))
         
         # 入力欄のクリア
         self.task_entry.delete(0, tk.END)
 
+    def includes_archived(self, selected_items):
+        # アーカイブしたタスク（「完了済のみ」でストアの後に続けて表示する行）は変更できないので知らせる
+        if any(int(item) not in self.store for item in selected_items):
+            messagebox.showwarning("警告", "アーカイブしたタスクは変更できません")
+            return True
+        return False
+
     def delete_task(self):
         # タスクの削除
         selected_items = self.tree.selection()
         if not selected_items:
             messagebox.showwarning("警告", "削除するタスクを選択してください")
             return
+        if self.includes_archived(selected_items):
+            return
             
         if messagebox.askyesno("確認", "選択したタスクを削除しますか？"):
-            for item in selected_items:
-                values = self.tree.item(item, 'values')
-                task_id = int(values[0])  # 文字列から整数に変換
-                task_title = values[1]
-                
-                # 該当するタスクを削除
-                for i, task in enumerate(self.tasks):
-                    if task['id'] == task_id:
-                        del self.tasks[i]
-                        
-                        # 通知
-                        notification_title = "タスクが削除されました"
-                        notification_message = f"タスク「{task_title}」を削除しました。"
-                        self.toaster.show_toast(notification_title, notification_message, duration=5, threaded=True)
-                        break
+            # 選択したタスクをまとめて削除（行のiidはタスクID）
+            removed = self.store.delete_many(int(item) for item in selected_items)
+            # 元に戻すときは削除したタスクをそのまま戻す
+            self.history.record("削除", Restore(removed))
+            
+            # 通知（複数の場合は1件にまとめる）
+            if removed:
+                notification_title = "タスクが削除されました"
+                if len(removed) == 1:
+                    notification_message = f"タスク「{removed[0].title}」を削除しました。"
+                else:
+                    notification_message = f"{len(removed):,}件のタスクを削除しました。"
+                self.notifications.notify('deleted', notification_title, notification_message, count=len(removed),
+                                          summary=(notification_title, "{count}件のタスクを削除しました。"))
                 
             self.save_tasks()
             self.display_tasks()
@@ -290,31 +649,69 @@ class TodoApp:
         if not selected_items:
             messagebox.showwarning("警告", "完了するタスクを選択してください")
             return
+        if self.includes_archived(selected_items):
+            return
             
+        toggled = []
         for item in selected_items:
             values = self.tree.item(item, 'values')
             task_id = int(values[0])
             task_title = values[1]
-            for task in self.tasks:
-                if task['id'] == task_id:
-                    # ステータスの切り替え
-                    new_status = 'completed' if task['status'] == 'active' else 'active'
-                    task['status'] = new_status
-                    
-                    # 通知
-                    if new_status == 'completed':
-                        notification_title = "タスクが完了しました"
-                        notification_message = f"タスク「{task_title}」を完了しました。"
-                    else:
-                        notification_title = "タスクが未完了に戻されました"
-                        notification_message = f"タスク「{task_title}」を未完了に戻しました。"
-                        
-                    self.toaster.show_toast(notification_title, notification_message, duration=5, threaded=True)
-                    break
+            # ステータスの切り替え（繰り返すタスクは次の予定に進む）
+            task = self.store.get(task_id)
+            if task is None:
+                continue
+            status, reminder = task.status, task.reminder
+            task = self.store.toggle_status(task_id)
+            toggled.append((task, status, reminder))
+                
+            # 通知
+            # 種類（まとめる単位）は、完了・次の予定に進めた・未完了に戻したの3つ
+            if task.repeat and task.status == status:
+                kind = 'advanced'
+                notification_title = "タスクが完了しました"
+                notification_message = f"タスク「{task_title}」を完了しました。次回: {format_time(task.reminder)}"
+                summary = (notification_title, "{count}件の繰り返しのタスクを完了し、次の予定に進めました。")
+            elif task.status == 'completed':
+                kind = 'completed'
+                notification_title = "タスクが完了しました"
+                notification_message = f"タスク「{task_title}」を完了しました。"
+                summary = (notification_title, "{count}件のタスクを完了しました。")
+            else:
+                kind = 'reopened'
+                notification_title = "タスクが未完了に戻されました"
+                notification_message = f"タスク「{task_title}」を未完了に戻しました。"
+                summary = (notification_title, "{count}件のタスクを未完了に戻しました。")
+                
+            self.notifications.notify(kind, notification_title, notification_message, summary=summary)
                     
+        self.history.record("完了", toggle_inverse(toggled))
         self.save_tasks()
         self.display_tasks()
 
+    def undo(self):
+        # 最後の操作を元に戻す（Ctrl+Z）
+        if self.loader is not None:
+            return
+        label = self.history.undo(self.store)
+        if label is not None:
+            self.after_history(f"「{label}」を元に戻しました")
+
+    def redo(self):
+        # 元に戻した操作をやり直す（Ctrl+Y・Ctrl+Shift+Z）
+        if self.loader is not None:
+            return
+        label = self.history.redo(self.store)
+        if label is not None:
+            self.after_history(f"「{label}」をやり直しました")
+
+    def after_history(self, message):
+        # 元に戻す・やり直すで変わったタスクだけを保存し、表示中の絞り込みのまま再表示する
+        self.save_tasks()
+        self.update_category_lists()
+        self.display_tasks(self.current_status)
+        self.status_var.set(message)
+
     def show_all_tasks(self):
         # すべてのタスクを表示
         self.display_tasks()
@@ -351,9 +748,8 @@ class TodoApp:
         self.category_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # カテゴリの表示
-        for category in self.categories:
-            self.category_listbox.insert(tk.END, category)
+        # カテゴリの表示（件数付き）
+        self.refresh_category_listbox()
         
         # 操作ボタンのフレーム
         button_frame = ttk.Frame(category_window, padding=10)
@@ -368,6 +764,13 @@ class TodoApp:
         ttk.Button(button_frame, text="削除", command=self.delete_category).grid(row=1, column=0, padx=5, pady=5)
         ttk.Button(button_frame, text="閉じる", command=category_window.destroy).grid(row=1, column=2, padx=5, pady=5)
 
+    def refresh_category_listbox(self):
+        # カテゴリ管理のリスト（各カテゴリのタスクの件数付き）
+        counts = self.store.counts('category')
+        self.category_listbox.delete(0, tk.END)
+        for category in self.store.categories:
+            self.category_listbox.insert(tk.END, count_label(category, counts.get(category, 0)))
+
     def add_category(self):
         # カテゴリの追加
         new_category = self.new_category_entry.get().strip()
@@ -375,18 +778,17 @@ class TodoApp:
             messagebox.showwarning("警告", "カテゴリ名を入力してください")
             return
             
-        if new_category in self.categories:
+        if new_category in self.store.categories:
             messagebox.showwarning("警告", "同じ名前のカテゴリが既に存在します")
             return
             
-        self.categories.append(new_category)
-        self.category_listbox.insert(tk.END, new_category)
+        self.store.add_category(new_category)
+        self.history.record("カテゴリの追加", RemoveCategory(new_category))
+        self.refresh_category_listbox()
         self.new_category_entry.delete(0, tk.END)
         
         # コンボボックスの更新
-        self.category_combobox['values'] = self.categories
-        filter_categories = ["すべて"] + self.categories
-        self.filter_category_combobox['values'] = filter_categories
+        self.update_category_lists()
         
         self.save_tasks()
 
@@ -397,40 +799,53 @@ class TodoApp:
             messagebox.showwarning("警告", "削除するカテゴリを選択してください")
             return
             
-        category = self.category_listbox.get(selected[0])
+        category = label_name(self.category_listbox.get(selected[0]))
         
-        # 使用中のカテゴリかどうかチェック
-        in_use = any(task['category'] == category for task in self.tasks)
-        if in_use:
-            if not messagebox.askyesno("確認", f"カテゴリ「{category}」は使用中です。削除すると関連タスクのカテゴリが「その他」に変更されます。続行しますか？"):
+        # 使用中のカテゴリかどうかチェック（件数は集計表から求める）
+        count = self.store.count(category=category)
+        task_ids = []
+        if count:
+            if not messagebox.askyesno("確認", f"カテゴリ「{category}」は{count:,}件のタスクで使用中です。削除すると関連タスクのカテゴリが「その他」に変更されます。続行しますか？"):
                 return
                 
-            # タスクのカテゴリを変更
-            for task in self.tasks:
-                if task['category'] == category:
-                    task['category'] = "その他"
-        
-        # カテゴリの削除
-        self.categories.remove(category)
-        self.category_listbox.delete(selected[0])
+            # タスクのカテゴリを変更（カテゴリのインデックスにあるタスクだけを変更する）
+            task_ids = self.store.reassign_category(category, "その他")
+        
+        # カテゴリの削除（カテゴリリストが空になった場合はストアが「その他」を追加する）
+        position = self.store.categories.index(category)
+        self.store.remove_category(category)
+        # 元に戻すときはカテゴリを同じ位置に戻してから、付け替えたタスクだけを戻す
+        self.history.record("カテゴリの削除", Batch([
+            AddCategory(category, position),
+            SetValues('category', [(task_id, "その他", category) for task_id in task_ids])
+        ]))
+        self.refresh_category_listbox()
         
         # コンボボックスの更新
-        self.category_combobox['values'] = self.categories
-        filter_categories = ["すべて"] + self.categories
-        self.filter_category_combobox['values'] = filter_categories
-        
-        # もしカテゴリリストが空なら「その他」を追加
-        if not self.categories:
-            self.categories.append("その他")
-            self.category_listbox.insert(tk.END, "その他")
-            self.category_combobox['values'] = self.categories
+        self.update_category_lists()
         
         self.save_tasks()
         self.display_tasks()
         
     def on_close(self):
         # アプリケーション終了時の処理
-        self.reminder_active = False  # リマインダースレッドを停止
+        self.reminders.stop()  # リマインダースレッドを停止
+        self.notifications.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()  # 最後の計測値を書き出す
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.api is not None:
+            self.api.stop()
+        if self.archive_thread is not None:
+            self.archive_thread.join()  # アーカイブに移したタスクの削除を保存してから終了する
+        # 読み込みの途中で終了した場合は、読み込み途中の内容で上書きしないよう保存しない
+        self.loader = None
+        if self.writer is not None:
+            # 終了を待つ間はメインループが止まっているので、保存スレッドからは画面に依頼しない
+            self.writer.on_saved = None
+            self.writer.stop()  # 未保存の変更を書き出してから終了
+            self.storage.close(self.store)
         self.root.destroy()
         
     def set_reminder(self):
@@ -445,11 +860,13 @@ class TodoApp:
         values = self.tree.item(item, 'values')
         task_id = int(values[0])
         task_title = values[1]
+        if self.includes_archived([item]):
+            return
         
         # リマインド設定ダイアログ
         reminder_window = tk.Toplevel(self.root)
         reminder_window.title("リマインド設定")
-        reminder_window.geometry("300x200")
+        reminder_window.geometry("320x280")
         reminder_window.transient(self.root)
         reminder_window.grab_set()
         
@@ -469,22 +886,65 @@ class TodoApp:
         minutes_combobox.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
         ttk.Label(frame, text="分後").grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
         
+        # 繰り返し（「毎日 9:00」などの規則か cron の形。繰り返す場合は「何分後」は使わない）
+        task = self.store.get(task_id)
+        ttk.Label(frame, text="繰り返し:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.W)
+        repeat_var = tk.StringVar(value=describe_rule(task.repeat) if task.repeat else "なし")
+        ttk.Combobox(frame, textvariable=repeat_var, values=["なし"] + REPEAT_CHOICES, width=16).grid(
+            row=3, column=1, padx=5, pady=5, sticky=tk.W)
+        preview_var = tk.StringVar()
+        ttk.Label(frame, textvariable=preview_var).grid(row=4, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        
+        def repeat_rule():
+            # 入力された規則（繰り返さなければNone、不正なら ValueError）
+            text = repeat_var.get().strip()
+            return canonical_rule(text) if text and text != "なし" else None
+        
+        def update_preview(*args):
+            # 次の3回分の予定を表示する（規則から必要な分だけ求める）
+            try:
+                rule = repeat_rule()
+            except ValueError as e:
+                preview_var.set(str(e))
+                return
+            if rule is None:
+                preview_var.set("")
+                return
+            upcoming = [format_time(due) for due in islice(occurrences(rule, time.time()), 3)]
+            preview_var.set("次回: " + "、".join(upcoming) if upcoming else "一致する日時がありません")
+        
+        repeat_var.trace_add('write', update_preview)
+        update_preview()
+        
         # ボタン
         def set_reminder_for_task():
-            minutes = minutes_var.get()
-            
-            # 現在時刻を取得
-            now = datetime.now()
+            try:
+                rule = repeat_rule()
+            except ValueError as e:
+                messagebox.showwarning("警告", str(e), parent=reminder_window)
+                return
+            task = self.store.get(task_id)
+            if task is None:
+                reminder_window.destroy()
+                return
+            previous = (task.reminder, task.repeat)
             
-            # リマインド時刻を計算
-            reminder_time = now + timedelta(minutes=minutes)
-            reminder_time_str = reminder_time.strftime('%Y-%m-%d %H:%M')
-            
-            # タスクのリマインド時刻を設定
-            for task in self.tasks:
-                if task['id'] == task_id:
-                    task['reminder'] = reminder_time_str
-                    break
+            if rule is not None:
+                # 繰り返す場合は次の予定の時刻だけをリマインドに設定する
+                task = self.store.set_repeat(task_id, rule)
+                if task.reminder is None:
+                    messagebox.showwarning("警告", "一致する日時がありません", parent=reminder_window)
+                reminder_time = task.reminder
+            else:
+                # リマインド時刻を計算（tasks.json と同じく分の単位に揃える）
+                reminder_time = (int(time.time()) + minutes_var.get() * 60) // 60 * 60
+                # タスクのリマインド時刻を設定
+                task = self.store.update(task_id, reminder=reminder_time, repeat=None)
+            reminder_time_str = format_time(reminder_time)
+            self.history.record("リマインド設定", Batch([
+                SetValues('reminder', [(task_id, task.reminder, previous[0])]),
+                SetValues('repeat', [(task_id, task.repeat, previous[1])] if task.repeat != previous[1] else [])
+            ]))
             
             # 保存と表示の更新
             self.save_tasks()
@@ -493,40 +953,43 @@ class TodoApp:
             # 通知
             notification_title = "リマインドが設定されました"
             notification_message = f"タスク「{task_title}」のリマインドを{reminder_time_str}に設定しました。"
-            self.toaster.show_toast(notification_title, notification_message, duration=5, threaded=True)
+            self.notifications.notify('reminder_set', notification_title, notification_message,
+                                      summary=(notification_title, "{count}件のタスクにリマインドを設定しました。"))
             
             reminder_window.destroy()
         
-        ttk.Button(frame, text="設定", command=set_reminder_for_task).grid(row=3, column=0, padx=5, pady=20)
-        ttk.Button(frame, text="キャンセル", command=reminder_window.destroy).grid(row=3, column=1, padx=5, pady=20)
-        
-    def check_reminders(self):
-        # 定期的にリマインドをチェック
-        while self.reminder_active:
-            current_time = datetime.now()
-            current_time_str = current_time.strftime('%Y-%m-%d %H:%M')
+        ttk.Button(frame, text="設定", command=set_reminder_for_task).grid(row=5, column=0, padx=5, pady=20)
+        ttk.Button(frame, text="キャンセル", command=reminder_window.destroy).grid(row=5, column=1, padx=5, pady=20)
+        
+    def fire_reminders(self, task_ids):
+        # 時刻になったリマインドの通知（UIスレッドで実行）
+        now = time.time()
+        fired = []
+        for task_id in task_ids:
+            task = self.store.get(task_id)
+            # 通知までの間に完了・変更されたタスクは対象外
+            due = reminder_due(task) if task is not None else None
+            if due is None or due > now:
+                continue
+            self.metrics.observe('todo_reminder_lateness_seconds', now - due, buckets=LATENESS_BUCKETS)
+                
+            # 通知
+            notification_title = "リマインド: タスクの時間です"
+            notification_message = f"タスク「{task.title}」の時間になりました。\nカテゴリ: {task.category}\n優先度: {task.priority}"
+            self.notifications.notify('reminder', notification_title, notification_message, duration=10,
+                                      summary=(notification_title, "{count}件のタスクの時間になりました。"))
             
-            # 全タスクをチェック
-            for task in self.tasks:
-                if task['status'] == 'active' and 'reminder' in task and task['reminder'] != '未設定':
-                    reminder_time = task['reminder']
-                    
-                    # 現在時刻がリマインド時刻と一致または過ぎた場合
-                    if current_time_str >= reminder_time:
-                        # 通知
-                        notification_title = "リマインド: タスクの時間です"
-                        notification_message = f"タスク「{task['title']}」の時間になりました。\nカテゴリ: {task['category']}\n優先度: {task['priority']}"
-                        self.toaster.show_toast(notification_title, notification_message, duration=10, threaded=True)
-                        
-                        # リマインドをリセット
-                        task['reminder'] = '未設定'
-                        self.save_tasks()
-                        
-                        # UIを更新（メインスレッドで実行）
-                        self.root.after(0, self.display_tasks)
+            # リマインドをリセット（繰り返すタスクは次の予定に進める）
+            if task.repeat:
+                self.store.advance(task_id, now)
+            else:
+                self.store.set_reminder(task_id, None)
+            fired.append(task_id)
             
-            # 1分ごとにチェック
-            time.sleep(60)
+        # 完了するか新しいリマインドを設定するまで、集計のリマインド期限切れに数える
+        self.store.mark_fired(fired)
+        self.save_tasks()
+        self.display_tasks(self.current_status)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,214 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# ヒストグラムの区切り（秒）。Prometheus の既定値と同じ
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 描画した行数の区切り
+ROW_BUCKETS = (0, 1, 10, 50, 100, 300, 1000, 10000)
+# リマインドの遅れ（秒）の区切り
+LATENESS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 区切りごとの件数（最後は区切りを超えたもの）
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+
+class Metrics:
+    # 計測値の記録（ヒストグラム・カウンター・ゲージ）
+    # 各値は名前とラベルの組で区別する。UIスレッド・保存スレッド・リマインダースレッドから
+    # 記録されるのでロックする。ゲージは書き出すときに関数を呼んで値を得る。
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, func, kind='gauge', **labels):
+        # func() の戻り値を書き出すときの値とする（Noneの場合は書き出さない）
+        # 累計の値（書き込んだバイト数など）は kind='counter' とする
+        self._gauges[(name, tuple(sorted(labels.items())))] = (func, kind)
+
+    def timed(self, name, func, **labels):
+        # func の実行時間を name のヒストグラムに記録する関数を返す
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+
+    def instrument(self, obj, method_names, name, label='handler'):
+        # obj のメソッドを計測付きのものに置き換える（インスタンスの属性として上書きする）
+        for method_name in method_names:
+            setattr(obj, method_name, self.timed(name, getattr(obj, method_name), **{label: method_name}))
+
+    def snapshot(self):
+        # 現在の値（JSONで書き出せる形）
+        with self._lock:
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'buckets': list(h.buckets), 'counts': list(h.counts),
+                 'count': h.count, 'sum': h.sum, 'max': h.max}
+                for (name, labels), h in self._histograms.items()
+            ]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+        gauges = []
+        for (name, labels), (func, kind) in list(self._gauges.items()):
+            try:
+                value = func()
+            except Exception:
+                value = None
+            if value is not None:
+                gauges.append({'name': name, 'labels': dict(labels), 'value': value, 'kind': kind})
+        return {'time': time.time(), 'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=1)
+
+    def to_prometheus(self):
+        # Prometheus のテキスト形式
+        data = self.snapshot()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name in typed:
+                return
+            typed.add(name)
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for item in data['counters']:
+            header(item['name'], 'counter')
+            lines.append(f"{item['name']}{format_labels(item['labels'])} {item['value']}")
+        for item in data['gauges']:
+            header(item['name'], item['kind'])
+            lines.append(f"{item['name']}{format_labels(item['labels'])} {item['value']}")
+        for item in data['histograms']:
+            name = item['name']
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(list(item['buckets']) + ['+Inf'], item['counts']):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(item['labels'], le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(item['labels'])} {item['sum']}")
+            lines.append(f"{name}_count{format_labels(item['labels'])} {item['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+class NullMetrics:
+    # 計測を無効にした場合（何も記録しない）
+    # 計測の仕組みは instrument() でメソッドを置き換えて組み込むので、無効の場合は
+    # 元のメソッドがそのまま呼ばれ、処理の時間は増えない。
+    enabled = False
+
+    def describe(self, name, help_text):
+        pass
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        pass
+
+    def inc(self, name, amount=1, **labels):
+        pass
+
+    def gauge(self, name, func, kind='gauge', **labels):
+        pass
+
+    def timed(self, name, func, **labels):
+        return func
+
+    def instrument(self, obj, method_names, name, label='handler'):
+        pass
+
+
+def format_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+class MetricsExporter:
+    # interval 秒ごとに計測値をファイルに書き出すスレッド
+    # 拡張子が .json の場合はJSON、それ以外は Prometheus のテキスト形式
+    # （node_exporter の textfile collector などでそのまま読める）。
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self):
+        if self.path.endswith('.json'):
+            text = self.metrics.to_json()
+        else:
+            text = self.metrics.to_prometheus()
+        # 読み手が書き込み途中のファイルを見ないように置き換える
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+
+    def stop(self):
+        # 最後の値を書き出してから終了する
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            stopped = self._stop.wait(self.interval)
+            try:
+                self.write()
+            except OSError:
+                pass
+            if stopped:
+                return
+
+
+def create_metrics(path=None):
+    # 計測の設定（path が空なら無効）
+    if not path:
+        return NullMetrics()
+    return Metrics()
@@ -0,0 +1,158 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+# subprocess・shutil は起動を速くするため、使うときに読み込む
+
+
+class Notifier:
+    # 通知の表示方法（バックエンド）の基底クラス
+    def show(self, title, message, duration=5):
+        raise NotImplementedError
+
+
+class NullNotifier(Notifier):
+    # 何も表示しない
+    def show(self, title, message, duration=5):
+        pass
+
+
+class LogNotifier(Notifier):
+    # 通知をログファイル（または標準エラー）に書き出す（ヘッドレスでの実行・テスト用）
+    def __init__(self, path=None):
+        self.path = path
+
+    def show(self, title, message, duration=5):
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {title}: {message.replace(chr(10), ' / ')}\n"
+        if self.path is None:
+            sys.stderr.write(line)
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+class WindowsToastNotifier(Notifier):
+    # Windowsのトースト通知（win10toast は最初の通知まで読み込まない）
+    def __init__(self):
+        self._toaster = None
+
+    def show(self, title, message, duration=5):
+        if self._toaster is None:
+            from win10toast import ToastNotifier as Win10Toast
+            self._toaster = Win10Toast()
+        # 通知スレッドから呼ばれるので、表示が終わるまでここで待つ（トーストは1件ずつ表示される）
+        self._toaster.show_toast(title, message, duration=duration, threaded=False)
+
+
+class NotifySendNotifier(Notifier):
+    # Linuxのデスクトップ通知（notify-send）
+    def show(self, title, message, duration=5):
+        import subprocess
+        subprocess.run(['notify-send', '-t', str(duration * 1000), title, message], check=False)
+
+
+def create_notifier(kind='auto', log_path=None):
+    # 通知バックエンドの選択（'auto' / 'toast' / 'notify-send' / 'log' / 'none'）
+    if kind == 'auto':
+        import shutil
+        if sys.platform == 'win32':
+            kind = 'toast'
+        elif os.environ.get('DISPLAY') and shutil.which('notify-send'):
+            kind = 'notify-send'
+        else:
+            kind = 'log'
+    if kind == 'toast':
+        return WindowsToastNotifier()
+    if kind == 'notify-send':
+        return NotifySendNotifier()
+    if kind == 'log':
+        return LogNotifier(log_path)
+    if kind == 'none':
+        return NullNotifier()
+    raise ValueError(f"未対応の通知方式です: {kind}")
+
+
+class NotificationDispatcher:
+    # 通知をキューに入れて1つのスレッドで表示する
+    # notify() はキューに入れるだけで待たない（キューが一杯のときは捨てて dropped に数える）。
+    # 表示の間隔は min_interval 秒以上空け、その間に溜まった同じ種類の通知は summary を使って
+    # 「500件のタスクを削除しました」のような1件にまとめる（件数は各通知の count の合計）。
+    def __init__(self, notifier, maxsize=1000, min_interval=1.0, coalesce_window=0.2):
+        self.notifier = notifier
+        self.min_interval = min_interval
+        self.coalesce_window = coalesce_window
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.shown = 0
+        self._last_shown = 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def notify(self, kind, title, message, summary=None, duration=5, count=1):
+        # summary は同じ種類の通知をまとめるときの (タイトル, 本文) で、本文の {count} に件数が入る
+        # count はこの通知が表すタスクの件数（「500件のタスクを削除しました」なら500）
+        try:
+            self.queue.put_nowait((kind, title, message, summary, duration, count))
+        except queue.Full:
+            self.dropped += 1
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def stop(self):
+        # 溜まっている通知は表示せずに終了する
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            # 続けて届く通知をまとめるため、少し待ってからキューの中身をすべて取り出す
+            time.sleep(self.coalesce_window)
+            items = [item]
+            stop = False
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+
+            for title, message, duration in self._coalesce(items):
+                # 表示の間隔を min_interval 秒以上空ける
+                delay = self._last_shown + self.min_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    self.notifier.show(title, message, duration)
+                except Exception:
+                    # 通知の失敗でアプリの動作を止めない
+                    pass
+                self.shown += 1
+                self._last_shown = time.monotonic()
+            if stop:
+                return
+
+    def _coalesce(self, items):
+        # 種類ごとにまとめる（まとめ方が指定されていない通知と1件だけの通知はそのまま）
+        groups = {}
+        for item in items:
+            groups.setdefault(item[0], []).append(item)
+        for kind, group in groups.items():
+            summary = group[0][3]
+            if len(group) == 1 or summary is None:
+                for _, title, message, _, duration, _ in group:
+                    yield title, message, duration
+                continue
+            title, message = summary
+            count = sum(item[5] for item in group)
+            yield title, message.format(count=f'{count:,}'), max(item[4] for item in group)
@@ -0,0 +1,180 @@
+import bisect
+import functools
+from datetime import datetime, timedelta
+
+# 繰り返しの予定（タスク・リマインドの繰り返し）
+# 規則は cron と同じ5つの欄「分 時 日 月 曜日」の文字列で、タスクごとに1つだけ持つ（tasks.json の 'repeat'）。
+# 予定の1回ごとの行は作らず、必要になったときに次の時刻だけを求める（occurrences はジェネレーター）。
+# タスクのリマインドには次の1回だけを設定し、その時刻が来たら（または完了したら）次の時刻に進める。
+# 入力には次の書き方も使える（保存するときは cron の形に直す。describe_rule の表示もそのまま入力に使える）:
+#   毎日 9:00 / daily 9:00
+#   平日 9:00 / weekdays 9:00
+#   毎週 月,木 9:00 / weekly mon,thu 9:00
+#   毎月 1 9:00 / monthly 1 9:00
+# 時刻は端末のローカル時刻。
+
+# 曜日の名前（cron と同じく 0 = 日曜）
+WEEKDAY_NAMES = ('日', '月', '火', '水', '木', '金', '土')
+WEEKDAY_ALIASES = {name: i for i, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+WEEKDAY_ALIASES.update({name: i for i, name in enumerate(WEEKDAY_NAMES)})
+
+# 各欄の範囲
+FIELDS = (('分', 0, 59), ('時', 0, 23), ('日', 1, 31), ('月', 1, 12), ('曜日', 0, 7))
+
+# 次の時刻を探す範囲（2月30日のように一致する日がない規則で探し続けないため）
+SEARCH_YEARS = 8
+
+# 画面の選択肢（自由に書き換えて入力することもできる）
+REPEAT_CHOICES = ["毎日 9:00", "平日 9:00", "毎週 月 9:00", "毎月 1 9:00", "0 */2 * * *"]
+
+
+def _parse_field(text, index):
+    name, low, high = FIELDS[index]
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            if not step_text.isdigit() or int(step_text) < 1:
+                raise ValueError(f"{name}の間隔が不正です: {step_text}")
+            step = int(step_text)
+        if part == '*':
+            start, end = low, high
+        else:
+            bounds = [_parse_value(value, index) for value in part.split('-', 1)]
+            start, end = bounds[0], bounds[-1]
+            if step > 1 and len(bounds) == 1:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"{name}の値が範囲外です: {part}")
+        values.update(range(start, end + 1, step))
+    if index == 4 and 7 in values:
+        values.discard(7)
+        values.add(0)
+    return sorted(values)
+
+
+def _parse_value(text, index):
+    if index == 4 and text.lower() in WEEKDAY_ALIASES:
+        return WEEKDAY_ALIASES[text.lower()]
+    if not text.isdigit():
+        raise ValueError(f"{FIELDS[index][0]}の値が不正です: {text}")
+    return int(text)
+
+
+def _parse_clock(text):
+    hour, sep, minute = text.partition(':')
+    if not sep or not hour.isdigit() or not minute.isdigit() or int(hour) > 23 or int(minute) > 59:
+        raise ValueError(f"時刻は H:MM の形で指定してください: {text}")
+    return int(minute), int(hour)
+
+
+@functools.lru_cache(maxsize=1024)
+def canonical_rule(text):
+    # 入力された規則を保存する形（cron の5つの欄）に直す（不正なら ValueError）
+    words = text.split()
+    if not words:
+        raise ValueError("繰り返しの規則がありません")
+    keyword = words[0].lower()
+    if keyword in ('毎日', 'daily', '平日', 'weekdays') and len(words) == 2:
+        minute, hour = _parse_clock(words[1])
+        fields = [str(minute), str(hour), '*', '*', '1-5' if keyword in ('平日', 'weekdays') else '*']
+    elif keyword in ('毎週', 'weekly') and len(words) == 3:
+        minute, hour = _parse_clock(words[2])
+        names = words[1].replace('、', ',').replace('・', ',').split(',')
+        days = sorted({_parse_value(day, 4) % 7 for day in names})
+        fields = [str(minute), str(hour), '*', '*', ','.join(map(str, days))]
+    elif keyword in ('毎月', 'monthly') and len(words) == 3:
+        minute, hour = _parse_clock(words[2])
+        fields = [str(minute), str(hour), str(_parse_value(words[1].rstrip('日'), 2)), '*', '*']
+    elif len(words) == 5:
+        fields = words
+    else:
+        raise ValueError(f"繰り返しの規則が不正です: {text}")
+    for index, field in enumerate(fields):
+        _parse_field(field, index)
+    return ' '.join(fields)
+
+
+class Rule:
+    # 解析済みの規則（同じ規則のタスクで共有する）
+    def __init__(self, text):
+        fields = text.split()
+        self.text = text
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, index) for index, field in enumerate(fields))
+        self.months_set = set(self.months)
+        self.days_set = set(self.days)
+        self.weekdays_set = set(self.weekdays)
+        # cron と同じく、日と曜日の両方を指定した場合はどちらかに一致すればよい
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days_set
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays_set
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, after):
+        # after（エポック秒）より後で規則に一致する最初の時刻（見つからなければNone）
+        moment = datetime.fromtimestamp(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + SEARCH_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months_set:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            # 時・分は一致する次の値まで飛ばす
+            i = bisect.bisect_left(self.hours, moment.hour)
+            if i == len(self.hours):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if self.hours[i] != moment.hour:
+                moment = moment.replace(hour=self.hours[i], minute=0)
+            i = bisect.bisect_left(self.minutes, moment.minute)
+            if i == len(self.minutes):
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+                continue
+            return int(moment.replace(minute=self.minutes[i]).timestamp())
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_rule(text):
+    return Rule(canonical_rule(text))
+
+
+def occurrences(rule, after):
+    # after より後の予定の時刻を順に返す（取り出した分だけ計算する）
+    parsed = parse_rule(rule)
+    while True:
+        after = parsed.next_after(after)
+        if after is None:
+            return
+        yield after
+
+
+def next_occurrence(rule, after):
+    return next(occurrences(rule, after), None)
+
+
+@functools.lru_cache(maxsize=1024)
+def describe_rule(rule):
+    # 画面に表示する規則の説明（「毎日 9:00」など、当てはまらなければ cron の形のまま）
+    minute, hour, day, month, weekday = rule.split()
+    if not (minute.isdigit() and hour.isdigit()) or month != '*':
+        return rule
+    clock = f'{int(hour)}:{int(minute):02d}'
+    if day == '*' and weekday == '*':
+        return f'毎日 {clock}'
+    if day == '*' and weekday == '1-5':
+        return f'平日 {clock}'
+    if day == '*' and all(part.isdigit() for part in weekday.split(',')):
+        return f"毎週 {'・'.join(WEEKDAY_NAMES[int(part) % 7] for part in weekday.split(','))} {clock}"
+    if day.isdigit() and weekday == '*':
+        return f'毎月 {int(day)}日 {clock}'
+    return rule
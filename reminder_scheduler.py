@@ -0,0 +1,129 @@
+import heapq
+import threading
+import time
+
+
+def reminder_due(task):
+    # 未完了でリマインドが設定されていれば、その時刻（エポック秒）を返す
+    if task.status != 'active':
+        return None
+    return task.reminder
+
+
+class ReminderScheduler:
+    # リマインドを時刻順の最小ヒープで管理し、次の時刻まで条件変数で待つ
+    # 予定の追加・変更・取り消しは O(log n)（取り消しは印を付けておき、ヒープの先頭に来た時点で捨てる）。
+    # 時刻になったタスクIDは on_due(task_ids) に渡す（このスレッドから呼ばれる）。
+    def __init__(self, on_due):
+        self.on_due = on_due
+        self._cond = threading.Condition()
+        self._heap = []
+        # タスクID -> ヒープ内の有効なエントリ [時刻, 連番, タスクID]
+        self._entries = {}
+        self._counter = 0
+        self._running = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, tasks):
+        # 起動時に全タスクの予定をまとめて登録する（heapify で O(n)）
+        with self._cond:
+            self._heap = []
+            self._entries = {}
+            for task in tasks:
+                due = reminder_due(task)
+                if due is not None:
+                    self._counter += 1
+                    entry = [due, self._counter, task.id]
+                    self._entries[task.id] = entry
+                    self._heap.append(entry)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def schedule(self, task_id, due):
+        with self._cond:
+            old = self._entries.get(task_id)
+            if old is not None:
+                if old[0] == due:
+                    return
+                old[2] = None
+            self._counter += 1
+            entry = [due, self._counter, task_id]
+            self._entries[task_id] = entry
+            heapq.heappush(self._heap, entry)
+            self._compact()
+            # 先頭が変わった場合に待ち時間を計算し直させる
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def cancel(self, task_id):
+        with self._cond:
+            entry = self._entries.pop(task_id, None)
+            if entry is not None:
+                entry[2] = None
+                self._compact()
+
+    def update(self, task):
+        # タスクの状態に合わせて予定を登録・変更・取り消す
+        due = reminder_due(task)
+        if due is None:
+            self.cancel(task.id)
+        else:
+            self.schedule(task.id, due)
+
+    def on_store_change(self, op, data):
+        # TaskStore の変更通知を受け取り、完了・削除・リマインド変更を予定に反映する
+        if op == 'put':
+            self.update(data)
+        elif op == 'delete':
+            self.cancel(data.id)
+
+    def _compact(self):
+        # 取り消し済みのエントリが半分を超えたらヒープを作り直す
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # 待機中でもすぐに終了させる
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _pop_due(self, now):
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if entry[2] is not None:
+                del self._entries[entry[2]]
+                due_ids.append(entry[2])
+        return due_ids
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    # 取り消し済みの先頭を捨ててから次の時刻まで待つ
+                    while self._heap and self._heap[0][2] is None:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.time()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                due_ids = self._pop_due(time.time())
+            if due_ids:
+                self.on_due(due_ids)
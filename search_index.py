@@ -0,0 +1,75 @@
+import unicodedata
+
+
+def normalize(text):
+    # 全角・半角や大文字・小文字の違いを吸収する
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def grams(text):
+    # 1文字と連続する2文字の集合（1文字の検索語にも対応するため1文字も索引に入れる）
+    result = set(text)
+    result.update(text[i:i + 2] for i in range(len(text) - 1))
+    return result
+
+
+class SearchIndex:
+    # タイトルの文字 bi-gram による転置インデックス
+    # 検索語の bi-gram を持つタスクIDの集合の積を取り、最後に部分一致を確認する。
+    # タスクの追加・削除・タイトル変更ごとに、そのタスクの分だけを更新する。
+    def __init__(self):
+        # gram -> タスクIDの集合
+        self._postings = {}
+        # タスクID -> 正規化したタイトル
+        self._titles = {}
+
+    def __len__(self):
+        return len(self._titles)
+
+    def clear(self):
+        self._postings = {}
+        self._titles = {}
+
+    def add(self, task_id, title):
+        text = normalize(title)
+        self._titles[task_id] = text
+        for gram in grams(text):
+            self._postings.setdefault(gram, set()).add(task_id)
+
+    def remove(self, task_id):
+        text = self._titles.pop(task_id, None)
+        if text is None:
+            return
+        for gram in grams(text):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def update(self, task_id, title):
+        if self._titles.get(task_id) == normalize(title):
+            return
+        self.remove(task_id)
+        self.add(task_id, title)
+
+    def search(self, query):
+        # タイトルに query を含むタスクIDの集合
+        text = normalize(query.strip())
+        if not text:
+            return set(self._titles)
+        if len(text) == 1:
+            return set(self._postings.get(text, ()))
+        keys = {text[i:i + 2] for i in range(len(text) - 1)}
+        postings = []
+        for key in keys:
+            ids = self._postings.get(key)
+            if not ids:
+                return set()
+            postings.append(ids)
+        # 小さい集合から積を取る
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if len(text) == 2:
+            return candidates
+        return {task_id for task_id in candidates if text in self._titles[task_id]}
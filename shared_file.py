@@ -0,0 +1,204 @@
+import os
+import sys
+import threading
+
+# 複数のアプリ（プロセス）で同じ tasks.json を使うための部品
+#   FileLock:       プロセス間の排他ロック（ロックファイルに小さな値も保存できる）
+#   create_watcher: tasks.json とジャーナルの変更の検出（inotify、使えない環境では更新日時・サイズの監視）
+
+
+class FileLock:
+    # ロックファイルによるプロセス間の排他ロック（同じプロセス内では再入できる）
+    # POSIX では flock、Windows では msvcrt.locking を使う。
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                _lock_file(self._file)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_file(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+
+    def read(self):
+        # ロックファイルの内容（ロック中のみ）
+        self._file.seek(0)
+        return self._file.read().decode('utf-8')
+
+    def write(self, text):
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(text.encode('utf-8'))
+        self._file.flush()
+
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_file(f):
+        # 先頭1バイトをロックする（LK_LOCK は10秒で諦めるので取れるまで繰り返す）
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_signature(path):
+    # ファイルが書き換えられたかどうかの判定に使う値（存在しなければNone）
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _watched(name, prefix):
+    # tasks.json とジャーナルだけを対象にする（一時ファイルとロックファイルは除く）
+    return name.startswith(prefix) and not name.endswith(('.tmp', '.lock'))
+
+
+class InotifyWatcher:
+    # Linux の inotify でディレクトリを監視し、対象のファイルが変わったら callback() を呼ぶ
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self, path, callback):
+        import ctypes
+        import ctypes.util
+        import select
+        self._select = select
+        directory = os.path.dirname(os.path.abspath(path))
+        self.prefix = os.path.basename(path)
+        self.callback = callback
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 に失敗しました")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch に失敗しました")
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        os.write(self._wakeup_w, b'x')
+        self._thread.join()
+        for fd in (self._fd, self._wakeup_r, self._wakeup_w):
+            os.close(fd)
+
+    def _run(self):
+        while True:
+            readable, _, _ = self._select.select([self._fd, self._wakeup_r], [], [])
+            if self._wakeup_r in readable:
+                return
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            # struct inotify_event: int wd; uint32 mask, cookie, len; char name[len]
+            changed = False
+            offset = 0
+            while offset + 16 <= len(data):
+                length = int.from_bytes(data[offset + 12:offset + 16], sys.byteorder)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += 16 + length
+                if _watched(name, self.prefix):
+                    changed = True
+            if changed:
+                self.callback()
+
+
+class PollingWatcher:
+    # 対象のファイルの更新日時・サイズを interval 秒ごとに調べ、変わっていたら callback() を呼ぶ
+    def __init__(self, path, callback, interval=1.0):
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.prefix = os.path.basename(path)
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._signature = self._scan()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _scan(self):
+        signature = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if _watched(entry.name, self.prefix):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    signature.append((entry.name, st.st_size, st.st_mtime_ns))
+        return sorted(signature)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                signature = self._scan()
+            except OSError:
+                continue
+            if signature != self._signature:
+                self._signature = signature
+                self.callback()
+
+
+def create_watcher(path, callback, interval=1.0):
+    # path（tasks.json）とそのジャーナルの変更を監視する
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(path, callback)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(path, callback, interval)
@@ -0,0 +1,87 @@
+import bisect
+
+# 並べ替えに使える列
+SORT_COLUMNS = ('id', 'title', 'category', 'priority', 'status', 'created_at', 'reminder')
+
+# リマインド未設定の並び位置（昇順・降順とも最後）
+_NO_REMINDER = float('inf')
+
+
+class Descending:
+    # 文字列の列を降順に並べるためのキー（比較を逆にする）
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _column_key(column, descending):
+    # 1列分のキーを返す関数（優先度・状態は対応表のコードの順 = 高・中・低、未完了・完了の順）
+    if column == 'id':
+        return (lambda task: -task.id) if descending else (lambda task: task.id)
+    if column in ('title', 'category'):
+        if descending:
+            return lambda task: Descending(getattr(task, column))
+        return lambda task: getattr(task, column)
+    if column == 'reminder':
+        if descending:
+            return lambda task: _NO_REMINDER if task.reminder is None else -task.reminder
+        return lambda task: _NO_REMINDER if task.reminder is None else task.reminder
+    attribute = {'priority': '_priority', 'status': '_status', 'created_at': 'created_at'}[column]
+    if descending:
+        return lambda task: -getattr(task, attribute)
+    return lambda task: getattr(task, attribute)
+
+
+def make_key(order):
+    # order: ((列名, 降順か), ...) の順に比べ、最後はタスクIDで比べるキー関数（同じ値の並びは常にID順で安定）
+    funcs = [_column_key(column, descending) for column, descending in order]
+    return lambda task: tuple([func(task) for func in funcs] + [task.id])
+
+
+class SortIndex:
+    # 1つの並び順（複数列）でのタスクの並びを保持する
+    # キーの昇順のリストを bisect で探して挿入・削除するので、タスクの追加・変更・削除のたびに
+    # 全体を並べ替え直さない（探索は O(log n)、リストへの挿入・削除はメモリの移動だけ）。
+    def __init__(self, order, tasks=()):
+        self.order = order
+        self.key = make_key(order)
+        self.keys = sorted(self.key(task) for task in tasks)
+        # keys と同じ並びのタスクID
+        self.ids = [key[-1] for key in self.keys]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, task):
+        key = self.key(task)
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, task.id)
+
+    def remove(self, task):
+        # task は追加したときと同じ値であること（TaskStore は値を変える前に取り除く）
+        key = self.key(task)
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+            del self.ids[position]
+
+    def move(self, old_key, task):
+        # 値を変えたタスクの位置を移す（old_key は変える前のキー、キーが同じなら何もしない）
+        key = self.key(task)
+        if key == old_key:
+            return
+        position = bisect.bisect_left(self.keys, old_key)
+        if position < len(self.keys) and self.keys[position] == old_key:
+            del self.keys[position]
+            del self.ids[position]
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, task.id)
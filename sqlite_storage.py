@@ -0,0 +1,325 @@
+import os
+import sqlite3
+import threading
+from array import array
+
+from sort_index import SORT_COLUMNS
+from storage import JournalStorage
+from task_model import Task, PRIORITIES, STATUSES, NO_REMINDER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    reminder TEXT NOT NULL,
+    repeat TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS categories (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_filter ON tasks (status, category, priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category, priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_reminder ON tasks (reminder) WHERE reminder != '未設定';
+"""
+
+COLUMNS = ('id', 'title', 'category', 'priority', 'status', 'created_at', 'reminder', 'repeat', 'version')
+
+INSERT_TASK = f"INSERT OR REPLACE INTO tasks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+# IN (...) に1回で渡すIDの数（SQLiteのパラメーター数の上限より小さくする）
+FETCH_BATCH = 500
+
+
+def task_row(task):
+    # Task をテーブルの1行に変換する（列の値は tasks.json と同じ文字列、repeat は繰り返さなければNULL）
+    # version は他のアプリの変更と突き合わせるときに tasks.json・ジャーナルと同じように使う
+    data = task.to_dict()
+    return tuple(data.get(column) for column in COLUMNS)
+
+
+def row_task(row):
+    return Task.from_dict(dict(row))
+
+
+def _code_order(column, names):
+    # 優先度・状態を対応表の順（高・中・低、未完了・完了）に並べる式
+    cases = ' '.join(f"WHEN '{name}' THEN {code}" for code, name in enumerate(names))
+    return f'CASE {column} {cases} ELSE {len(names)} END'
+
+
+def order_by(order):
+    # sort_index.make_key と同じ並びの ORDER BY 句（最後はID順、リマインド未設定は昇順・降順とも最後）
+    # 日時の列は tasks.json と同じ「YYYY-MM-DD HH:MM」なので、文字列の順がそのまま時刻の順になる
+    terms = []
+    for column, descending in order:
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"並べ替えに使えない列です: {column}")
+        direction = ' DESC' if descending else ''
+        if column == 'priority':
+            terms.append(_code_order('priority', PRIORITIES) + direction)
+        elif column == 'status':
+            terms.append(_code_order('status', STATUSES) + direction)
+        elif column == 'reminder':
+            terms.append(f"reminder = '{NO_REMINDER}'")
+            terms.append('reminder' + direction)
+        else:
+            terms.append(column + direction)
+    terms.append('id')
+    return ', '.join(terms)
+
+
+class SqliteStorage:
+    # SQLiteに保存する方式（tasks.json と同じ内容をテーブルで持つ）
+    # 変更はタスクIDごとにまとめておき、save() で1回のトランザクションとして書き込む。
+    # filter() はインデックスを使ったクエリを LIMIT/OFFSET でページ単位に読み出す。
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+        # 保存スレッドと読み出し側で接続を共有するのでロックする
+        self._lock = threading.Lock()
+        self._conn = None
+        # 未保存の変更: タスクID -> 変更後のタスク（削除はNone）
+        self._pending = {}
+        self._pending_categories = None
+        self._next_id = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+            # repeat・version の列がない以前のデータベースには列を追加する
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(tasks)')}
+            if 'repeat' not in columns:
+                self._conn.execute('ALTER TABLE tasks ADD COLUMN repeat TEXT')
+            if 'version' not in columns:
+                self._conn.execute('ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        return self._conn
+
+    def open(self):
+        # データベースに接続する（新規作成時は tasks.json から移行する）
+        created = not os.path.exists(self.path)
+        conn = self._connect()
+        if created and self.json_path and os.path.exists(self.json_path):
+            self.migrate_from_json(self.json_path)
+        return conn
+
+    def load(self):
+        conn = self.open()
+        with self._lock:
+            tasks = [row_task(row) for row in conn.execute('SELECT * FROM tasks ORDER BY id')]
+            categories = [row['name'] for row in conn.execute('SELECT name FROM categories ORDER BY position')]
+            row = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if not tasks and not categories and row is None:
+            return None
+        return {
+            'tasks': tasks,
+            'categories': categories or None,
+            'next_id': int(row['value']) if row else None
+        }
+
+    def iter_load(self, chunk_size=5000):
+        # load() と同じ内容を少しずつ返す（最初にカテゴリと next_id、以降はID順に chunk_size 件ずつ）
+        conn = self.open()
+        with self._lock:
+            categories = [row['name'] for row in conn.execute('SELECT name FROM categories ORDER BY position')]
+            row = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        yield {'tasks': [], 'categories': categories or None, 'next_id': int(row['value']) if row else None}
+        after_id = 0
+        while True:
+            tasks = self.query(limit=chunk_size, after_id=after_id)
+            if tasks:
+                yield {'tasks': tasks}
+            if len(tasks) < chunk_size:
+                return
+            after_id = tasks[-1].id
+
+    def migrate_from_json(self, json_path):
+        # tasks.json（とジャーナル）の内容をデータベースへ一括で移行する
+        data = JournalStorage(json_path).load()
+        if data is None:
+            return 0
+        tasks = data.get('tasks', [])
+        with self._lock, self._connect() as conn:
+            conn.execute('DELETE FROM tasks')
+            conn.executemany(INSERT_TASK, (task_row(task) for task in tasks))
+            self._write_categories(conn, data.get('categories') or [])
+            self._write_next_id(conn, data.get('next_id') or 1)
+        return len(tasks)
+
+    def attach(self, store):
+        store.add_listener(self._append)
+        self._next_id = store.next_id
+
+    def _append(self, op, data):
+        # ストアのロック内で呼ばれる（書き込みは save() でまとめて行う）
+        if op == 'put':
+            self._pending[data.id] = task_row(data)
+        elif op == 'delete':
+            self._pending[data.id] = None
+        else:
+            self._pending_categories = list(data)
+
+    def save(self, store):
+        with store.lock:
+            pending, self._pending = self._pending, {}
+            categories, self._pending_categories = self._pending_categories, None
+            next_id = store.next_id
+            tombstones = store.tombstones()
+        if not pending and categories is None and next_id == self._next_id:
+            return
+        puts = [row for row in pending.values() if row is not None]
+        deletes = [(task_id,) for task_id, row in pending.items() if row is None]
+        with self._lock, self._connect() as conn:
+            conn.executemany(INSERT_TASK, puts)
+            conn.executemany('DELETE FROM tasks WHERE id = ?', deletes)
+            if categories is not None:
+                self._write_categories(conn, categories)
+            self._write_next_id(conn, next_id)
+        self._next_id = next_id
+        # 他のアプリの変更は取り込まないので、書き込んだ削除の記録は残さない
+        store.forget_tombstones(tombstones)
+
+    def append_tasks(self, tasks, categories=None):
+        # ストアを経由せずに新しいタスクを書き込む（大量インポート用、メモリには残さない）
+        with self._lock, self._connect() as conn:
+            conn.executemany(INSERT_TASK, [task_row(task) for task in tasks])
+            if categories is not None:
+                self._write_categories(conn, categories)
+            if tasks:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+                next_id = max(int(row[0]) if row else 1, tasks[-1].id + 1)
+                self._write_next_id(conn, next_id)
+
+    def _write_categories(self, conn, categories):
+        conn.execute('DELETE FROM categories')
+        conn.executemany('INSERT INTO categories VALUES (?, ?)', enumerate(categories))
+
+    def _write_next_id(self, conn, next_id):
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (str(next_id),))
+
+    def _where(self, status, category, priority):
+        conditions = []
+        params = []
+        for column, value in (('status', status), ('category', category), ('priority', priority)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return where, params
+
+    def query(self, status=None, category=None, priority=None, limit=-1, offset=0, after_id=None):
+        # 条件に一致するタスク（Task）をID順に limit 件（-1 は全件）読み出す
+        # after_id を指定するとそのIDより後から読み出す（OFFSETを使わずに順に読み進める場合）
+        where, params = self._where(status, category, priority)
+        if after_id is not None:
+            where += (' AND' if where else ' WHERE') + ' id > ?'
+            params.append(after_id)
+        with self._lock:
+            rows = self._connect().execute(
+                f'SELECT * FROM tasks{where} ORDER BY id LIMIT ? OFFSET ?', params + [limit, offset]
+            ).fetchall()
+        return [row_task(row) for row in rows]
+
+    def sorted_ids(self, status=None, category=None, priority=None, order=()):
+        # 条件に一致するタスクのIDを order の順（TaskStore.query と同じ並び）で返す
+        where, params = self._where(status, category, priority)
+        with self._lock:
+            rows = self._connect().execute(f'SELECT id FROM tasks{where} ORDER BY {order_by(order)}', params)
+            return array('q', (row[0] for row in rows))
+
+    def fetch(self, task_ids):
+        # 指定したIDのタスクを task_ids の順で読み出す（削除されたIDは飛ばす）
+        tasks = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(task_ids), FETCH_BATCH):
+                batch = list(task_ids[start:start + FETCH_BATCH])
+                placeholders = ', '.join('?' * len(batch))
+                for row in conn.execute(f'SELECT * FROM tasks WHERE id IN ({placeholders})', batch):
+                    tasks[row['id']] = row_task(row)
+        return [tasks[task_id] for task_id in task_ids if task_id in tasks]
+
+    def count(self, status=None, category=None, priority=None):
+        where, params = self._where(status, category, priority)
+        with self._lock:
+            return self._connect().execute(f'SELECT COUNT(*) FROM tasks{where}', params).fetchone()[0]
+
+    def filter(self, status=None, category=None, priority=None, order=()):
+        return QueryResult(self, status, category, priority, order=order)
+
+    def close(self, store):
+        if self._conn is not None:
+            self.save(store)
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+class QueryResult:
+    # フィルター結果の遅延シーケンス
+    # len() は COUNT、スライスは LIMIT/OFFSET で読み出すので、TreeRenderer の仮想スクロールに
+    # そのまま渡すと表示範囲のページだけがデータベースから読み込まれる。
+    # ID順以外の並び順では、最初に並べたIDだけを読み出しておき、スライスではそのページのIDの行を読む
+    # （ページごとに全件を並べ替え直さない）。
+    def __init__(self, storage, status=None, category=None, priority=None, page_size=1000, order=()):
+        self.storage = storage
+        self.filters = {'status': status, 'category': category, 'priority': priority}
+        self.page_size = page_size
+        self.order = () if tuple(order) in ((), (('id', False),)) else tuple(order)
+        self._count = None
+        self._ids = None
+
+    def _sorted_ids(self):
+        if self._ids is None:
+            self._ids = self.storage.sorted_ids(order=self.order, **self.filters)
+        return self._ids
+
+    def __len__(self):
+        if self.order:
+            return len(self._sorted_ids())
+        if self._count is None:
+            self._count = self.storage.count(**self.filters)
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("step には対応していません")
+            if self.order:
+                return self.storage.fetch(self._sorted_ids()[start:stop])
+            return self.storage.query(limit=max(0, stop - start), offset=start, **self.filters)
+        if index < 0:
+            index += len(self)
+        rows = self[index:index + 1] if index >= 0 else []
+        if not rows:
+            raise IndexError(index)
+        return rows[0]
+
+    def __iter__(self):
+        if self.order:
+            task_ids = self._sorted_ids()
+            for start in range(0, len(task_ids), self.page_size):
+                yield from self.storage.fetch(task_ids[start:start + self.page_size])
+            return
+        after_id = 0
+        while True:
+            rows = self.storage.query(limit=self.page_size, after_id=after_id, **self.filters)
+            yield from rows
+            if len(rows) < self.page_size:
+                return
+            after_id = rows[-1].id
@@ -0,0 +1,716 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+from binary_snapshot import cache_path, open_binary_snapshot, write_binary_snapshot
+from shared_file import FileLock, file_signature
+from task_model import Task, newer_entry
+
+
+def dump_line(entry):
+    return json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+# ジャーナルのセグメントがこの数になったら、大きさによらず圧縮する
+COMPACT_SEGMENTS = 16
+
+# load() で tasks.json・キャッシュを読み込む単位（件数）
+LOAD_CHUNK_SIZE = 50000
+
+# write_snapshot が書き出す1行目の末尾（この形式のファイルは1行ずつ読み込める）
+SNAPSHOT_TASKS_KEY = '"tasks": ['
+
+
+def write_snapshot(path, data):
+    # tasks.json の形式で書き出す（タスクは1件1行。変換しながら書くので全件分の辞書は作らない）
+    # カテゴリと next_id を1行目に書いておき、起動時はタスクを読み終える前に使えるようにする。
+    # 一時ファイルに書き出して fsync した後で置き換える（書き込み途中で終了しても元のファイルは壊れない）
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"categories": ' + json.dumps(data['categories'], ensure_ascii=False))
+        f.write(', "next_id": ' + str(data['next_id']) + ', ' + SNAPSHOT_TASKS_KEY)
+        for i, task in enumerate(data['tasks']):
+            f.write(',\n' if i else '\n')
+            f.write(json.dumps(task.to_dict(), ensure_ascii=False))
+        f.write('\n]}\n')
+        f.flush()
+        os.fsync(f.fileno())
+        size = os.fstat(f.fileno()).st_size
+    os.replace(tmp_path, path)
+    # 書き出したバイト数
+    return size
+
+
+def iter_snapshot(path, chunk_size):
+    # tasks.json を少しずつ読み込む（タスクは辞書のまま）
+    # 最初にカテゴリと next_id だけを持つ {'tasks': [], 'categories', 'next_id'} を返し、
+    # 以降は {'tasks': [最大 chunk_size 件]} を返す。
+    # write_snapshot 以外で書かれたファイル（手で編集したものなど）は全体を読み込んでから分割する。
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline().rstrip()
+        if first.startswith('{') and first.endswith(SNAPSHOT_TASKS_KEY):
+            header = json.loads(first[:-len(SNAPSHOT_TASKS_KEY)].rstrip().rstrip(',') + '}')
+            tasks = None
+        else:
+            f.seek(0)
+            header = json.load(f)
+            tasks = header.pop('tasks', [])
+        yield {'tasks': [], 'categories': header.get('categories'), 'next_id': header.get('next_id')}
+
+        if tasks is not None:
+            for start in range(0, len(tasks), chunk_size):
+                yield {'tasks': tasks[start:start + chunk_size]}
+            return
+        # chunk_size 行ずつまとめて1つの配列として解析する（1行ずつ解析するより速い）
+        lines = []
+        for line in f:
+            line = line.rstrip().rstrip(',')
+            if line.startswith(']'):
+                break
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                yield {'tasks': json.loads('[' + ','.join(lines) + ']')}
+                lines = []
+        if lines:
+            yield {'tasks': json.loads('[' + ','.join(lines) + ']')}
+
+
+def read_json(path):
+    # tasks.json の内容（存在しなければNone、タスクは辞書のまま）
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class JsonStorage:
+    # tasks.json 全体を書き直す従来の保存方式
+    # 複数のアプリで同じ tasks.json を使えるように、書き込みは tasks.json.lock のロック中に行い、
+    # 他のアプリが書き換えていた場合は、その内容のうち違うタスクだけを取り込んでから書き出す。
+    # tasks.json と同じ内容のバイナリのキャッシュ（binary_snapshot）があれば、読み込みはそちらから行う。
+    # キャッシュは終了時（ジャーナルの場合は圧縮時）に書き出し、起動時に使えなかった場合は
+    # rebuild_cache で作り直す。
+    def __init__(self, path):
+        self.path = path
+        self.lock = FileLock(path + '.lock')
+        self.cache_path = cache_path(path)
+        # 読み込み時にキャッシュが使えなかった（古い・壊れている・ない）かどうか
+        self.cache_stale = False
+        # これまでに書き込んだバイト数（計測用）
+        self.bytes_written = 0
+        # 最後に読み込んだ・書き出した tasks.json（これと違えば他のアプリが書き換えた）
+        self._signature = None
+        # キャッシュの内容の元になった tasks.json
+        self._cache_signature = None
+        # 前回の書き込みの後で変更したタスク: タスクID -> 変更前の版（このアプリで追加したものはNone）
+        # ファイルにないタスクが、他のアプリで削除されたのかこのアプリで追加したのかを区別する
+        self._dirty = {}
+        self._store = None
+        # 他のアプリの変更を取り込んだときに on_sync(変更したタスクIDのリスト) を呼ぶ（保存スレッドから）
+        self.on_sync = None
+
+    def load(self):
+        # tasks.json の内容（存在しなければNone、タスクは Task に変換する）
+        chunks = self._iter_tasks(LOAD_CHUNK_SIZE)
+        data = next(chunks, None)
+        for chunk in chunks:
+            data['tasks'].extend(chunk['tasks'])
+        return data
+
+    def iter_load(self, chunk_size=5000):
+        # load() と同じ内容を少しずつ返す（起動時に読み込みながら表示するため）
+        # 最初にカテゴリと next_id を返し、以降はタスクを最大 chunk_size 件ずつ返す。
+        return self._iter_tasks(chunk_size)
+
+    def _iter_tasks(self, chunk_size):
+        # tasks.json を iter_snapshot と同じ形で少しずつ返す（タスクは Task に変換する）
+        # 使えるキャッシュがあれば JSON は解析せず、キャッシュの行を chunk_size 件ずつ Task に戻す
+        self._signature = file_signature(self.path)
+        cache = open_binary_snapshot(self.cache_path, self._signature)
+        # キャッシュから返し終えたタスクID（キャッシュが途中で壊れていた場合）
+        loaded = None
+        if cache is not None:
+            done = 0
+            try:
+                yield {'tasks': [], 'categories': cache.categories, 'next_id': cache.next_id}
+                for tasks in cache.chunks(chunk_size):
+                    yield {'tasks': tasks}
+                    done += len(tasks)
+                self._cache_signature = self._signature
+                return
+            except ValueError:
+                # 途中で壊れたブロックが見つかった: 返し終えたタスク（確かめ済みの行）を除いて tasks.json から読む
+                loaded = set(cache.ids(0, done))
+            finally:
+                cache.close()
+        self.cache_stale = self._signature is not None
+        snapshot = iter_snapshot(self.path, chunk_size)
+        if loaded is None:
+            for data in snapshot:
+                data['tasks'] = [Task.from_dict(task) for task in data['tasks']]
+                yield data
+            return
+        # カテゴリと next_id は返し済み
+        next(snapshot, None)
+        for data in snapshot:
+            yield {'tasks': [Task.from_dict(task) for task in data['tasks'] if task['id'] not in loaded]}
+
+    def _write_cache(self, data, signature):
+        # signature の tasks.json と同じ内容（data）のキャッシュを書き出す（tasks.json のロック中に呼ぶ）
+        try:
+            write_binary_snapshot(self.cache_path, data, signature)
+        except OSError:
+            # 他のアプリが読み込み中で置き換えられない場合（Windows）など。tasks.json から読めるので次の機会に作る
+            return
+        self._cache_signature = signature
+        self.cache_stale = False
+
+    def rebuild_cache(self):
+        # 現在の tasks.json からキャッシュを作り直す（起動時にキャッシュが使えなかった場合に、別のスレッドで呼ぶ）
+        # 1つの大きな json.loads で画面のスレッドを止めないように、少しずつ読み込む
+        signature = file_signature(self.path)
+        chunks = iter_snapshot(self.path, LOAD_CHUNK_SIZE)
+        data = next(chunks, None)
+        if data is None:
+            return
+        for chunk in chunks:
+            data['tasks'].extend(Task.from_dict(task) for task in chunk['tasks'])
+        with self.lock:
+            # 読み込み中に書き換えられた場合は作らない（次回の起動で作り直す）
+            if file_signature(self.path) == signature:
+                self._write_cache(data, signature)
+
+    def attach(self, store):
+        # ストアの変更を受け取り、新しいタスクのIDは他のアプリと重ならないように予約する
+        self._store = store
+        store.reserve_ids = self.reserve_ids
+        store.add_listener(self._on_change)
+
+    def _on_change(self, op, data):
+        # 他のアプリから取り込んだ変更は書き込み済みなので記録しない
+        if self._store.merging or op == 'categories':
+            return
+        self._mark_dirty(op, data)
+
+    def _mark_dirty(self, op, task):
+        if op == 'delete':
+            base = task.version
+        else:
+            base = task.version - 1 if task.version else None
+        self._dirty.setdefault(task.id, base)
+
+    def reserve_ids(self, floor, count):
+        # floor 以上で他のアプリと重ならないIDを count 個予約し、先頭のIDを返す
+        # 予約済みの最後のIDはロックファイルに記録しておく
+        with self.lock:
+            text = self.lock.read().strip()
+            start = max(int(text) if text.isdigit() else 0, floor)
+            self.lock.write(str(start + count))
+        return start
+
+    def save(self, store):
+        with self.lock:
+            self._sync_snapshot(store)
+            with store.lock:
+                self._dirty = {}
+                data = store.snapshot()
+                tombstones = store.tombstones()
+            self.bytes_written += write_snapshot(self.path, data)
+            self._signature = file_signature(self.path)
+            # ファイル全体を書き直したので、削除したタスクの古い版はどこにも残っていない
+            store.forget_tombstones(tombstones)
+
+    def sync(self, store):
+        # 他のアプリの変更を取り込む（ファイルの変更を検出したときに保存スレッドから呼ぶ）
+        with self.lock:
+            self._sync_snapshot(store)
+
+    def _sync_snapshot(self, store):
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        data = read_json(self.path) or {}
+        disk = {task['id']: task for task in data.get('tasks', [])}
+        self._merge_disk(store, disk, data.get('categories'))
+
+    def _merge_disk(self, store, disk, categories):
+        # ファイル全体の内容（タスクID -> 辞書）と比べて、違うタスクだけを取り込む
+        with store.lock:
+            entries = []
+            for task_id, task in disk.items():
+                local = store.get(task_id)
+                # 未保存の削除との優先は store.merge が削除したタスクの版で決める
+                if local is None or local.version != task.get('version', 0) or local.to_dict() != task:
+                    entries.append(task)
+            for task in store.all():
+                if task.id in disk:
+                    continue
+                # ファイルにないタスクは他のアプリが削除した（このアプリで追加したものを除く）
+                if task.id not in self._dirty:
+                    entries.append({'id': task.id, 'version': task.version, 'deleted': True})
+                elif self._dirty[task.id] is not None:
+                    # 変更前の版に対する削除として扱う（同時に変更していた場合は newer_entry で決まる）
+                    entries.append({'id': task.id, 'version': self._dirty[task.id] + 1, 'deleted': True})
+            self._merge(store, entries, categories)
+
+    def _merge(self, store, entries, categories):
+        old_categories = list(store.categories)
+        changed = store.merge(entries, categories)
+        if (changed or store.categories != old_categories) and self.on_sync is not None:
+            self.on_sync(changed)
+
+    def close(self, store):
+        # 最後に保存した内容のキャッシュを書き出しておく（次回の起動で tasks.json を解析しない）
+        with self.lock:
+            signature = file_signature(self.path)
+            if signature is None or signature != self._signature or signature == self._cache_signature:
+                return
+            with store.lock:
+                if self._dirty:
+                    return
+                data = store.snapshot()
+            self._write_cache(data, signature)
+
+
+class JournalStorage(JsonStorage):
+    # 変更ごとに1行のJSONをジャーナルに追記する保存方式
+    # tasks.json は最後のスナップショット（従来と同じ形式）として扱い、ロード時にその上へ
+    # ジャーナルを再生する。ジャーナル全体（すべてのセグメントの合計）が compact_threshold バイトを
+    # 超えるか、セグメントが COMPACT_SEGMENTS 個以上になったら、新しいスナップショットを書き出して
+    # ジャーナルを破棄する（保存のたびと、起動して読み込んだ後に調べる）。
+    #
+    # ジャーナルは tasks.json.journal.<番号> のセグメントに分かれており、アプリごとに起動時と
+    # 圧縮時に新しいセグメントを作る。圧縮が途中で失敗しても古いセグメントは残るので、
+    # 次回のロードで再生される（同じ操作を再生しても結果は変わらない）。
+    #
+    # 複数のアプリで共有する場合は、他のアプリのセグメントの読み込み済みの位置を覚えておき、
+    # 変更を検出したら追記された行だけを読んで取り込む（sync）。他のアプリが圧縮して
+    # tasks.json が書き換わっていた場合は、全体と比べて違うタスクだけを取り込む。
+    # 同じタスクへの変更は task_model.newer_entry で決める。
+    def __init__(self, path, compact_threshold=4 * 1024 * 1024):
+        super().__init__(path)
+        self.compact_threshold = compact_threshold
+        self._file = None
+        # このアプリが追記しているセグメントの番号
+        self._segment = 0
+        self._size = 0
+        # ストアの変更から作った、まだ書き出していない行
+        self._pending = []
+        # 読み込み済みの位置: セグメント番号 -> バイト数
+        self._offsets = {}
+
+    def _segment_path(self, number):
+        return f'{self.path}.journal.{number}'
+
+    def _segments(self):
+        # 既存のセグメント番号（昇順）
+        numbers = []
+        for name in glob.glob(glob.escape(self.path) + '.journal.*'):
+            suffix = name.rsplit('.', 1)[1]
+            if suffix.isdigit():
+                numbers.append(int(suffix))
+        return sorted(numbers)
+
+    def compaction_due(self):
+        # ジャーナルを圧縮する時期かどうか（他のアプリ・以前の起動のセグメントも含めて数える）
+        # 起動のたびにセグメントが1つ増えるので、小さな変更しかしない場合もセグメントの数で圧縮する
+        segments = self._segments()
+        if len(segments) >= COMPACT_SEGMENTS:
+            return True
+        size = 0
+        for number in segments:
+            try:
+                size += os.path.getsize(self._segment_path(number))
+            except OSError:
+                pass
+        return size >= self.compact_threshold
+
+    def _read_segment(self, number, offset=0):
+        # セグメントの offset バイト目以降の完全な行を読み、(エントリのリスト, 読み終えた位置) を返す
+        try:
+            with open(self._segment_path(number), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # 最後の改行より後は書き込み途中の行（次回に読み直す）
+        end = data.rfind(b'\n') + 1
+        lines = [line for line in data[:end].split(b'\n') if line]
+        offset += end
+        try:
+            # まとめて1つの配列として解析する（1行ずつ解析するより速い）
+            return json.loads(b'[' + b','.join(lines) + b']'), offset
+        except ValueError:
+            pass
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # 書き込み途中で終了した行は無視する
+                continue
+        return entries, offset
+
+    def _read_journal(self, segments):
+        # ジャーナルの内容: (タスクID -> 優先されるタスクまたは削除, カテゴリ, 最大のID)
+        changes = {}
+        categories = None
+        max_id = 0
+        for number in segments:
+            entries, self._offsets[number] = self._read_segment(number)
+            for entry in entries:
+                item = journal_item(entry)
+                if item is None:
+                    categories = entry['categories']
+                    continue
+                if newer_entry(item, changes.get(item['id'])):
+                    changes[item['id']] = item
+                max_id = max(max_id, item['id'])
+        return changes, categories, max_id
+
+    def load(self):
+        chunks = self._iter_tasks(LOAD_CHUNK_SIZE)
+        header = next(chunks, None)
+        segments = self._segments()
+        if header is None and not segments:
+            return None
+        header = header or {}
+
+        # スナップショットの上にジャーナルを再生する
+        tasks = {task.id: task for chunk in chunks for task in chunk['tasks']}
+        changes, categories, max_id = self._read_journal(segments)
+        for task_id, change in changes.items():
+            task = tasks.get(task_id)
+            if newer_entry(change, None if task is None else task.to_dict()):
+                if change.get('deleted'):
+                    tasks.pop(task_id, None)
+                else:
+                    tasks[task_id] = Task.from_dict(change)
+        return {
+            'tasks': list(tasks.values()),
+            'categories': categories or header.get('categories'),
+            'next_id': max(max_id + 1, header.get('next_id') or 1)
+        }
+
+    def iter_load(self, chunk_size=5000):
+        # ジャーナルを先に読み、スナップショットを少しずつ読みながら適用する
+        # ジャーナルは圧縮の閾値（compaction_due）までの大きさなので、最初の表示までの時間は件数によらない
+        self._signature = file_signature(self.path)
+        segments = self._segments()
+        if not os.path.exists(self.path) and not segments:
+            return
+        changes, categories, max_id = self._read_journal(segments)
+        snapshot = self._iter_tasks(chunk_size)
+        header = next(snapshot, None) or {}
+        yield {
+            'tasks': [],
+            'categories': categories or header.get('categories'),
+            'next_id': max(max_id + 1, header.get('next_id') or 1)
+        }
+        for data in snapshot:
+            tasks = []
+            for task in data['tasks']:
+                change = changes.pop(task.id, None)
+                if change is not None and newer_entry(change, task.to_dict()):
+                    if change.get('deleted'):
+                        continue
+                    task = Task.from_dict(change)
+                tasks.append(task)
+            yield {'tasks': tasks}
+        # スナップショットになかったタスク（ジャーナルで追加されたもの）
+        tasks = [Task.from_dict(task) for task in changes.values() if not task.get('deleted')]
+        for start in range(0, len(tasks), chunk_size):
+            yield {'tasks': tasks[start:start + chunk_size]}
+
+    def attach(self, store):
+        # 以降の変更は新しいセグメントに追記する
+        super().attach(store)
+        self._open_segment()
+
+    def _open_segment(self):
+        # 新しいセグメントを作る（他のアプリと同じ番号にならないようロック中に作る）
+        if self._file is not None:
+            self._file.close()
+        with self.lock:
+            number = max(self._segments() + [self._segment]) + 1
+            self._file = open(self._segment_path(number), 'xb')
+        self._segment = number
+        self._offsets[number] = 0
+        self._size = 0
+
+    def _segment_removed(self):
+        # 他のアプリの圧縮で、追記しているセグメントが削除されたかどうか
+        try:
+            return os.stat(self._segment_path(self._segment)).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _on_change(self, op, data):
+        # ストアのロック内で呼ばれるので、変更の順序どおりに並ぶ（ここではディスクに触れない）
+        # 他のアプリから取り込んだ変更は書き込まない
+        if self._store is not None and self._store.merging:
+            return
+        if op == 'put':
+            entry = {'op': 'put', 'task': data.to_dict()}
+            self._mark_dirty(op, data)
+        elif op == 'delete':
+            entry = {'op': 'delete', 'id': data.id, 'version': data.version + 1}
+            self._mark_dirty(op, data)
+        else:
+            entry = {'op': 'categories', 'categories': data}
+        self._pending.append(dump_line(entry))
+
+    def _take_pending(self, store):
+        with store.lock:
+            lines, self._pending = self._pending, []
+            self._dirty = {}
+        return lines
+
+    def _write_pending(self, lines):
+        if not lines:
+            return
+        data = ''.join(lines).encode('utf-8')
+        with self.lock:
+            if self._segment_removed():
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._offsets[self._segment] += len(data)
+        self._size += len(data)
+        self.bytes_written += len(data)
+
+    def append_tasks(self, tasks, categories=None):
+        # ストアを経由せずに新しいタスクを追記する（大量インポート用、メモリには残さない）
+        if self._file is None:
+            self._open_segment()
+        lines = [dump_line({'op': 'put', 'task': task.to_dict()}) for task in tasks]
+        if categories is not None:
+            lines.append(dump_line({'op': 'categories', 'categories': categories}))
+        self._write_pending(lines)
+
+    def save(self, store):
+        # 溜まった変更だけを追記する（ファイル全体は書き直さない）
+        self._write_pending(self._take_pending(store))
+        if self.compaction_due():
+            self.compact(store)
+
+    def sync(self, store):
+        # 自分の変更を書き出してから、他のアプリの変更を取り込む
+        with self.lock:
+            self._write_pending(self._take_pending(store))
+            signature = file_signature(self.path)
+            if signature != self._signature:
+                # 他のアプリが圧縮した: スナップショットとジャーナル全体と比べる
+                self._signature = signature
+                data = read_json(self.path) or {}
+                disk = {task['id']: task for task in data.get('tasks', [])}
+                self._offsets = {self._segment: self._offsets.get(self._segment, 0)}
+                changes, categories, _ = self._read_journal(self._segments())
+                apply_changes(disk, changes)
+                self._merge_disk(store, disk, categories or data.get('categories'))
+                return
+
+            # 他のアプリのセグメントに追記された行だけを読む
+            entries = []
+            categories = None
+            for number in self._segments():
+                if number == self._segment:
+                    continue
+                new_entries, self._offsets[number] = self._read_segment(number, self._offsets.get(number, 0))
+                for entry in new_entries:
+                    item = journal_item(entry)
+                    if item is None:
+                        categories = entry['categories']
+                    else:
+                        entries.append(item)
+            if entries or categories is not None:
+                self._merge(store, entries, categories)
+
+    def compact(self, store):
+        # 他のアプリの変更も取り込んだ現在の状態をスナップショットとして書き出し、
+        # すべてのセグメントを削除する
+        with self.lock:
+            self.sync(store)
+            with store.lock:
+                lines, self._pending = self._pending, []
+                self._dirty = {}
+                data = store.snapshot()
+                tombstones = store.tombstones()
+            # スナップショットの書き出しに失敗しても失われないよう、ここまでの変更も追記しておく
+            self._write_pending(lines)
+            obsolete = self._segments()
+            self._open_segment()
+            self.bytes_written += write_snapshot(self.path, data)
+            self._signature = file_signature(self.path)
+            self._write_cache(data, self._signature)
+            removed = True
+            for number in obsolete:
+                self._offsets.pop(number, None)
+                try:
+                    os.remove(self._segment_path(number))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # 他のアプリが開いているため削除できない場合（Windows）は残す（再生しても結果は同じ）
+                    removed = False
+            # 削除したタスクの古い版を持つファイルが残っていなければ、削除の記録はもう要らない
+            if removed:
+                store.forget_tombstones(tombstones)
+
+    def close(self, store):
+        if self._file is None:
+            return
+        self._write_pending(self._take_pending(store))
+        self._file.close()
+        self._file = None
+        # 何も追記しなかったセグメントは残さない
+        if self._size == 0:
+            try:
+                os.remove(self._segment_path(self._segment))
+            except OSError:
+                pass
+
+
+def journal_item(entry):
+    # ジャーナルの1行をタスクの辞書か削除 {'id', 'version', 'deleted'} にする（カテゴリの行はNone）
+    op = entry['op']
+    if op == 'put':
+        return entry['task']
+    if op == 'delete':
+        return {'id': entry['id'], 'version': entry.get('version', 0), 'deleted': True}
+    return None
+
+
+def apply_changes(tasks, changes):
+    # タスクID -> 辞書 にジャーナルの変更を適用する（優先されるものだけ）
+    for task_id, change in changes.items():
+        if newer_entry(change, tasks.get(task_id)):
+            if change.get('deleted'):
+                tasks.pop(task_id, None)
+            else:
+                tasks[task_id] = change
+
+
+class SaveWriter:
+    # 保存を行う唯一のスレッド
+    # request() は保存の要求をキューに入れるだけなので、UIスレッドやリマインダースレッドは
+    # ディスクへの書き込みを待たない。最初の要求から debounce 秒の間に来た要求はまとめて1回で保存する。
+    # request_sync() は他のアプリの変更の取り込み（storage.sync）を要求する。
+    # 保存を終えるたびに on_saved() を保存スレッドで呼ぶ（Noneなら呼ばない）。
+    _STOP = object()
+    _SYNC = object()
+
+    def __init__(self, storage, store, debounce=0.5, on_error=None, on_saved=None):
+        self.storage = storage
+        self.store = store
+        self.debounce = debounce
+        self.on_error = on_error
+        self.on_saved = on_saved
+        # 保存の依頼の数と、そのうち書き込みを終えた数（pending の判定に使う）
+        self._lock = threading.Lock()
+        self._requested = 0
+        self._saved = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def pending(self):
+        # 書き込みの終わっていない保存の依頼があるかどうか（失敗した場合は次に保存できるまで True）
+        return self._saved < self._requested
+
+    def request(self):
+        with self._lock:
+            self._requested += 1
+        self.queue.put(None)
+
+    def request_sync(self):
+        self.queue.put(self._SYNC)
+
+    def flush(self, timeout=None):
+        # ここまでの要求をすぐに保存させ、書き込みが終わるまで待つ
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self):
+        # 残りを保存してからスレッドを終了する
+        self.queue.put(self._STOP)
+        self.thread.join()
+
+    def _run(self):
+        dirty = False
+        while True:
+            item = self.queue.get()
+            waiters = []
+            stop = False
+            sync = False
+            deadline = time.monotonic() + self.debounce
+            while True:
+                if item is None:
+                    dirty = True
+                elif item is self._STOP:
+                    stop = True
+                elif item is self._SYNC:
+                    sync = True
+                else:
+                    waiters.append(item)
+                # flush / stop の要求があれば待たずに保存する
+                if waiters or stop:
+                    timeout = 0
+                else:
+                    timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        item = self.queue.get(timeout=timeout)
+                    else:
+                        item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if dirty:
+                dirty = False
+                # ここまでの依頼で変更されたタスクはすべてストアにあるので、この保存で書き込まれる
+                with self._lock:
+                    requested = self._requested
+                try:
+                    self.storage.save(self.store)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(e)
+                else:
+                    self._saved = requested
+                    if self.on_saved is not None:
+                        self.on_saved()
+            if sync and hasattr(self.storage, 'sync'):
+                try:
+                    self.storage.sync(self.store)
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(e)
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+
+
+def open_storage(mode, path):
+    # 保存方式の選択
+    #   'json':    毎回全体を書き直す
+    #   'journal': 変更を追記する
+    #   'sqlite':  tasks.db に保存する（初回は tasks.json から移行）
+    if mode == 'json':
+        return JsonStorage(path)
+    if mode == 'journal':
+        return JournalStorage(path)
+    if mode == 'sqlite':
+        from sqlite_storage import SqliteStorage
+        return SqliteStorage(os.path.splitext(path)[0] + '.db', json_path=path)
+    raise ValueError(f"未対応の保存方式です: {mode}")
@@ -0,0 +1,213 @@
+import functools
+import json
+import sys
+import time
+
+from recurrence import canonical_rule, next_occurrence
+
+# 優先度のリスト
+PRIORITIES = ["高", "中", "低"]
+
+# タスクの状態
+STATUSES = ('active', 'completed')
+
+# tasks.json でリマインド未設定を表す値
+NO_REMINDER = '未設定'
+
+# tasks.json と画面に表示する日時の形式
+TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class Interner:
+    # 文字列と小さな整数コードの対応表（同じ文字列を各タスクに持たせない）
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self.codes[name] = code
+        return code
+
+    def name(self, code):
+        return self.names[code]
+
+
+CATEGORY_CODES = Interner()
+PRIORITY_CODES = Interner(PRIORITIES)
+STATUS_CODES = Interner(STATUSES)
+
+
+@functools.lru_cache(maxsize=65536)
+def _hour_start(prefix):
+    # 'YYYY-MM-DD HH' の時刻の先頭（エポック秒）
+    return int(time.mktime(time.strptime(prefix, '%Y-%m-%d %H')))
+
+
+def parse_time(text):
+    # tasks.json の日時文字列をエポック秒に変換する（未設定はNone）
+    # 大量のタスクを読み込むときのため、時の単位までを結果をキャッシュして分だけを足す
+    if not text or text == NO_REMINDER:
+        return None
+    if len(text) == 16 and text[13] == ':':
+        return _hour_start(text[:13]) + int(text[14:16]) * 60
+    return int(time.mktime(time.strptime(text, TIME_FORMAT)))
+
+
+@functools.lru_cache(maxsize=65536)
+def format_time(epoch):
+    # エポック秒を tasks.json・画面の形式に戻す（Noneは「未設定」）
+    if epoch is None:
+        return NO_REMINDER
+    return time.strftime(TIME_FORMAT, time.localtime(epoch))
+
+
+def normalize_row(row, now):
+    # 取り込み・APIの入力の1件を TaskStore.add_many に渡せる形にする（日時の文字列はここでエポック秒に変換する）
+    for key in ('title', 'category', 'priority', 'status', 'created_at', 'reminder', 'repeat'):
+        if row.get(key) is not None and not isinstance(row[key], str):
+            raise ValueError(f"{key} は文字列で指定してください")
+    title = (row.get('title') or '').strip()
+    if not title:
+        raise ValueError("title がありません")
+    priority = row.get('priority') or '中'
+    if priority not in PRIORITIES:
+        raise ValueError(f"優先度が不正です: {priority}")
+    status = row.get('status') or 'active'
+    if status not in STATUSES:
+        raise ValueError(f"状態が不正です: {status}")
+    # 繰り返しの規則（リマインドを指定しなければ次の予定の時刻にする）
+    repeat = canonical_rule(row['repeat']) if row.get('repeat') else None
+    reminder = parse_time(row.get('reminder'))
+    if repeat and reminder is None:
+        reminder = next_occurrence(repeat, now)
+    return {
+        'title': title,
+        'category': row.get('category') or 'その他',
+        'priority': priority,
+        'status': status,
+        'created_at': parse_time(row.get('created_at')) or now,
+        'reminder': reminder,
+        'repeat': repeat
+    }
+
+
+def newer_entry(new, old):
+    # tasks.json・ジャーナルのタスク（辞書）または削除 {'id', 'version', 'deleted': True} のうち、
+    # new が old より優先されるかどうか（old がNoneなら常に優先）
+    # 複数のアプリが同じタスクを同時に変更した場合にも、どのアプリでも同じ結果になるように決める:
+    #   1. 版（version）の大きいほう
+    #   2. 同じ版なら削除
+    #   3. 同じ版の変更どうしは内容のJSONの大きいほう（版のない従来の形式は後から書かれたほう）
+    if old is None:
+        return True
+    new_version, old_version = new.get('version', 0), old.get('version', 0)
+    if new_version != old_version:
+        return new_version > old_version
+    new_deleted, old_deleted = new.get('deleted', False), old.get('deleted', False)
+    if new_deleted != old_deleted:
+        return new_deleted
+    if new_version == 0:
+        return True
+    return canonical(new) > canonical(old)
+
+
+def canonical(entry):
+    return json.dumps(entry, ensure_ascii=False, sort_keys=True)
+
+
+class Task:
+    # 1件のタスク
+    # カテゴリ・優先度・状態は対応表のコード、作成日時とリマインドはエポック秒（未設定はNone）で持ち、
+    # 文字列への変換は tasks.json・データベース・Treeview とのやり取りのときだけ行う。
+    # version は変更のたびに増やす版で、複数のアプリの変更をまとめるときに使う（newer_entry）。
+    # repeat は繰り返しの規則（recurrence.py、繰り返さなければNone）で、reminder はその次の1回の時刻。
+    __slots__ = ('id', 'title', '_category', '_priority', '_status', 'created_at', 'reminder', 'version', 'repeat')
+
+    def __init__(self, id, title, category, priority, status='active', created_at=0, reminder=None, version=0,
+                 repeat=None):
+        self.id = id
+        self.title = title
+        self._category = CATEGORY_CODES.code(category)
+        self._priority = PRIORITY_CODES.code(priority)
+        self._status = STATUS_CODES.code(status)
+        self.created_at = created_at
+        self.reminder = reminder
+        self.version = version
+        self.repeat = repeat
+
+    @property
+    def category(self):
+        return CATEGORY_CODES.names[self._category]
+
+    @category.setter
+    def category(self, name):
+        self._category = CATEGORY_CODES.code(name)
+
+    @property
+    def priority(self):
+        return PRIORITY_CODES.names[self._priority]
+
+    @priority.setter
+    def priority(self, name):
+        self._priority = PRIORITY_CODES.code(name)
+
+    @property
+    def status(self):
+        return STATUS_CODES.names[self._status]
+
+    @status.setter
+    def status(self, name):
+        self._status = STATUS_CODES.code(name)
+
+    def copy(self):
+        task = Task.__new__(Task)
+        task.id = self.id
+        task.title = self.title
+        task._category = self._category
+        task._priority = self._priority
+        task._status = self._status
+        task.created_at = self.created_at
+        task.reminder = self.reminder
+        task.version = self.version
+        task.repeat = self.repeat
+        return task
+
+    def to_dict(self):
+        # tasks.json の形式（repeat は繰り返すタスクだけに付ける）
+        data = {
+            'id': self.id,
+            'title': self.title,
+            'category': self.category,
+            'priority': self.priority,
+            'status': self.status,
+            'created_at': format_time(self.created_at),
+            'reminder': format_time(self.reminder),
+            'version': self.version
+        }
+        if self.repeat:
+            data['repeat'] = self.repeat
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['id'],
+            data['title'],
+            data['category'],
+            data['priority'],
+            data.get('status', 'active'),
+            parse_time(data.get('created_at')) or 0,
+            parse_time(data.get('reminder')),
+            data.get('version', 0),
+            # 同じ規則の文字列は1つにまとめる
+            sys.intern(data['repeat']) if data.get('repeat') else None
+        )
+
+    def __repr__(self):
+        return f'Task({self.to_dict()!r})'
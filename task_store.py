@@ -0,0 +1,526 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from recurrence import next_occurrence
+from search_index import SearchIndex
+from sort_index import SortIndex
+from task_model import Task, PRIORITIES, CATEGORY_CODES, PRIORITY_CODES, STATUS_CODES, newer_entry
+
+# カテゴリのリスト（初期値）
+DEFAULT_CATEGORIES = ["仕事", "家事", "趣味", "勉強", "その他"]
+
+# 複数のアプリで tasks.json を共有する場合に、一度に予約するIDの数
+ID_BLOCK = 100
+
+# 並べ替えのインデックスを保持しておく並び順の数（使われていない順に捨てる）
+SORT_INDEX_LIMIT = 4
+
+
+class TaskStore:
+    # タスクを保持し、IDと各属性のインデックスを管理する（Tkには依存しない）
+    def __init__(self, tasks=None, categories=None, next_id=None):
+        # UIスレッドとリマインダースレッドの両方から操作されるためロックする
+        self.lock = threading.RLock()
+        self.categories = list(categories) if categories else list(DEFAULT_CATEGORIES)
+        self.priorities = list(PRIORITIES)
+        # 変更の通知先: listener(op, data)
+        #   op='put'        data=変更後のタスク
+        #   op='delete'     data=削除したタスク
+        #   op='categories' data=カテゴリのリスト
+        self.listeners = []
+        # 変更のたびに増える番号（APIの ETag など、内容が変わったかどうかの判定に使う）
+        self.generation = 0
+        # merge() で他のアプリの変更を取り込んでいる間はTrue（保存方式はこの変更を書き込まない）
+        self.merging = False
+        # IDの予約: reserve_ids(最小のID, 件数) -> 予約した先頭のID（Noneなら予約しない）
+        # 予約した範囲 [next_id, id_limit) のIDだけを使うので、他のアプリとIDが重ならない。
+        self.reserve_ids = None
+        self.id_limit = None
+        self.load(tasks or [], next_id=next_id)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def _notify(self, op, data):
+        self.generation += 1
+        for listener in self.listeners:
+            listener(op, data)
+
+    def load(self, tasks, categories=None, next_id=None):
+        # タスク（Task）の一覧を読み込み、インデックスを作り直す
+        with self.lock:
+            self._tasks = {}
+            self._by_status = {}
+            self._by_category = {}
+            self._by_priority = {}
+            # (状態, カテゴリ, 優先度) のコードの組 -> 件数（変更のたびに増減させ、集計のために全件を走査しない）
+            # 名前への変換は counts() で行う（組み合わせの数だけなので少ない）
+            self._counts = {}
+            # 未完了でリマインドが未来のタスク: タスクID -> リマインド時刻 と、時刻順のヒープ [(時刻, タスクID)]
+            # 時刻を過ぎたものは overdue_count() の時点で _overdue に移す
+            self._upcoming = {}
+            self._upcoming_heap = []
+            self._overdue = set()
+            self._overdue_checked = time.time()
+            # 通知したリマインドのうち、まだ完了も新しいリマインドの設定もされていないタスク（mark_fired）
+            # 通知するとリマインドは解除される（繰り返すタスクは次の予定に進む）ので、_overdue とは別に持つ
+            self._fired = set()
+            # タイトル検索のインデックス（最初の検索時に作る）
+            self._search = None
+            # 並び順 -> SortIndex（その並び順で最初に表示するときに作る）
+            self._sorts = OrderedDict()
+            # 削除したタスクの最後の版（他のアプリの古い変更で削除したタスクが戻らないようにする）
+            # 削除を書き出したスナップショットの保存が終わったら捨てる（forget_tombstones）
+            self._tombstones = {}
+            self.generation += 1
+            max_id = 0
+            for task in tasks:
+                self._tasks[task.id] = task
+                self._index(task)
+                max_id = max(max_id, task.id)
+            # IDは単調増加させ、削除済みのIDを再利用しない
+            self.next_id = max(max_id + 1, next_id or 1)
+            if categories:
+                self.categories = list(categories)
+
+    def extend(self, tasks):
+        # 保存済みのタスクを追加で読み込む（起動時に少しずつ読み込む場合。変更の通知はしない）
+        with self.lock:
+            self.generation += 1
+            # まとめて追加する場合は並べ替えのインデックスを作り直すほうが速い
+            self._sorts.clear()
+            for task in tasks:
+                self._tasks[task.id] = task
+                self._index(task)
+                if self._search is not None:
+                    self._search.add(task.id, task.title)
+                if task.id >= self.next_id:
+                    self.next_id = task.id + 1
+
+    def _index(self, task, sorts=True):
+        status, category, priority = task.status, task.category, task.priority
+        self._by_status.setdefault(status, set()).add(task.id)
+        self._by_category.setdefault(category, set()).add(task.id)
+        self._by_priority.setdefault(priority, set()).add(task.id)
+        key = (task._status, task._category, task._priority)
+        try:
+            self._counts[key] += 1
+        except KeyError:
+            self._counts[key] = 1
+        if sorts:
+            for index in self._sorts.values():
+                index.add(task)
+        reminder = task.reminder
+        if status != 'active':
+            self._fired.discard(task.id)
+        elif reminder is not None:
+            if reminder <= self._overdue_checked:
+                self._overdue.add(task.id)
+                self._fired.discard(task.id)
+            else:
+                self._upcoming[task.id] = reminder
+                heapq.heappush(self._upcoming_heap, (reminder, task.id))
+
+    def _unindex(self, task, sorts=True):
+        status, category, priority = task.status, task.category, task.priority
+        self._by_status.get(status, set()).discard(task.id)
+        self._by_category.get(category, set()).discard(task.id)
+        self._by_priority.get(priority, set()).discard(task.id)
+        key = (task._status, task._category, task._priority)
+        count = self._counts.get(key, 0) - 1
+        if count > 0:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+        if sorts:
+            for index in self._sorts.values():
+                index.remove(task)
+        self._overdue.discard(task.id)
+        # ヒープのエントリは残し、先頭に来た時点で捨てる
+        if self._upcoming.pop(task.id, None) is not None:
+            self._compact_upcoming()
+
+    def _compact_upcoming(self):
+        # 捨てるエントリが半分を超えたらヒープを作り直す（reminder_scheduler と同じ）
+        if len(self._upcoming_heap) > 64 and len(self._upcoming_heap) > 2 * len(self._upcoming):
+            self._upcoming_heap = [(due, task_id) for task_id, due in self._upcoming.items()]
+            heapq.heapify(self._upcoming_heap)
+
+    def _search_index(self):
+        # 最初の検索時に全件から作り、以降はタスクの追加・削除・タイトル変更ごとに更新する
+        if self._search is None:
+            self._search = SearchIndex()
+            for task in self._tasks.values():
+                self._search.add(task.id, task.title)
+        return self._search
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def all(self):
+        # 登録順のタスク一覧（保存用）
+        with self.lock:
+            return list(self._tasks.values())
+
+    def _allocate_id(self):
+        # 予約した範囲を使い切ったら次の範囲を予約する
+        if self.reserve_ids is not None and (self.id_limit is None or self.next_id >= self.id_limit):
+            self.next_id = self.reserve_ids(self.next_id, ID_BLOCK)
+            self.id_limit = self.next_id + ID_BLOCK
+        return self.next_id
+
+    def add(self, title, category, priority, created_at):
+        # created_at はエポック秒
+        with self.lock:
+            return self._insert(Task(self._allocate_id(), title, category, priority, 'active', created_at))
+
+    def _insert(self, task):
+        self.next_id = max(self.next_id, task.id + 1)
+        self._tasks[task.id] = task
+        self._index(task)
+        if self._search is not None:
+            self._search.add(task.id, task.title)
+        self._notify('put', task)
+        return task
+
+    def add_many(self, items):
+        # まとめて追加する（items は title, category, priority, created_at と任意の status, reminder, repeat を持つ辞書）
+        with self.lock:
+            tasks = []
+            for item in items:
+                tasks.append(self._insert(Task(
+                    self._allocate_id(), item['title'], item['category'], item['priority'],
+                    item.get('status', 'active'), item['created_at'], item.get('reminder'), repeat=item.get('repeat')
+                )))
+            return tasks
+
+    def restore_many(self, tasks):
+        # 削除したタスク（delete の戻り値）を同じIDで戻し、戻したタスクを返す（元に戻す操作用）
+        # 同じIDのタスクが既にあれば戻さない。版は削除より新しくし、他のアプリの削除の記録より優先させる。
+        with self.lock:
+            restored = []
+            for task in tasks:
+                if task.id in self._tasks:
+                    continue
+                # 削除の記録を捨てた後でも、削除の版（task.version + 1）より新しくする
+                task.version = max(task.version + 1, self._tombstones.pop(task.id, 0)) + 1
+                restored.append(self._insert(task))
+            return restored
+
+    def delete(self, task_id):
+        # 削除したタスクを返す（存在しなければNone）
+        with self.lock:
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                self._unindex(task)
+                if self._search is not None:
+                    self._search.remove(task_id)
+                self._tombstones[task_id] = task.version + 1
+                self._fired.discard(task_id)
+                self._notify('delete', task)
+            return task
+
+    def delete_many(self, task_ids):
+        # まとめて削除し、削除したタスクを返す
+        with self.lock:
+            removed = []
+            for task_id in task_ids:
+                task = self.delete(task_id)
+                if task is not None:
+                    removed.append(task)
+            return removed
+
+    def update(self, task_id, **changes):
+        # タスクの属性を変更し、インデックスを更新する
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            self._unindex(task, sorts=False)
+            # 並べ替えのインデックスは、その並び順のキーが変わる場合だけ位置を移す
+            keys = [(index, index.key(task)) for index in self._sorts.values()]
+            for key, value in changes.items():
+                setattr(task, key, value)
+            task.version += 1
+            if 'reminder' in changes:
+                # 新しいリマインドを設定した（通知したリマインドを確認した）
+                self._fired.discard(task_id)
+            self._index(task, sorts=False)
+            for index, old_key in keys:
+                index.move(old_key, task)
+            if self._search is not None and 'title' in changes:
+                self._search.update(task_id, task.title)
+            self._notify('put', task)
+            return task
+
+    def toggle_status(self, task_id, now=None):
+        # 完了／未完了を切り替える（繰り返すタスクは完了にせず、次の予定に進める）
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            if task.repeat and task.status == 'active':
+                return self.advance(task_id, now)
+            new_status = 'completed' if task.status == 'active' else 'active'
+            return self.update(task_id, status=new_status)
+
+    def set_reminder(self, task_id, reminder):
+        # reminder はエポック秒（Noneで解除）
+        return self.update(task_id, reminder=reminder)
+
+    def set_repeat(self, task_id, repeat, now=None):
+        # 繰り返しの規則を設定し、リマインドを now より後の最初の予定にする（Noneで繰り返しを解除）
+        if repeat is None:
+            return self.update(task_id, repeat=None)
+        if now is None:
+            now = time.time()
+        return self.update(task_id, repeat=repeat, reminder=next_occurrence(repeat, now))
+
+    def advance(self, task_id, now=None):
+        # 繰り返すタスクのリマインドを次の予定に進める（過ぎた予定は飛ばし、now より後の最初の予定にする）
+        # 予定は規則から1回分だけ求めるので、繰り返しの回数によらずタスクは1件のまま
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None or not task.repeat:
+                return task
+            if now is None:
+                now = time.time()
+            return self.update(task_id, reminder=next_occurrence(task.repeat, max(now, task.reminder or 0)))
+
+    def _update_many(self, task_ids, **changes):
+        # 値が変わるタスクだけを更新し、更新したタスクを返す
+        with self.lock:
+            updated = []
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is None or all(getattr(task, key) == value for key, value in changes.items()):
+                    continue
+                updated.append(self.update(task_id, **changes))
+            return updated
+
+    def complete_many(self, task_ids, now=None):
+        # 繰り返すタスクは次の予定に進める（toggle_status と同じ）
+        with self.lock:
+            single = []
+            advanced = []
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is not None and task.repeat and task.status == 'active':
+                    advanced.append(self.advance(task_id, now))
+                else:
+                    single.append(task_id)
+            return self._update_many(single, status='completed') + advanced
+
+    def set_reminders_many(self, task_ids, reminder):
+        return self._update_many(task_ids, reminder=reminder)
+
+    def tombstones(self):
+        # 削除の記録の写し（スナップショットを作るときにストアのロック中に取り出す）
+        with self.lock:
+            return dict(self._tombstones)
+
+    def forget_tombstones(self, tombstones):
+        # tombstones（tombstones() の戻り値）を含まないスナップショットを書き出し、古い版のタスクが
+        # ファイルに残っていない状態になった後で、その時点までの削除の記録を捨てる（後の削除の記録は残す）
+        with self.lock:
+            for task_id, version in tombstones.items():
+                if self._tombstones.get(task_id) == version:
+                    del self._tombstones[task_id]
+
+    def merge(self, entries, categories=None):
+        # 他のアプリの変更（tasks.json・ジャーナルのタスクの辞書と削除）を取り込む
+        # task_model.newer_entry で優先されるものだけを反映し、反映したタスクIDを返す。
+        # 変更は通常どおり通知するが、merging の間なので保存方式は書き込まない。
+        with self.lock:
+            self.merging = True
+            try:
+                changed = []
+                for entry in entries:
+                    task_id = entry['id']
+                    local = self._tasks.get(task_id)
+                    if local is not None:
+                        old = local.to_dict()
+                    elif task_id in self._tombstones:
+                        old = {'id': task_id, 'version': self._tombstones[task_id], 'deleted': True}
+                    else:
+                        old = None
+                    if not newer_entry(entry, old):
+                        continue
+                    if entry.get('deleted'):
+                        self.delete(task_id)
+                        self._tombstones[task_id] = max(self._tombstones.get(task_id, 0), entry.get('version', 0))
+                    else:
+                        task = Task.from_dict(entry)
+                        if local is not None:
+                            # _insert で同じ位置のまま置き換える（登録順を変えない）
+                            self._unindex(local)
+                            if self._search is not None:
+                                self._search.remove(task_id)
+                        self._tombstones.pop(task_id, None)
+                        self._insert(task)
+                    changed.append(task_id)
+                if categories is not None and categories != self.categories:
+                    self.categories = list(categories)
+                    self._notify('categories', self.categories)
+                return changed
+            finally:
+                self.merging = False
+
+    def counts(self, field, status=None, category=None, priority=None):
+        # field（'status' / 'category' / 'priority'）の値ごとの件数（他の条件で絞り込んだ件数）
+        # 集計表の組み合わせの数（状態 × カテゴリ × 優先度）だけを見るので、タスクの件数によらない
+        position = ('status', 'category', 'priority').index(field)
+        result = {}
+        with self.lock:
+            for key, count in self._counts.items():
+                name = (STATUS_CODES.names[key[0]], CATEGORY_CODES.names[key[1]], PRIORITY_CODES.names[key[2]])
+                if ((status is None or name[0] == status) and (category is None or name[1] == category)
+                        and (priority is None or name[2] == priority)):
+                    result[name[position]] = result.get(name[position], 0) + count
+        return result
+
+    def mark_fired(self, task_ids):
+        # リマインドを通知したタスクを、完了・削除するか新しいリマインドを設定するまで期限切れとして数える
+        # （通知した後にリマインドを解除・次の予定に進めてから呼ぶ）
+        with self.lock:
+            for task_id in task_ids:
+                task = self._tasks.get(task_id)
+                if task is not None and task.status == 'active' and task_id not in self._overdue:
+                    self._fired.add(task_id)
+
+    def overdue_count(self, now=None):
+        # 未完了でリマインド時刻を過ぎたタスクの件数（リマインドを設定したまま時刻を過ぎたものと、
+        # 通知したまま確認されていないもの）
+        # 前回から now までに時刻を過ぎたものだけをヒープから取り出す
+        if now is None:
+            now = time.time()
+        with self.lock:
+            heap = self._upcoming_heap
+            while heap and heap[0][0] <= now:
+                due, task_id = heapq.heappop(heap)
+                if self._upcoming.get(task_id) == due:
+                    del self._upcoming[task_id]
+                    self._overdue.add(task_id)
+                    self._fired.discard(task_id)
+            self._overdue_checked = max(self._overdue_checked, now)
+            return len(self._overdue) + len(self._fired)
+
+    def stats(self, now=None):
+        # 状態ごとの件数と、リマインド時刻を過ぎた件数
+        with self.lock:
+            by_status = self.counts('status')
+            return {
+                'total': len(self._tasks),
+                'active': by_status.get('active', 0),
+                'completed': by_status.get('completed', 0),
+                'overdue': self.overdue_count(now)
+            }
+
+    def ids(self, status=None, category=None, priority=None, text=None):
+        # 条件に一致するタスクIDの集合（Noneの条件は無視する、text はタイトルの部分一致）
+        with self.lock:
+            sets = []
+            if text:
+                sets.append(self._search_index().search(text))
+            if status is not None:
+                sets.append(self._by_status.get(status, set()))
+            if category is not None:
+                sets.append(self._by_category.get(category, set()))
+            if priority is not None:
+                sets.append(self._by_priority.get(priority, set()))
+            if not sets:
+                return set(self._tasks)
+            # 最も小さい集合から積集合を取る
+            sets.sort(key=len)
+            return sets[0].intersection(*sets[1:])
+
+    def _sort_index(self, order):
+        # 並び順のインデックス（初回だけ全件を並べ替え、以降はタスクの変更ごとに更新する）
+        index = self._sorts.get(order)
+        if index is None:
+            index = self._sorts[order] = SortIndex(order, self._tasks.values())
+            if len(self._sorts) > SORT_INDEX_LIMIT:
+                self._sorts.popitem(last=False)
+        else:
+            self._sorts.move_to_end(order)
+        return index
+
+    def sorted_ids(self, status=None, category=None, priority=None, text=None, order=None):
+        # 条件に一致するタスクIDのリスト
+        # order: ((列名, 降順か), ...)。省略時はID順。同じ値のタスクは常にID順に並ぶ。
+        with self.lock:
+            unfiltered = status is None and category is None and priority is None and not text
+            if not order:
+                if unfiltered:
+                    # 登録順はほぼID順なので、並べ替えはほぼ線形の時間で済む
+                    return sorted(self._tasks)
+                return sorted(self.ids(status, category, priority, text))
+            index = self._sort_index(tuple(order))
+            if unfiltered:
+                return list(index.ids)
+            ids = self.ids(status, category, priority, text)
+            if len(ids) * 20 < len(self._tasks):
+                # 絞り込んだ件数が少なければ、その分だけを並べ替えるほうが速い
+                key = index.key
+                tasks = self._tasks
+                return sorted(ids, key=lambda task_id: key(tasks[task_id]))
+            # インデックスの並びから条件に一致するものを取り出す（並べ替えはしない）
+            return [task_id for task_id in index.ids if task_id in ids]
+
+    def query(self, status=None, category=None, priority=None, text=None, order=None):
+        # 条件に一致するタスクを order の順（省略時はID順）で返す
+        # 登録順は削除したタスクを元に戻すと変わるので、条件がなくてもIDで並べ替える
+        with self.lock:
+            tasks = self._tasks
+            return [tasks[task_id] for task_id in self.sorted_ids(status, category, priority, text, order)]
+
+    def count(self, status=None, category=None, priority=None, text=None):
+        if status is None and category is None and priority is None and not text:
+            return len(self._tasks)
+        if text:
+            return len(self.ids(status, category, priority, text))
+        return sum(self.counts('status', status, category, priority).values())
+
+    def add_category(self, category, position=None):
+        with self.lock:
+            self.categories.insert(len(self.categories) if position is None else position, category)
+            self._notify('categories', self.categories)
+
+    def remove_category(self, category):
+        with self.lock:
+            self.categories.remove(category)
+            # カテゴリが空になったら「その他」を追加
+            if not self.categories:
+                self.categories.append("その他")
+            self._notify('categories', self.categories)
+
+    def category_in_use(self, category):
+        return self.count(category=category) > 0
+
+    def reassign_category(self, old_category, new_category):
+        # カテゴリのインデックスだけを使って関連タスクを付け替える
+        with self.lock:
+            task_ids = list(self._by_category.get(old_category, ()))
+            for task_id in task_ids:
+                self.update(task_id, category=new_category)
+            return task_ids
+
+    def snapshot(self):
+        # 保存用の複製（ロックの外や別スレッドで書き出せるようにコピーする）
+        with self.lock:
+            return {
+                'tasks': [task.copy() for task in self._tasks.values()],
+                'categories': list(self.categories),
+                'next_id': self.next_id
+            }
@@ -0,0 +1,114 @@
+# HTTP/JSON API の試験
+# 通信はせず、ApiServer.respond() に要求を渡して応答のバイト列を確かめる。
+import json
+
+import pytest
+
+from api_server import ApiServer
+from task_store import TaskStore
+
+JSON = {'content-type': 'application/json'}
+
+
+def request(server, method, target, payload=None, headers=None):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    raw = server.respond(method, target, dict(headers or {}), body)
+    head, _, body = raw.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    response_headers = dict(line.split(': ', 1) for line in lines[1:])
+    return status, response_headers, json.loads(body) if body else None
+
+
+@pytest.fixture
+def store():
+    store = TaskStore()
+    for i in range(25):
+        store.add(f'タスク{i}', '仕事' if i % 2 else '家事', '中', 1704067200 + i)
+    return store
+
+
+@pytest.fixture
+def server(store):
+    return ApiServer(store)
+
+
+def test_get_returns_304_while_unchanged(server, store):
+    status, headers, _ = request(server, 'GET', '/tasks')
+    assert status == 200
+    etag = headers['ETag']
+    status, _, body = request(server, 'GET', '/tasks?status=active', headers={'if-none-match': etag})
+    assert status == 304 and body is None
+
+    store.add('追加', '仕事', '中', 1704067200)
+    status, headers, _ = request(server, 'GET', '/tasks', headers={'if-none-match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+
+
+def test_pages_follow_cursor(server):
+    seen = []
+    cursor = 0
+    while cursor is not None:
+        status, _, body = request(server, 'GET', f'/tasks?category=仕事&limit=5&cursor={cursor}')
+        assert status == 200
+        assert body['total'] == 12
+        seen.extend(task['id'] for task in body['tasks'])
+        cursor = body['next_cursor']
+    assert seen == list(range(2, 26, 2))
+
+
+def test_cursor_survives_deleted_task(server, store):
+    _, _, body = request(server, 'GET', '/tasks?limit=10')
+    cursor = body['next_cursor']
+    store.delete(cursor)
+    _, _, body = request(server, 'GET', f'/tasks?limit=10&cursor={cursor}')
+    assert body['tasks'][0]['id'] == cursor + 1
+
+
+def test_create_and_complete(server, store):
+    status, _, body = request(server, 'POST', '/tasks', {'title': '新規', 'priority': '高'}, JSON)
+    assert status == 201
+    task_id = body['task']['id']
+    assert store.get(task_id).priority == '高'
+    status, _, body = request(server, 'POST', f'/tasks/{task_id}/complete', {}, JSON)
+    assert status == 200
+    assert body['task']['status'] == 'completed'
+
+
+def test_bulk_create_is_all_or_nothing(server, store):
+    status, _, body = request(server, 'POST', '/tasks/bulk', {'tasks': [{'title': 'a'}, {'title': ''}]}, JSON)
+    assert status == 400
+    assert '1件目' in body['error']
+    assert len(store) == 25
+
+
+@pytest.mark.parametrize('target', ['/tasks?status=done', '/tasks?priority=最高', '/tasks?limit=0', '/tasks?limit=x'])
+def test_invalid_query_is_rejected(server, target):
+    assert request(server, 'GET', target)[0] == 400
+
+
+def test_complete_without_body(server, store):
+    status, _, body = request(server, 'POST', '/tasks/3/complete')
+    assert status == 200
+    assert body['task']['status'] == 'completed'
+
+
+def test_body_requires_json_content_type(server, store):
+    status, _, _ = request(server, 'POST', '/tasks', {'title': '新規'}, {'content-type': 'text/plain'})
+    assert status == 415
+    assert len(store) == 25
+
+
+def test_invalid_ids_are_rejected(server):
+    assert request(server, 'POST', '/tasks/complete', {'ids': ['1']}, JSON)[0] == 400
+    # true は int の一種だが、ID 1 として扱わない
+    assert request(server, 'POST', '/tasks/complete', {'ids': [True]}, JSON)[0] == 400
+    assert request(server, 'POST', '/tasks/reminder', {'ids': [1]}, JSON)[0] == 400
+
+
+def test_unknown_paths_and_methods(server):
+    assert request(server, 'GET', '/tasks/999')[0] == 404
+    assert request(server, 'GET', '/tasks/abc')[0] == 404
+    assert request(server, 'GET', '/nothing')[0] == 404
+    assert request(server, 'PUT', '/tasks', {}, JSON)[0] == 405
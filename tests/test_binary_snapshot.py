@@ -0,0 +1,134 @@
+# tasks.json のバイナリのキャッシュ（binary_snapshot.py）の試験
+# 書き出して読み戻した内容が同じであることと、壊れたキャッシュを使わずに tasks.json から読むことを確かめる。
+import struct
+
+import pytest
+
+from binary_snapshot import BLOCK_ROWS, COLUMNS, HEADER, open_binary_snapshot, write_binary_snapshot
+from shared_file import file_signature
+from storage import open_storage, write_snapshot
+from task_model import Task
+
+CATEGORIES = ['仕事', '個人', 'その他']
+
+
+def make_tasks(count):
+    tasks = []
+    for i in range(1, count + 1):
+        tasks.append(Task(i, f'タスク{i}', CATEGORIES[i % 3], '高中低'[i % 3],
+                          'completed' if i % 4 == 0 else 'active', 1700000000 + i * 60,
+                          None if i % 5 else 1800000000 + i * 60, version=i % 7,
+                          repeat='0 9 * * 1-5' if i % 11 == 0 else None))
+    tasks[1].title = '絵文字😀を含むタイトル'
+    tasks[2].title = ''
+    return tasks
+
+
+def dicts(tasks):
+    return [task.to_dict() for task in tasks]
+
+
+def column_offset(raw, column):
+    # 列の先頭の位置（ヘッダーの後のメタ情報に続く位置の表から読む）
+    _, _, meta_length, _ = HEADER.unpack_from(raw)
+    bounds = struct.unpack_from(f'<{len(COLUMNS) + 5}Q', raw, HEADER.size + meta_length)
+    return bounds[[name for name, _ in COLUMNS].index(column)]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    # tasks.json と、その内容のキャッシュ（2ブロック以上）を書き出す
+    path = str(tmp_path / 'tasks.json')
+    tasks = make_tasks(BLOCK_ROWS * 2 + 100)
+    data = {'tasks': tasks, 'categories': CATEGORIES, 'next_id': len(tasks) + 1}
+    write_snapshot(path, data)
+    signature = file_signature(path)
+    write_binary_snapshot(path + '.snapshot', data, signature)
+    return path, tasks, signature
+
+
+def test_round_trip(snapshot):
+    path, tasks, signature = snapshot
+    cache = open_binary_snapshot(path + '.snapshot', signature)
+    assert len(cache) == len(tasks)
+    assert cache.next_id == len(tasks) + 1 and cache.categories == CATEGORIES
+    assert dicts(task for chunk in cache.chunks(1000) for task in chunk) == dicts(tasks)
+    assert cache[1].title == '絵文字😀を含むタイトル' and cache[2].title == ''
+    assert cache[-1].id == tasks[-1].id
+    cache.close()
+
+
+def test_empty_round_trip(tmp_path):
+    path = str(tmp_path / 'empty.snapshot')
+    write_binary_snapshot(path, {'tasks': [], 'categories': [], 'next_id': 1}, (1, 2, 3))
+    cache = open_binary_snapshot(path, (1, 2, 3))
+    assert len(cache) == 0 and list(cache.chunks(10)) == []
+    cache.close()
+
+
+def test_other_source_is_not_used(snapshot):
+    path, _, signature = snapshot
+    assert open_binary_snapshot(path + '.snapshot', (1, 2, 3)) is None
+    assert open_binary_snapshot(path + '.missing', signature) is None
+
+
+@pytest.mark.parametrize('position', [HEADER.size + 2, -2])
+def test_corrupt_header_is_not_opened(snapshot, position):
+    # メタ情報・ブロックのチェックサムの表はヘッダーのチェックサムで確かめる
+    path, _, signature = snapshot
+    raw = bytearray(open(path + '.snapshot', 'rb').read())
+    raw[position] ^= 1
+    open(path + '.snapshot', 'wb').write(raw)
+    assert open_binary_snapshot(path + '.snapshot', signature) is None
+
+
+def test_truncated_is_not_opened(snapshot):
+    path, _, signature = snapshot
+    raw = open(path + '.snapshot', 'rb').read()
+    for size in (0, 30, 500, len(raw) // 2, len(raw) - 3):
+        open(path + '.snapshot', 'wb').write(raw[:size])
+        assert open_binary_snapshot(path + '.snapshot', signature) is None, size
+
+
+def test_corrupt_block_is_detected_when_read(snapshot):
+    path, _, signature = snapshot
+    raw = bytearray(open(path + '.snapshot', 'rb').read())
+    raw[column_offset(raw, 'id') + 8 * (BLOCK_ROWS + 10)] ^= 1
+    open(path + '.snapshot', 'wb').write(raw)
+    cache = open_binary_snapshot(path + '.snapshot', signature)
+    # 壊れていないブロックは読める
+    assert len(cache.tasks(0, 100)) == 100
+    with pytest.raises(ValueError):
+        cache.tasks(BLOCK_ROWS, BLOCK_ROWS + 100)
+    cache.close()
+
+
+@pytest.mark.parametrize('mode', ['json', 'journal'])
+@pytest.mark.parametrize('row', [0, BLOCK_ROWS + 10])
+def test_storage_falls_back_to_json(snapshot, mode, row):
+    # キャッシュの途中が壊れていても、tasks.json から読んで同じ内容を1回ずつ返す
+    path, tasks, _ = snapshot
+    raw = bytearray(open(path + '.snapshot', 'rb').read())
+    raw[column_offset(raw, 'id') + 8 * row + 3] ^= 1
+    open(path + '.snapshot', 'wb').write(raw)
+
+    storage = open_storage(mode, path)
+    chunks = list(storage.iter_load(1000))
+    assert sum('next_id' in chunk for chunk in chunks) == 1
+    loaded = sorted((task for chunk in chunks for task in chunk['tasks']), key=lambda task: task.id)
+    assert dicts(loaded) == dicts(tasks)
+    assert storage.cache_stale
+
+    # 作り直したキャッシュはそのまま使える
+    storage.rebuild_cache()
+    storage = open_storage(mode, path)
+    assert dicts(storage.load()['tasks']) == dicts(tasks)
+    assert not storage.cache_stale
+
+
+def test_changed_json_is_read_instead_of_cache(snapshot):
+    path, tasks, _ = snapshot
+    write_snapshot(path, {'tasks': tasks[:10], 'categories': CATEGORIES, 'next_id': 11})
+    storage = open_storage('json', path)
+    assert dicts(storage.load()['tasks']) == dicts(tasks[:10])
+    assert storage.cache_stale
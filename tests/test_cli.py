@@ -0,0 +1,79 @@
+# コマンドライン（cli.py）の試験
+# 標準入出力を差し替えて main() を呼び、保存方式ごとに取り込み・書き出し・変更を確かめる。
+import io
+import json
+import sys
+
+import pytest
+
+import cli
+from storage import open_storage
+
+
+@pytest.fixture(params=['json', 'journal', 'sqlite'])
+def run(request, tmp_path, monkeypatch):
+    path = str(tmp_path / 'tasks.json')
+
+    def run(*argv, stdin=''):
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(stdin.encode('utf-8'))))
+        out = io.TextIOWrapper(io.BytesIO())
+        monkeypatch.setattr(sys, 'stdout', out)
+        cli.main(['--file', path, '--storage', request.param, *argv])
+        out.flush()
+        return out.buffer.getvalue().decode('utf-8')
+
+    run.mode = request.param
+    run.path = path
+    return run
+
+
+def jsonl(rows):
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+
+def export(run, *argv):
+    return [json.loads(line) for line in run('export', *argv).splitlines()]
+
+
+def test_import_and_export(run):
+    rows = [{'title': f'タスク{i}', 'category': '仕事' if i % 2 else '読書', 'priority': '高'} for i in range(25)]
+    run('import', '--chunk-size', '10', stdin=jsonl(rows))
+    tasks = export(run)
+    assert [task['id'] for task in tasks] == list(range(1, 26))
+    assert [task['title'] for task in tasks] == [row['title'] for row in rows]
+    assert len(export(run, '--category', '読書')) == 13
+    # 新しいカテゴリも保存される
+    assert '読書' in open_storage(run.mode, run.path).load()['categories']
+
+
+def test_second_import_does_not_reuse_ids(run):
+    run('import', stdin=jsonl([{'title': 'a'}, {'title': 'b'}]))
+    run('delete', '2')
+    run('import', stdin=jsonl([{'title': 'c'}]))
+    (a, c) = export(run)
+    # 他のアプリと重ならないように予約した分だけIDが飛ぶことはあるが、削除したIDは使わない
+    assert (a['id'], a['title']) == (1, 'a')
+    assert c['title'] == 'c' and c['id'] > 2
+    assert open_storage(run.mode, run.path).load()['next_id'] > c['id']
+
+
+def test_invalid_rows_are_skipped(run, capsys):
+    run('import', stdin=jsonl([{'title': 'a'}, {'title': ''}, {'title': 'b', 'priority': '最高'}, {'title': 'c'}]))
+    assert [task['title'] for task in export(run)] == ['a', 'c']
+    assert '2行目' in capsys.readouterr().err
+
+
+def test_csv_round_trip(run):
+    run('import', '--format', 'csv', stdin='title,category,priority,reminder\n報告書,仕事,高,2024-01-05 09:00\n')
+    lines = run('export', '--format', 'csv').splitlines()
+    assert lines[0] == ','.join(cli.COLUMNS)
+    assert lines[1].startswith('1,報告書,仕事,高,active,')
+    assert '2024-01-05 09:00' in lines[1]
+
+
+def test_complete_and_delete(run):
+    run('import', stdin=jsonl([{'title': f'タスク{i}'} for i in range(5)]))
+    run('complete', '1', '3', '99')
+    run('delete', '5')
+    assert [task['id'] for task in export(run, '--status', 'completed')] == [1, 3]
+    assert [task['id'] for task in export(run, '--status', 'active')] == [2, 4]
@@ -0,0 +1,145 @@
+# 元に戻す・やり直す（History と逆操作）の試験
+from history import AddCategory, Batch, Delete, History, Restore, SetValues, toggle_inverse
+from task_store import TaskStore
+
+NOW = 1704067200
+
+
+def make_store():
+    store = TaskStore()
+    for i in range(5):
+        store.add(f'タスク{i}', '仕事', '中', NOW + i)
+    return store
+
+
+def state(store):
+    return sorted((task.id, task.title, task.category, task.status) for task in store.all())
+
+
+def test_undo_and_redo_delete():
+    store = make_store()
+    before = state(store)
+    history = History()
+    history.record('削除', Restore(store.delete_many([2, 4])))
+    assert history.undo(store) == '削除'
+    # 同じIDで戻る
+    assert state(store) == before
+    assert history.redo(store) == '削除'
+    assert 2 not in store and 4 not in store
+    assert history.undo(store) == '削除'
+    assert state(store) == before
+    # 一覧では元の位置（ID順）に戻る
+    assert [task.id for task in store.query()] == [1, 2, 3, 4, 5]
+
+
+def test_undo_add():
+    store = make_store()
+    history = History()
+    task = store.add('追加', '仕事', '中', NOW)
+    history.record('追加', Delete([task.id]))
+    history.undo(store)
+    assert task.id not in store
+    history.redo(store)
+    assert store.get(task.id).title == '追加'
+    # 戻したIDは次に追加するタスクに使わない
+    assert store.add('次', '仕事', '中', NOW).id == task.id + 1
+
+
+def toggle(store, task_ids):
+    changes = []
+    for task_id in task_ids:
+        task = store.get(task_id)
+        status, reminder = task.status, task.reminder
+        changes.append((store.toggle_status(task_id), status, reminder))
+    return toggle_inverse(changes)
+
+
+def test_undo_toggle():
+    store = make_store()
+    history = History()
+    history.record('完了', toggle(store, [1, 3]))
+    history.undo(store)
+    assert store.ids(status='completed') == set()
+    history.redo(store)
+    assert store.ids(status='completed') == {1, 3}
+
+
+def test_undo_completing_recurring_task_restores_reminder():
+    store = make_store()
+    history = History()
+    store.set_repeat(2, '0 9 * * *', now=NOW)
+    reminder = store.get(2).reminder
+    history.record('完了', toggle(store, [1, 2]))
+    # 繰り返すタスクは完了にならずに次の予定に進む
+    assert store.get(2).status == 'active'
+    assert store.get(2).reminder > reminder
+    history.undo(store)
+    assert store.get(1).status == 'active'
+    assert store.get(2).reminder == reminder
+
+
+def test_set_values_skips_tasks_changed_elsewhere():
+    store = make_store()
+    history = History()
+    store.update(1, category='家事')
+    store.update(2, category='家事')
+    history.record('カテゴリ', SetValues('category', [(1, '家事', '仕事'), (2, '家事', '仕事')]))
+    store.update(2, category='趣味')
+    history.undo(store)
+    assert store.get(1).category == '仕事'
+    assert store.get(2).category == '趣味'
+    # やり直しも戻したタスクだけに適用する
+    history.redo(store)
+    assert store.get(1).category == '家事'
+    assert store.get(2).category == '趣味'
+
+
+def test_batch_undoes_in_reverse_order():
+    store = make_store()
+    history = History()
+    position = store.categories.index('仕事')
+    moved = store.reassign_category('仕事', 'その他')
+    store.remove_category('仕事')
+    history.record('カテゴリの削除', Batch([
+        AddCategory('仕事', position),
+        SetValues('category', [(task_id, 'その他', '仕事') for task_id in moved])
+    ]))
+    history.undo(store)
+    assert store.categories.index('仕事') == position
+    assert store.ids(category='仕事') == {1, 2, 3, 4, 5}
+    history.redo(store)
+    assert '仕事' not in store.categories
+    assert store.ids(category='その他') == {1, 2, 3, 4, 5}
+
+
+def test_new_operation_clears_redo():
+    store = make_store()
+    history = History()
+    history.record('削除', Restore(store.delete_many([1])))
+    history.undo(store)
+    assert history.can_redo()
+    history.record('削除', Restore(store.delete_many([2])))
+    assert not history.can_redo()
+
+
+def test_empty_operations_are_not_recorded():
+    history = History()
+    history.record('削除', Restore([]))
+    assert not history.can_undo()
+
+
+def test_trim_drops_oldest_but_keeps_latest():
+    store = make_store()
+    history = History(limit=2, max_size=3)
+    history.record('1', Restore(store.delete_many([1])))
+    history.record('2', Restore(store.delete_many([2])))
+    history.record('3', Restore(store.delete_many([3])))
+    assert history.undo(store) == '3'
+    assert history.undo(store) == '2'
+    assert history.undo(store) is None
+    # 上限より大きい操作も最新のものは残す
+    store = make_store()
+    history = History(limit=2, max_size=3)
+    history.record('大きい', Restore(store.delete_many([1, 2, 3, 4])))
+    assert history.undo(store) == '大きい'
+    assert len(store) == 5
@@ -0,0 +1,81 @@
+from metrics import Metrics, NullMetrics, MetricsExporter, create_metrics
+
+
+def test_histogram_counts_by_bucket():
+    metrics = Metrics()
+    for value in (0.0005, 0.003, 0.003, 20.0):
+        metrics.observe('latency', value, handler='add')
+    histogram = metrics.snapshot()['histograms'][0]
+    assert histogram['labels'] == {'handler': 'add'}
+    assert histogram['count'] == 4
+    assert histogram['max'] == 20.0
+    # 0.001以下が1件、0.005以下が2件、最後の区切りを超えたものが1件
+    assert histogram['counts'][0] == 1
+    assert histogram['counts'][2] == 2
+    assert histogram['counts'][-1] == 1
+
+
+def test_labels_are_kept_apart():
+    metrics = Metrics()
+    metrics.inc('saves', backend='json')
+    metrics.inc('saves', backend='json')
+    metrics.inc('saves', backend='sqlite')
+    counters = {item['labels']['backend']: item['value'] for item in metrics.snapshot()['counters']}
+    assert counters == {'json': 2, 'sqlite': 1}
+
+
+def test_prometheus_buckets_are_cumulative():
+    metrics = Metrics()
+    metrics.describe('rows', "描画した行数")
+    metrics.observe('rows', 5, buckets=(1, 10))
+    metrics.observe('rows', 50, buckets=(1, 10))
+    text = metrics.to_prometheus()
+    assert '# HELP rows 描画した行数' in text
+    assert '# TYPE rows histogram' in text
+    assert 'rows_bucket{le="1"} 0' in text
+    assert 'rows_bucket{le="10"} 1' in text
+    assert 'rows_bucket{le="+Inf"} 2' in text
+    assert 'rows_count 2' in text
+
+
+def test_gauge_errors_and_none_are_skipped():
+    metrics = Metrics()
+    metrics.gauge('tasks', lambda: 3)
+    metrics.gauge('missing', lambda: None)
+    metrics.gauge('broken', lambda: 1 / 0)
+    assert [item['name'] for item in metrics.snapshot()['gauges']] == ['tasks']
+
+
+def test_instrument_records_each_method():
+    class Handler:
+        def add(self):
+            return 'added'
+
+    metrics = Metrics()
+    handler = Handler()
+    metrics.instrument(handler, ['add'], 'handler_seconds')
+    assert handler.add() == 'added'
+    histogram = metrics.snapshot()['histograms'][0]
+    assert histogram['labels'] == {'handler': 'add'}
+    assert histogram['count'] == 1
+
+
+def test_disabled_metrics_leave_methods_untouched():
+    class Handler:
+        def add(self):
+            return 'added'
+
+    metrics = create_metrics(None)
+    assert isinstance(metrics, NullMetrics)
+    handler = Handler()
+    metrics.instrument(handler, ['add'], 'handler_seconds')
+    assert 'add' not in vars(handler)
+
+
+def test_exporter_writes_on_stop(tmp_path):
+    metrics = Metrics()
+    metrics.inc('saves')
+    path = tmp_path / 'metrics.prom'
+    exporter = MetricsExporter(metrics, str(path), interval=60)
+    exporter.stop()
+    assert 'saves 1' in path.read_text(encoding='utf-8')
@@ -0,0 +1,69 @@
+# NotificationDispatcher（通知のキューとまとめ方）の試験
+import threading
+import time
+
+from notifier import NotificationDispatcher, Notifier
+
+
+class RecordingNotifier(Notifier):
+    def __init__(self):
+        self.shown = []
+        self.event = threading.Event()
+
+    def show(self, title, message, duration=5):
+        self.shown.append((title, message))
+        self.event.set()
+
+
+def wait_for(dispatcher, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while dispatcher.shown < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_burst_of_same_kind_is_coalesced():
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifier, min_interval=0, coalesce_window=0.1)
+    summary = ("タスクが削除されました", "{count}件のタスクを削除しました。")
+    for i in range(500):
+        dispatcher.notify('deleted', "タスクが削除されました", f"タスク{i}を削除しました。", summary=summary)
+    wait_for(dispatcher, 1)
+    dispatcher.stop()
+    assert notifier.shown == [("タスクが削除されました", "500件のタスクを削除しました。")]
+
+
+def test_coalesced_summary_adds_up_counts():
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifier, min_interval=0, coalesce_window=0.1)
+    summary = ("タスクが削除されました", "{count}件のタスクを削除しました。")
+    dispatcher.notify('deleted', "タスクが削除されました", "500件のタスクを削除しました。", summary=summary, count=500)
+    dispatcher.notify('deleted', "タスクが削除されました", "タスクAを削除しました。", summary=summary)
+    wait_for(dispatcher, 1)
+    dispatcher.stop()
+    assert notifier.shown == [("タスクが削除されました", "501件のタスクを削除しました。")]
+
+
+def test_different_kinds_are_kept_apart():
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifier, min_interval=0, coalesce_window=0.1)
+    dispatcher.notify('added', "追加", "タスクAを追加しました。", summary=("追加", "{count}件を追加しました。"))
+    dispatcher.notify('reminder', "リマインド", "タスクBの時間です。")
+    dispatcher.notify('reminder', "リマインド", "タスクCの時間です。")
+    wait_for(dispatcher, 3)
+    dispatcher.stop()
+    # 1件だけの種類・まとめ方のない種類はそのまま表示する
+    assert notifier.shown == [("追加", "タスクAを追加しました。"), ("リマインド", "タスクBの時間です。"),
+                              ("リマインド", "タスクCの時間です。")]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifier, maxsize=1, min_interval=0, coalesce_window=0.5)
+    dispatcher.notify('a', "1", "1")
+    time.sleep(0.1)
+    started = time.monotonic()
+    for i in range(10):
+        dispatcher.notify('a', str(i), str(i))
+    assert time.monotonic() - started < 0.1
+    assert dispatcher.dropped == 9
+    dispatcher.stop()
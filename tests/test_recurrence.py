@@ -0,0 +1,77 @@
+# 繰り返しの規則（recurrence）の試験
+# 時刻は端末のローカル時刻で扱うので、期待値も datetime で作る。
+from datetime import datetime
+
+import pytest
+
+from recurrence import canonical_rule, describe_rule, next_occurrence, occurrences
+from task_store import TaskStore
+
+
+def at(*args):
+    return int(datetime(*args).timestamp())
+
+
+@pytest.mark.parametrize('text, rule', [
+    ('毎日 9:00', '0 9 * * *'),
+    ('daily 18:30', '30 18 * * *'),
+    ('平日 9:05', '5 9 * * 1-5'),
+    ('毎週 木,月 8:00', '0 8 * * 1,4'),
+    ('weekly mon,thu 8:00', '0 8 * * 1,4'),
+    ('毎月 15日 9:00', '0 9 15 * *'),
+    ('monthly 1 9:00', '0 9 1 * *'),
+    ('*/15 * * * *', '*/15 * * * *'),
+])
+def test_canonical_rule(text, rule):
+    assert canonical_rule(text) == rule
+
+
+@pytest.mark.parametrize('text', ['', '毎日', '毎日 25:00', '毎週 月 9', '毎月 32 9:00', '60 * * * *', '* * * *',
+                                  '*/0 * * * *', '0 9 * * 8'])
+def test_invalid_rule(text):
+    with pytest.raises(ValueError):
+        canonical_rule(text)
+
+
+@pytest.mark.parametrize('rule', ['毎日 9:00', '平日 18:30', '毎週 月・木 8:00', '毎月 1日 9:00'])
+def test_description_can_be_entered_again(rule):
+    assert describe_rule(canonical_rule(rule)) == rule
+
+
+def test_next_occurrence():
+    # 2024-01-05 は金曜日
+    friday = at(2024, 1, 5, 10, 0)
+    assert next_occurrence('0 9 * * *', friday) == at(2024, 1, 6, 9, 0)
+    assert next_occurrence('0 9 * * 1-5', friday) == at(2024, 1, 8, 9, 0)
+    assert next_occurrence('30 10 * * *', friday) == at(2024, 1, 5, 10, 30)
+    # ちょうどその時刻の場合は次の回
+    assert next_occurrence('0 10 * * *', friday) == at(2024, 1, 6, 10, 0)
+    assert next_occurrence('0 9 31 * *', at(2024, 1, 31, 10, 0)) == at(2024, 3, 31, 9, 0)
+    assert next_occurrence('0 0 29 2 *', at(2024, 3, 1)) == at(2028, 2, 29, 0, 0)
+
+
+def test_day_or_weekday_when_both_given():
+    # cron と同じく、日と曜日の両方を指定した場合はどちらかに一致する日
+    times = list(zip(range(3), occurrences('0 9 13 * 5', at(2024, 9, 1))))
+    assert [moment for _, moment in times] == [at(2024, 9, 6, 9), at(2024, 9, 13, 9), at(2024, 9, 20, 9)]
+
+
+def test_rule_that_never_matches():
+    assert next_occurrence('0 9 30 2 *', at(2024, 1, 1)) is None
+
+
+def test_store_advances_recurring_task():
+    store = TaskStore()
+    task = store.add('日報', '仕事', '中', at(2024, 1, 5))
+    store.set_repeat(task.id, canonical_rule('平日 9:00'), now=at(2024, 1, 5, 10, 0))
+    assert task.reminder == at(2024, 1, 8, 9, 0)
+    # 完了にすると次の予定に進み、未完了のまま残る
+    store.toggle_status(task.id, now=at(2024, 1, 8, 9, 30))
+    assert task.status == 'active'
+    assert task.reminder == at(2024, 1, 9, 9, 0)
+    # 閉じていた間の予定は飛ばす
+    store.advance(task.id, now=at(2024, 1, 12, 12, 0))
+    assert task.reminder == at(2024, 1, 15, 9, 0)
+    store.set_repeat(task.id, None)
+    store.toggle_status(task.id)
+    assert task.status == 'completed'
@@ -0,0 +1,46 @@
+# ReminderScheduler（リマインドの最小ヒープ）の試験
+import threading
+import time
+
+from reminder_scheduler import ReminderScheduler
+from task_model import Task, parse_time
+
+
+def make_task(task_id, reminder, status='active'):
+    return Task(task_id, f'タスク{task_id}', '仕事', '中', status, 0, parse_time(reminder))
+
+
+def test_due_tasks_pop_in_time_order():
+    scheduler = ReminderScheduler(lambda task_ids: None)
+    scheduler.load([make_task(1, '2024-01-01 12:00'), make_task(2, '2024-01-01 10:00'),
+                    make_task(3, '未設定'), make_task(4, '2024-01-01 11:00', status='completed')])
+    assert len(scheduler) == 2
+    scheduler.schedule(5, 0)
+    assert scheduler._pop_due(time.time()) == [5, 2, 1]
+    assert len(scheduler) == 0
+
+
+def test_store_changes_reschedule_and_cancel():
+    scheduler = ReminderScheduler(lambda task_ids: None)
+    scheduler.load([make_task(1, '2024-01-01 10:00'), make_task(2, '2024-01-01 11:00')])
+    # リマインドの変更は古い予定を取り消してから登録し直す
+    scheduler.on_store_change('put', make_task(1, '2999-01-01 10:00'))
+    scheduler.on_store_change('put', make_task(2, '2024-01-01 11:00', status='completed'))
+    scheduler.on_store_change('put', make_task(3, '2024-01-01 12:00'))
+    scheduler.on_store_change('delete', make_task(3, '2024-01-01 12:00'))
+    assert len(scheduler) == 1
+    assert scheduler._pop_due(time.time()) == []
+
+
+def test_thread_fires_due_reminders():
+    fired = []
+    done = threading.Event()
+    scheduler = ReminderScheduler(lambda task_ids: (fired.extend(task_ids), done.set()))
+    scheduler.start()
+    try:
+        scheduler.schedule(1, time.time() + 0.05)
+        scheduler.schedule(2, time.time() + 3600)
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
+    assert fired == [1]
@@ -0,0 +1,53 @@
+# SearchIndex（タイトルの bi-gram 索引）の試験
+from search_index import SearchIndex
+from task_store import TaskStore
+
+
+def make_index():
+    index = SearchIndex()
+    index.add(1, '報告書を書く')
+    index.add(2, 'Ｐｙｔｈｏｎの勉強')
+    index.add(3, '書店に行く')
+    index.add(4, 'python Tips')
+    return index
+
+
+def test_substring_search():
+    index = make_index()
+    assert index.search('報告') == {1}
+    assert index.search('書') == {1, 3}
+    assert index.search('行く') == {3}
+    # bi-gram がすべて含まれていても、続いていなければ一致しない
+    assert index.search('書く報告') == set()
+    assert index.search('存在しない') == set()
+
+
+def test_search_ignores_width_and_case():
+    index = make_index()
+    assert index.search('PYTHON') == {2, 4}
+    assert index.search('ｔｉｐｓ') == {4}
+
+
+def test_empty_query_matches_everything():
+    assert make_index().search('  ') == {1, 2, 3, 4}
+
+
+def test_update_and_remove():
+    index = make_index()
+    index.update(1, '議事録を書く')
+    assert index.search('報告') == set() and index.search('議事録') == {1}
+    index.remove(3)
+    assert index.search('書') == {1}
+    assert len(index) == 3
+
+
+def test_store_combines_text_with_filters():
+    store = TaskStore()
+    store.add('報告書を書く', '仕事', '高', 1704067200)
+    store.add('報告書を読む', '家事', '高', 1704067200)
+    store.add('買い物', '仕事', '高', 1704067200)
+    assert store.ids(text='報告書') == {1, 2}
+    assert store.ids(category='仕事', text='報告書') == {1}
+    store.update(2, title='洗濯')
+    store.delete(1)
+    assert store.ids(text='報告書') == set()
@@ -0,0 +1,88 @@
+# 並べ替えのインデックス（SortIndex と TaskStore.query の order）の試験
+import random
+
+import pytest
+
+from sort_index import SORT_COLUMNS, SortIndex, make_key
+from task_model import Task
+from task_store import TaskStore
+
+NOW = 1704067200
+
+
+def make_store():
+    store = TaskStore()
+    store.add('b', '仕事', '低', NOW + 60)
+    store.add('a', '家事', '高', NOW)
+    store.add('c', '仕事', '中', NOW + 60)
+    store.add('a', '趣味', '高', NOW + 120)
+    store.set_reminder(2, NOW + 600)
+    store.set_reminder(3, NOW + 300)
+    return store
+
+
+def ids(tasks):
+    return [task.id for task in tasks]
+
+
+def test_ties_are_broken_by_id():
+    store = make_store()
+    assert ids(store.query(order=(('title', False),))) == [2, 4, 1, 3]
+    assert ids(store.query(order=(('title', True),))) == [3, 1, 2, 4]
+    assert ids(store.query(order=(('created_at', True),))) == [4, 1, 3, 2]
+
+
+def test_priority_sorts_by_rank():
+    store = make_store()
+    assert ids(store.query(order=(('priority', False),))) == [2, 4, 3, 1]
+    assert ids(store.query(order=(('priority', True),))) == [1, 3, 2, 4]
+
+
+def test_missing_reminder_sorts_last_in_both_directions():
+    store = make_store()
+    assert ids(store.query(order=(('reminder', False),))) == [3, 2, 1, 4]
+    assert ids(store.query(order=(('reminder', True),))) == [2, 3, 1, 4]
+
+
+def test_multiple_columns():
+    store = make_store()
+    order = (('category', False), ('priority', True))
+    assert ids(store.query(order=order)) == [1, 3, 2, 4]
+    assert ids(store.query(category='仕事', order=order)) == [1, 3]
+
+
+def test_index_follows_store_changes():
+    store = make_store()
+    order = (('title', False),)
+    store.query(order=order)
+    store.update(3, title='0')
+    store.delete(2)
+    store.add('aa', '仕事', '中', NOW)
+    assert ids(store.query(order=order)) == [3, 4, 5, 1]
+
+
+def test_sort_index_add_and_remove():
+    tasks = [Task(i, f't{i % 3}', '仕事', '中', NOW) for i in range(1, 10)]
+    order = (('title', True),)
+    index = SortIndex(order, tasks[:5])
+    for task in tasks[5:]:
+        index.add(task)
+    index.remove(tasks[0])
+    assert index.ids == [task.id for task in sorted(tasks[1:], key=make_key(order))]
+    assert len(index) == 8
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_sorted(seed):
+    rng = random.Random(seed)
+    store = TaskStore()
+    for i in range(200):
+        task = store.add(rng.choice('abc'), rng.choice(['仕事', '家事']), rng.choice(['高', '中', '低']),
+                         NOW + rng.randrange(5))
+        if rng.random() < 0.5:
+            store.set_reminder(task.id, NOW + rng.randrange(5))
+        if rng.random() < 0.3:
+            store.toggle_status(task.id)
+    for _ in range(5):
+        order = tuple((column, rng.random() < 0.5) for column in rng.sample(SORT_COLUMNS, 2))
+        assert ids(store.query(order=order)) == ids(sorted(store.all(), key=make_key(order)))
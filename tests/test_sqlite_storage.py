@@ -0,0 +1,102 @@
+# SQLiteの保存方式（sqlite_storage.py）の試験
+import sqlite3
+
+import pytest
+
+from sqlite_storage import SqliteStorage
+from storage import JsonStorage
+from task_model import Task
+from task_store import TaskStore
+
+CATEGORIES = ['仕事', '家事']
+
+
+def make_tasks(count):
+    return [Task(i, f'タスク{i}', CATEGORIES[i % 2], '高中低'[i % 3], 'completed' if i % 4 == 0 else 'active',
+                 1704067200) for i in range(1, count + 1)]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    # tasks.json から移行したデータベース
+    json_path = str(tmp_path / 'tasks.json')
+    store = TaskStore(make_tasks(2500), CATEGORIES)
+    JsonStorage(json_path).save(store)
+    storage = SqliteStorage(str(tmp_path / 'tasks.db'), json_path=json_path)
+    storage.load()
+    yield storage
+    storage.close(TaskStore())
+
+
+def test_migrates_from_json(storage):
+    data = storage.load()
+    assert [task.id for task in data['tasks']] == list(range(1, 2501))
+    assert data['categories'] == CATEGORIES and data['next_id'] == 2501
+
+
+def test_saves_only_changed_rows(storage):
+    data = storage.load()
+    store = TaskStore(data['tasks'], data['categories'], data['next_id'])
+    storage.attach(store)
+    store.update(1, title='変更')
+    store.delete(2)
+    store.add('追加', '仕事', '中', 1704153600)
+    storage.save(store)
+    tasks = {task.id: task for task in storage.load()['tasks']}
+    assert tasks[1].title == '変更' and 2 not in tasks and tasks[2501].title == '追加'
+
+
+def test_query_result_pages_through_sql(storage):
+    result = storage.filter(status='active', category='仕事')
+    expected = [task.id for task in make_tasks(2500) if task.status == 'active' and task.category == '仕事']
+    assert len(result) == len(expected)
+    assert [task.id for task in result[100:150]] == expected[100:150]
+    assert result[-1].id == expected[-1]
+    # 反復はページ単位で読み進める
+    assert [task.id for task in result] == expected
+    with pytest.raises(IndexError):
+        result[len(expected)]
+
+
+def test_saves_versions(storage):
+    data = storage.load()
+    store = TaskStore(data['tasks'], data['categories'], data['next_id'])
+    storage.attach(store)
+    store.update(1, title='変更')
+    store.update(1, title='もう一度変更')
+    storage.save(store)
+    assert {task.id: task for task in storage.load()['tasks']}[1].version == store.get(1).version == 2
+
+
+def test_adds_version_column_to_old_database(tmp_path):
+    path = str(tmp_path / 'tasks.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, title TEXT NOT NULL, category TEXT NOT NULL, "
+                 "priority TEXT NOT NULL, status TEXT NOT NULL, created_at TEXT NOT NULL, reminder TEXT NOT NULL)")
+    conn.execute("INSERT INTO tasks VALUES (1, '古い', '仕事', '中', 'active', '2024-01-01 09:00', '未設定')")
+    conn.commit()
+    conn.close()
+    storage = SqliteStorage(path)
+    tasks = storage.load()['tasks']
+    assert [(task.id, task.title, task.version, task.repeat) for task in tasks] == [(1, '古い', 0, None)]
+    storage.close(TaskStore())
+
+
+@pytest.mark.parametrize('order', [
+    (('title', True),),
+    (('priority', False), ('status', True)),
+    (('reminder', False),),
+    (('reminder', True), ('category', False)),
+    (('status', False), ('created_at', True)),
+])
+def test_sql_order_matches_store(storage, order):
+    data = storage.load()
+    store = TaskStore(data['tasks'], data['categories'], data['next_id'])
+    storage.attach(store)
+    for task_id in range(1, 2501, 7):
+        store.set_reminder(task_id, 1704067200 + (task_id % 13) * 3600)
+        store.update(task_id, title=f'タスク{task_id % 50}')
+    storage.save(store)
+    for filters in ({}, {'status': 'active', 'category': '仕事'}):
+        assert ([task.id for task in storage.filter(order=order, **filters)]
+                == [task.id for task in store.query(order=order, **filters)])
@@ -0,0 +1,385 @@
+# 保存方式（JSON・ジャーナル・SQLite）の試験
+# 保存した内容を別のインスタンス（次回の起動）で読み込み、同じタスクに戻ることを確かめる。
+# 同じ tasks.json を複数のアプリで同時に使う場合の変更の取り込みとまとめ方も確かめる。
+import os
+import random
+import threading
+
+import pytest
+
+from storage import JournalStorage, SaveWriter, open_storage
+from task_model import newer_entry
+from task_store import TaskStore
+
+
+def open_instance(mode, path, **options):
+    # アプリ1つ分: tasks.json を読み込んだストアと、それに付けた保存方式
+    storage = open_storage(mode, path)
+    for name, value in options.items():
+        setattr(storage, name, value)
+    data = storage.load() or {'tasks': []}
+    store = TaskStore(data['tasks'], data.get('categories'), data.get('next_id'))
+    storage.attach(store)
+    return storage, store
+
+
+def state(tasks):
+    return sorted((task.id, task.title, task.status) for task in tasks)
+
+
+def segments(path):
+    directory, name = os.path.split(path)
+    return sorted(entry for entry in os.listdir(directory) if entry.startswith(name + '.journal.'))
+
+
+def edit(store):
+    first = store.add('買い物', '家事', '中', 1704067200)
+    second = store.add('報告書', '仕事', '高', 1704070800)
+    store.update(first.id, title='買い物に行く')
+    store.toggle_status(second.id)
+    store.delete(store.add('消す', '仕事', '低', 1704074400).id)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'tasks.json')
+
+
+@pytest.mark.parametrize('mode', ['json', 'journal', 'sqlite'])
+def test_saved_tasks_load_in_next_instance(path, mode):
+    storage, store = open_instance(mode, path)
+    edit(store)
+    storage.save(store)
+    storage.close(store)
+    data = open_storage(mode, path).load()
+    assert state(data['tasks']) == state(store.all())
+    assert data['next_id'] == store.next_id
+
+
+def test_journal_replays_without_snapshot(path):
+    storage, store = open_instance('journal', path)
+    edit(store)
+    storage.save(store)
+    # tasks.json はまだなく、変更はすべてジャーナルにある
+    assert not os.path.exists(path) and segments(path)
+    data = JournalStorage(path).load()
+    assert state(data['tasks']) == state(store.all())
+    # 削除したタスクのIDも再利用しない
+    assert data['next_id'] == 4
+    storage.close(store)
+
+
+def test_journal_ignores_truncated_last_line(path):
+    storage, store = open_instance('journal', path)
+    edit(store)
+    storage.close(store)
+    with open(path + '.journal.1', 'a', encoding='utf-8') as f:
+        f.write('{"op":"put","task":{"id":')
+    assert state(JournalStorage(path).load()['tasks']) == state(store.all())
+
+
+def test_journal_skips_broken_line_between_entries(path):
+    # 途中で終了した行の後に別のアプリが追記した場合も、前後のエントリは読む
+    storage, store = open_instance('journal', path)
+    edit(store)
+    storage.save(store)
+    with open(path + '.journal.1', 'a', encoding='utf-8') as f:
+        f.write('{"op":"put","task":{"id":\n')
+    store.update(1, title='壊れた行の後の変更')
+    storage.close(store)
+    assert state(JournalStorage(path).load()['tasks']) == state(store.all())
+
+
+def test_compaction_replaces_segments_with_snapshot(path):
+    storage, store = open_instance('journal', path)
+    edit(store)
+    storage.save(store)
+    storage.compact(store)
+    assert os.path.exists(path)
+    # 圧縮前のセグメントは消え、新しく書き込むセグメントだけが残る
+    assert segments(path) == ['tasks.json.journal.2']
+    store.update(1, title='圧縮の後の変更')
+    storage.save(store)
+    storage.close(store)
+
+    storage, reopened = open_instance('journal', path)
+    assert state(reopened.all()) == state(store.all())
+    storage.close(reopened)
+
+
+class CountingStorage:
+    # save() の回数だけを数える保存方式
+    def __init__(self, error=None):
+        self.saves = 0
+        self.error = error
+
+    def save(self, store):
+        self.saves += 1
+        if self.error is not None:
+            raise self.error
+
+
+def test_writer_coalesces_requests():
+    storage = CountingStorage()
+    writer = SaveWriter(storage, TaskStore(), debounce=0.2)
+    for _ in range(100):
+        writer.request()
+    writer.flush()
+    assert storage.saves == 1
+    writer.stop()
+    assert storage.saves == 1
+
+
+def test_writer_saves_pending_requests_on_stop():
+    storage = CountingStorage()
+    writer = SaveWriter(storage, TaskStore(), debounce=60)
+    writer.request()
+    writer.stop()
+    assert storage.saves == 1
+
+
+def test_writer_reports_errors_and_keeps_running():
+    errors = []
+    storage = CountingStorage(OSError('ディスクがいっぱいです'))
+    writer = SaveWriter(storage, TaskStore(), debounce=0, on_error=errors.append)
+    writer.request()
+    writer.flush()
+    writer.request()
+    writer.stop()
+    assert storage.saves == 2 and len(errors) == 2
+
+
+class BlockingStorage:
+    # release が設定されるまで save() を終えない保存方式
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def save(self, store):
+        self.started.set()
+        self.release.wait(5)
+
+
+def test_writer_is_pending_until_save_finishes():
+    storage = BlockingStorage()
+    saved = []
+    writer = SaveWriter(storage, TaskStore(), debounce=0, on_saved=lambda: saved.append(writer.pending))
+    assert not writer.pending
+    writer.request()
+    assert writer.pending
+    assert storage.started.wait(5)
+    # 書き込み中も保存待ちとして扱う
+    assert writer.pending and not saved
+    storage.release.set()
+    writer.flush()
+    assert not writer.pending
+    assert saved == [False]
+    writer.stop()
+
+
+def test_writer_stays_pending_after_failed_save():
+    saved = []
+    writer = SaveWriter(CountingStorage(OSError('ディスクがいっぱいです')), TaskStore(), debounce=0,
+                        on_saved=lambda: saved.append(True))
+    writer.request()
+    writer.flush()
+    assert writer.pending and not saved
+    writer.storage.error = None
+    writer.request()
+    writer.flush()
+    assert not writer.pending and saved == [True]
+    writer.stop()
+
+
+@pytest.mark.parametrize('mode', ['json', 'journal', 'sqlite'])
+def test_iter_load_matches_load(path, mode):
+    # スナップショットの上にジャーナルの変更がある状態を、少しずつ読んでも同じになる
+    storage, store = open_instance(mode, path)
+    for i in range(250):
+        store.add(f'タスク{i}', '仕事', '中', 1704067200)
+    storage.save(store)
+    if mode == 'journal':
+        storage.compact(store)
+    store.delete(10)
+    store.update(20, title='変更')
+    store.add('追加', '家事', '低', 1704067200)
+    storage.save(store)
+    storage.close(store)
+
+    chunks = list(open_storage(mode, path).iter_load(100))
+    # 最初にカテゴリと next_id、以降はタスクだけを返す
+    assert chunks[0]['tasks'] == [] and chunks[0]['next_id'] == store.next_id
+    assert all(len(chunk['tasks']) <= 100 for chunk in chunks)
+    assert state(task for chunk in chunks for task in chunk['tasks']) == state(store.all())
+
+
+def test_sync_picks_up_journal_of_other_instance(path):
+    a_storage, a = open_instance('journal', path)
+    b_storage, b = open_instance('journal', path)
+    task = a.add('共有', '仕事', '中', 1700000000)
+    a_storage.save(a)
+    b_storage.sync(b)
+    assert state(b.all()) == state(a.all())
+
+    b.update(task.id, title='共有（変更）')
+    b_storage.save(b)
+    a_storage.sync(a)
+    assert a.get(task.id).title == '共有（変更）'
+    a_storage.close(a)
+    b_storage.close(b)
+
+
+def test_merged_task_keeps_its_position(path):
+    a_storage, a = open_instance('journal', path)
+    b_storage, b = open_instance('journal', path)
+    for i in range(3):
+        a.add(f'タスク{i}', '仕事', '中', 1700000000 + i)
+    a_storage.save(a)
+    b_storage.sync(b)
+    first = b.all()[0].id
+    b.update(first, title='変更')
+    b_storage.save(b)
+    a_storage.sync(a)
+    assert [task.id for task in a.all()] == [task.id for task in b.all()]
+    assert a.all()[0].title == '変更'
+    a_storage.close(a)
+    b_storage.close(b)
+
+
+def test_compaction_is_seen_by_other_instance(path):
+    a_storage, a = open_instance('journal', path)
+    b_storage, b = open_instance('journal', path)
+    for i in range(20):
+        a.add(f'タスク{i}', '仕事', '中', 1700000000 + i)
+    a_storage.save(a)
+    b_storage.sync(b)
+    b.delete(1)
+    b_storage.save(b)
+
+    a_storage.compact(a)
+    assert os.path.exists(path)
+    # 圧縮前のセグメントは消え、新しく書き込むセグメントだけが残る
+    assert len(segments(path)) == 1
+    assert 1 not in a
+
+    b.update(2, title='圧縮の後の変更')
+    b_storage.save(b)
+    a_storage.sync(a)
+    b_storage.sync(b)
+    assert state(a.all()) == state(b.all())
+    a_storage.close(a)
+    b_storage.close(b)
+
+    data = JournalStorage(path).load()
+    assert state(data['tasks']) == state(a.all())
+
+
+@pytest.mark.parametrize('mode', ['journal', 'json'])
+@pytest.mark.parametrize('seed', range(5))
+def test_concurrent_instances_converge(path, mode, seed):
+    # 2つのアプリが同じタスクをばらばらに変更・保存・取り込みしても、最後は同じ内容になる
+    rng = random.Random(seed)
+    instances = [open_instance(mode, path, compact_threshold=3000) for _ in range(2)]
+    for step in range(150):
+        storage, store = rng.choice(instances)
+        ids = sorted(store.ids())
+        op = rng.random()
+        if op < 0.3 or not ids:
+            store.add(f'タスク{step}', '仕事', '中', 1700000000)
+        elif op < 0.45:
+            store.delete(rng.choice(ids))
+        elif op < 0.6:
+            store.update(rng.choice(ids), title=f'変更{step}')
+        elif op < 0.8:
+            storage.save(store)
+        elif op < 0.95:
+            storage.sync(store)
+        elif mode == 'journal':
+            storage.compact(store)
+    for _ in range(2):
+        for storage, store in instances:
+            storage.save(store)
+            storage.sync(store)
+    (a_storage, a), (b_storage, b) = instances
+    assert state(a.all()) == state(b.all())
+    a_storage.close(a)
+    b_storage.close(b)
+    assert state(open_storage(mode, path).load()['tasks']) == state(a.all())
+
+
+@pytest.mark.parametrize('mode', ['json', 'journal'])
+def test_tombstones_are_dropped_after_snapshot(path, mode):
+    storage, store = open_instance(mode, path)
+    for i in range(5):
+        store.add(f'タスク{i}', '仕事', '中', 1700000000 + i)
+    storage.save(store)
+    store.delete_many([1, 2])
+    storage.save(store)
+    if mode == 'journal':
+        assert len(store.tombstones()) == 2
+        storage.compact(store)
+    assert store.tombstones() == {}
+    storage.close(store)
+    assert sorted(task.id for task in open_storage(mode, path).load()['tasks']) == [3, 4, 5]
+
+
+def test_newer_entry_prefers_higher_version():
+    old = {'id': 1, 'title': '古い', 'version': 3}
+    new = {'id': 1, 'title': '新しい', 'version': 4}
+    assert newer_entry(new, old)
+    assert not newer_entry(old, new)
+    assert newer_entry(old, None)
+
+
+def test_newer_entry_delete_wins_tie():
+    put = {'id': 1, 'title': '変更', 'version': 2}
+    deleted = {'id': 1, 'version': 2, 'deleted': True}
+    assert newer_entry(deleted, put)
+    assert not newer_entry(put, deleted)
+    # 削除より版の大きい変更（削除を元に戻したもの）は優先する
+    assert newer_entry({'id': 1, 'title': '復元', 'version': 3}, deleted)
+
+
+def test_newer_entry_same_version_is_order_independent():
+    a = {'id': 1, 'title': 'A', 'version': 2}
+    b = {'id': 1, 'title': 'B', 'version': 2}
+    # どちらのアプリで比べても同じほうが残る
+    assert newer_entry(a, b) != newer_entry(b, a)
+    # 版のない従来の形式は後から書かれたほう
+    assert newer_entry({'id': 1, 'title': 'A'}, {'id': 1, 'title': 'B'})
+    assert newer_entry({'id': 1, 'title': 'B'}, {'id': 1, 'title': 'A'})
+
+
+def test_merge_keeps_newer_version_across_instances(path):
+    a_storage, a = open_instance('journal', path)
+    b_storage, b = open_instance('journal', path)
+    task = a.add('同時に変更', '仕事', '中', 1700000000)
+    a_storage.save(a)
+    b_storage.sync(b)
+    # a は2回、b は1回変更する（版の大きい a の変更が残る）
+    a.update(task.id, title='Aの変更1')
+    a.update(task.id, title='Aの変更2')
+    b.update(task.id, title='Bの変更')
+    b_storage.save(b)
+    a_storage.save(a)
+    a_storage.sync(a)
+    b_storage.sync(b)
+    assert a.get(task.id).title == b.get(task.id).title == 'Aの変更2'
+    a_storage.close(a)
+    b_storage.close(b)
+
+
+def test_compaction_due_by_size_and_segment_count(path):
+    storage, store = open_instance('journal', path, compact_threshold=10 ** 9)
+    store.add('タスク', '仕事', '中', 1700000000)
+    storage.save(store)
+    assert not storage.compaction_due()
+    storage.compact_threshold = 1
+    assert storage.compaction_due()
+    storage.close(store)
+
+    # セグメントが多すぎる場合も（合計が小さくても）圧縮する
+    storage = JournalStorage(path, compact_threshold=10 ** 9)
+    for number in range(2, 40):
+        open(storage._segment_path(number), 'w').close()
+    assert storage.compaction_due()
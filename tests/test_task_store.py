@@ -0,0 +1,131 @@
+# TaskStore（タスクの保持とインデックス）の試験
+# 使い方: python -m pytest tests
+import time
+
+from task_model import Task
+from task_store import TaskStore
+
+NOW = 1704067200
+
+
+def make_store():
+    store = TaskStore()
+    store.add('報告書', '仕事', '高', NOW)
+    store.add('買い物', '家事', '中', NOW + 60)
+    store.add('読書', '趣味', '低', NOW + 120)
+    store.add('会議の準備', '仕事', '中', NOW + 180)
+    return store
+
+
+def test_ids_intersect_indexes():
+    store = make_store()
+    assert store.ids(category='仕事') == {1, 4}
+    assert store.ids(category='仕事', priority='中') == {4}
+    assert store.ids(status='active') == {1, 2, 3, 4}
+    assert store.ids(category='なし') == set()
+    assert store.count() == 4 and store.count(priority='中') == 2
+
+
+def test_update_moves_task_between_indexes():
+    store = make_store()
+    store.toggle_status(1)
+    assert store.ids(status='completed') == {1}
+    assert 1 not in store.ids(status='active')
+    store.update(2, category='仕事')
+    assert store.ids(category='仕事') == {1, 2, 4}
+    assert store.ids(category='家事') == set()
+
+
+def test_delete_removes_from_indexes():
+    store = make_store()
+    store.delete(4)
+    assert 4 not in store and len(store) == 3
+    assert store.ids(category='仕事') == {1}
+    assert store.delete(4) is None
+
+
+def test_query_returns_id_order():
+    store = make_store()
+    assert [task.id for task in store.query(category='仕事')] == [1, 4]
+    assert [task.id for task in store.query()] == [1, 2, 3, 4]
+
+
+def test_ids_are_not_reused():
+    store = make_store()
+    store.delete(4)
+    assert store.add('新しい', '仕事', '低', NOW).id == 5
+    store.load([Task(2, 'a', '仕事', '高')], next_id=10)
+    assert store.next_id == 10
+
+
+def test_reassign_category():
+    store = make_store()
+    assert sorted(store.reassign_category('仕事', 'その他')) == [1, 4]
+    assert store.ids(category='その他') == {1, 4}
+    assert not store.category_in_use('仕事')
+
+
+def test_bulk_operations_skip_missing_ids():
+    store = make_store()
+    added = store.add_many([{'title': f'一括{i}', 'category': '仕事', 'priority': '低',
+                             'created_at': NOW} for i in range(3)])
+    assert [task.id for task in added] == [5, 6, 7]
+    assert [task.id for task in store.complete_many([1, 5, 99])] == [1, 5]
+    assert store.ids(status='completed') == {1, 5}
+    assert [task.id for task in store.delete_many([2, 6, 99])] == [2, 6]
+    assert len(store) == 5
+
+
+def test_counts_follow_changes():
+    store = make_store()
+    assert store.counts('category') == {'仕事': 2, '家事': 1, '趣味': 1}
+    assert store.counts('priority', category='仕事') == {'高': 1, '中': 1}
+    store.toggle_status(1)
+    store.update(2, category='仕事')
+    store.delete(3)
+    assert store.counts('status') == {'active': 2, 'completed': 1}
+    assert store.counts('category', status='active') == {'仕事': 2}
+    assert store.stats()['total'] == 3
+
+
+def test_overdue_count_moves_reminders_past_due():
+    now = time.time()
+    store = make_store()
+    store.set_reminder(1, int(now) - 60)
+    store.set_reminder(2, int(now) + 60)
+    store.set_reminder(3, int(now) + 120)
+    assert store.overdue_count(now) == 1
+    assert store.overdue_count(now + 90) == 2
+    assert store.stats(now + 200)['overdue'] == 3
+
+
+def test_overdue_count_drops_completed_and_changed_reminders():
+    now = time.time()
+    store = make_store()
+    store.set_reminder(1, int(now) + 60)
+    store.set_reminder(2, int(now) + 60)
+    store.set_reminder(3, int(now) + 60)
+    store.toggle_status(1)
+    store.set_reminder(2, int(now) + 600)
+    store.delete(3)
+    assert store.overdue_count(now + 90) == 0
+    assert store.overdue_count(now + 900) == 1
+    store.set_reminder(2, None)
+    assert store.overdue_count(now + 900) == 0
+
+
+def test_fired_reminders_count_as_overdue_until_acknowledged():
+    now = time.time()
+    store = make_store()
+    for task_id in (1, 2, 3, 4):
+        store.set_reminder(task_id, int(now) - 60)
+    assert store.overdue_count(now) == 4
+    # 通知するとリマインドは解除されるが、期限切れには数え続ける
+    for task_id in (1, 2, 3, 4):
+        store.set_reminder(task_id, None)
+    store.mark_fired([1, 2, 3, 4])
+    assert store.overdue_count(now) == 4
+    store.toggle_status(1)
+    store.delete(2)
+    store.set_reminder(3, int(now) + 600)
+    assert store.overdue_count(now) == 1
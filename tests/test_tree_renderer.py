@@ -0,0 +1,103 @@
+# TreeRenderer（Treeview への差分描画・仮想スクロール）の試験
+# Treeview の代わりに、行の並びと操作の回数を記録するだけの RecordingTree を使う。
+from task_model import Task
+from tree_renderer import TreeRenderer
+
+
+class RecordingTree:
+    def __init__(self):
+        self.order = []
+        self.values = {}
+        self.operations = []
+
+    def configure(self, **options):
+        pass
+
+    def insert(self, parent, index, iid, values, tags):
+        self.order.insert(index, iid)
+        self.values[iid] = values
+        self.operations.append(('insert', iid))
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.order.remove(iid)
+            del self.values[iid]
+            self.operations.append(('delete', iid))
+
+    def move(self, iid, parent, index):
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+        self.operations.append(('move', iid))
+
+    def item(self, iid, values, tags):
+        self.values[iid] = values
+        self.operations.append(('item', iid))
+
+    def yview(self, *args):
+        return (0.0, 0.5)
+
+    def yview_moveto(self, fraction):
+        pass
+
+
+class RecordingScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def make_task(task_id, title=None):
+    return Task(task_id, title or f'タスク{task_id}', '仕事', '中')
+
+
+def make_renderer(**options):
+    tree = RecordingTree()
+    renderer = TreeRenderer(tree, RecordingScrollbar(), lambda task: (task.id, task.title),
+                            lambda task: (), **options)
+    return renderer, tree
+
+
+def test_renders_rows_in_order():
+    renderer, tree = make_renderer()
+    renderer.render([make_task(i) for i in (3, 1, 2)])
+    assert tree.order == ['3', '1', '2']
+    assert tree.values['1'] == (1, 'タスク1')
+
+
+def test_unchanged_rows_are_not_touched():
+    renderer, tree = make_renderer()
+    tasks = [make_task(i) for i in range(1, 6)]
+    renderer.render(tasks)
+    tree.operations.clear()
+    renderer.render(tasks)
+    assert tree.operations == []
+
+
+def test_only_changed_rows_are_updated():
+    renderer, tree = make_renderer()
+    renderer.render([make_task(i) for i in range(1, 6)])
+    tree.operations.clear()
+    renderer.render([make_task(1), make_task(2, '変更'), make_task(4), make_task(5), make_task(6)])
+    assert sorted(tree.operations) == [('delete', '3'), ('insert', '6'), ('item', '2')]
+    assert tree.order == ['1', '2', '4', '5', '6']
+    assert tree.values['2'] == (2, '変更')
+
+
+def test_reordered_rows_are_moved():
+    renderer, tree = make_renderer()
+    renderer.render([make_task(i) for i in range(1, 6)])
+    renderer.render([make_task(i) for i in (5, 1, 2, 3, 4)])
+    assert tree.order == ['5', '1', '2', '3', '4']
+
+
+def test_large_lists_render_a_window():
+    renderer, tree = make_renderer(window_size=50, virtual_threshold=100)
+    renderer.render([make_task(i) for i in range(1, 1001)])
+    assert renderer.virtual
+    assert tree.order == [str(i) for i in range(1, 51)]
+    # スクロールバーのドラッグで、全件に対する位置の周辺だけを実体化する
+    renderer._on_scrollbar('moveto', '0.5')
+    assert len(tree.order) == 50
+    assert '501' in tree.order and '1' not in tree.order
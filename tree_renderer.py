@@ -0,0 +1,142 @@
+class TreeRenderer:
+    # Treeviewへの差分描画
+    # 行のiidはタスクIDとし、前回の表示内容と比較して変更のあった行だけを挿入・更新・削除する。
+    # 表示件数が virtual_threshold を超えた場合は、スクロール位置の周辺 window_size 行だけを
+    # Treeviewに実体化し、スクロールバーは全件に対する位置を表示する（仮想スクロール）。
+    def __init__(self, tree, scrollbar, row_values, row_tags, window_size=300, virtual_threshold=1000):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_values = row_values
+        self.row_tags = row_tags
+        self.window_size = window_size
+        self.virtual_threshold = virtual_threshold
+
+        # 表示対象の全タスク（フィルター後）と、実体化している範囲の先頭位置
+        self.rows = []
+        self.offset = 0
+
+        # 実体化済みの行: iid -> (values, tags)
+        self.rendered = {}
+        self.order = []
+        self._shifting = False
+
+        # 描画のたびに on_render(変更した行数, 表示対象の件数) を呼ぶ（計測用、Noneなら呼ばない）
+        self.on_render = None
+
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self._on_scrollbar)
+
+    @property
+    def virtual(self):
+        return len(self.rows) > self.virtual_threshold
+
+    def render(self, tasks):
+        # 表示対象を差し替えて差分描画する（スクロール位置はできるだけ維持）
+        self.rows = tasks
+        if not self.virtual:
+            self.offset = 0
+        else:
+            self.offset = max(0, min(self.offset, len(self.rows) - self.window_size))
+        self._sync()
+
+    def refresh(self):
+        # 同じ表示対象のまま、値が変わった行だけを更新する
+        self._sync()
+
+    def _visible_rows(self):
+        if not self.virtual:
+            return self.rows
+        return self.rows[self.offset:self.offset + self.window_size]
+
+    def _sync(self):
+        new_order = []
+        new_rows = {}
+        for task in self._visible_rows():
+            iid = str(task.id)
+            new_order.append(iid)
+            new_rows[iid] = (self.row_values(task), self.row_tags(task))
+
+        # 表示対象から外れた行を削除
+        removed = [iid for iid in self.order if iid not in new_rows]
+        if removed:
+            self.tree.delete(*removed)
+        old_order = [iid for iid in self.order if iid in new_rows]
+        changed = len(removed)
+
+        # 既存の並びを先頭から突き合わせ、足りない行の挿入・位置のずれた行の移動だけを行う
+        moved = set()
+        j = 0
+        for i, iid in enumerate(new_order):
+            while j < len(old_order) and old_order[j] in moved:
+                j += 1
+            values, tags = new_rows[iid]
+            old = self.rendered.get(iid)
+            if old is None:
+                self.tree.insert('', i, iid=iid, values=values, tags=tags)
+                changed += 1
+                continue
+            if j < len(old_order) and old_order[j] == iid:
+                j += 1
+            else:
+                self.tree.move(iid, '', i)
+                moved.add(iid)
+                changed += 1
+            if old != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+                changed += 1
+
+        self.rendered = new_rows
+        self.order = new_order
+        self._set_scrollbar(*self.tree.yview())
+        if self.on_render is not None:
+            self.on_render(changed, len(self.rows))
+
+    def _set_scrollbar(self, first, last):
+        # Treeview内のスクロール位置を全件に対する位置に換算してスクロールバーに反映する
+        if not self.virtual:
+            self.scrollbar.set(first, last)
+            return
+        total = len(self.rows)
+        count = len(self.order)
+        self.scrollbar.set((self.offset + first * count) / total, (self.offset + last * count) / total)
+
+    def _on_tree_scroll(self, first, last):
+        first, last = float(first), float(last)
+        self._set_scrollbar(first, last)
+
+        # 実体化範囲の端に近づいたら範囲をずらす
+        count = len(self.order)
+        if not self.virtual or self._shifting or not count:
+            return
+        total = len(self.rows)
+        top = self.offset + first * count
+        margin = self.window_size // 4
+        if first * count < margin and self.offset > 0:
+            self._shift_to(int(top) - self.window_size // 2, top)
+        elif (1 - last) * count < margin and self.offset + count < total:
+            self._shift_to(int(top) - margin, top)
+
+    def _shift_to(self, offset, top):
+        # 実体化範囲の先頭を offset に移し、行 top が引き続き先頭に見えるようにする
+        offset = max(0, min(offset, len(self.rows) - self.window_size))
+        if offset == self.offset:
+            return
+        self._shifting = True
+        try:
+            self.offset = offset
+            self._sync()
+            if self.order:
+                self.tree.yview_moveto((top - self.offset) / len(self.order))
+        finally:
+            self._shifting = False
+
+    def _on_scrollbar(self, *args):
+        if not self.virtual or args[0] != 'moveto':
+            # 行・ページ単位のスクロールはTreeviewに任せる（範囲の移動は _on_tree_scroll で行う）
+            self.tree.yview(*args)
+            return
+        # スクロールバーのドラッグは全件に対する位置として扱う
+        top = float(args[1]) * len(self.rows)
+        self._shift_to(int(top) - self.window_size // 4, top)
+        if self.order:
+            self.tree.yview_moveto((top - self.offset) / len(self.order))